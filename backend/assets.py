@@ -0,0 +1,127 @@
+"""Build step for the frontend: fingerprinted, precompressed copies of the static files.
+
+    python -m backend.assets
+
+writes frontend/dist/ with every asset as name.<hash>.ext next to its .gz (and
+.br when the brotli package is installed) compressed at the highest levels,
+index.html rewritten to load the fingerprinted names, and manifest.json. The
+Flask backend serves dist/ when the manifest is there: fingerprinted files are
+cached by browsers for a year without revalidation, pages are revalidated on
+every load, and the precompressed copy matching Accept-Encoding is sent as it
+is. Without a build it serves frontend/ like before.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from backend import wire
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND_DIR = os.path.join(ROOT, 'frontend')
+DIST_DIR = os.path.join(FRONTEND_DIR, 'dist')
+MANIFEST = 'manifest.json'
+#Served under their own names and revalidated, they point at the fingerprinted assets
+PAGES = ('index.html',)
+#A new build changes the name, so a cached copy never goes stale
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+EXTENSIONS = {'gzip': '.gz', 'br': '.br'}
+
+
+class BuiltAssets(NamedTuple):
+    directory: str
+    #Content codings with a precompressed copy, by served file name
+    codings: Dict[str, Tuple[str, ...]]
+    fingerprinted: FrozenSet[str]
+
+
+def _fingerprint(name: str, body: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}'
+
+
+#Quoted references only (src="script.js"), so a name inside another name is left alone
+def _rewrite(page: str, names: Dict[str, str]) -> str:
+    if not names:
+        return page
+    pattern = re.compile('(["\'])(' + '|'.join(re.escape(n) for n in names) + r')\1')
+    return pattern.sub(lambda m: m.group(1) + names[m.group(2)] + m.group(1), page)
+
+
+def _write(directory: str, name: str, body: bytes) -> Tuple[str, ...]:
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(body)
+    codings = []
+    for coding in wire.CODINGS:
+        if coding == 'br':
+            packed = wire.brotli.compress(body, quality=11)
+        else:
+            packed = gzip.compress(body, 9, mtime=0)
+        #Tiny files can come out larger
+        if len(packed) < len(body):
+            with open(os.path.join(directory, name + EXTENSIONS[coding]), 'wb') as f:
+                f.write(packed)
+            codings.append(coding)
+    return tuple(codings)
+
+
+#Rebuilds out from the files in source and returns the manifest
+def build(source: str = FRONTEND_DIR, out: str = DIST_DIR) -> Dict:
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+    os.makedirs(out)
+    names, codings = {}, {}
+    for name in sorted(os.listdir(source)):
+        path = os.path.join(source, name)
+        if name in PAGES or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            body = f.read()
+        names[name] = _fingerprint(name, body)
+        codings[names[name]] = _write(out, names[name], body)
+    for name in PAGES:
+        path = os.path.join(source, name)
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                page = _rewrite(f.read(), names)
+            codings[name] = _write(out, name, page.encode('utf-8'))
+    manifest = {'assets': names, 'codings': codings}
+    with open(os.path.join(out, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+#None when there is no build in directory
+def load(directory: str = DIST_DIR) -> Optional[BuiltAssets]:
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    return BuiltAssets(directory, {name: tuple(c) for name, c in manifest['codings'].items()},
+                       frozenset(manifest['assets'].values()))
+
+
+#(file to send, its content coding, Cache-Control) for a built file, None when name is not one
+def resolve(built: BuiltAssets, name: str, accept_encoding: Optional[str]) -> Optional[Tuple[str, Optional[str], str]]:
+    if name not in built.codings:
+        return None
+    #The build already left out copies that did not shrink, so no size threshold here
+    coding = wire.negotiate(accept_encoding, wire.MIN_SIZE, built.codings[name])
+    stored = name + EXTENSIONS[coding] if coding else name
+    return stored, coding, IMMUTABLE if name in built.fingerprinted else REVALIDATE
+
+
+def main() -> None:
+    manifest = build()
+    for name, built in sorted(manifest['assets'].items()):
+        print(f'{name} -> {built} ({", ".join(manifest["codings"][built]) or "uncompressed"})')
+    print(f'Wrote {DIST_DIR}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from backend import db, pool
+
+T = TypeVar("T")
+
+#One worker per pooled connection, so workers never queue on the pool and the event loop never blocks on SQLite
+DB_WORKERS = int(os.environ.get("SPORTS_DB_WORKERS", str(pool.DEFAULT_POOL_SIZE)))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="sports-db")
+    return _executor
+
+
+def _call(fn: Callable[..., T], args: tuple) -> T:
+    with db.get_db() as conn:
+        return fn(conn, *args)
+
+
+#Runs fn(conn, *args) on the dedicated DB executor with a request-scoped pooled connection
+async def run(fn: Callable[..., T], *args) -> T:
+    loop = asyncio.get_running_loop()
+    #Carries the request's instrumentation context over to the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), context.run, _call, fn, args)
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
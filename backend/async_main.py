@@ -0,0 +1,22 @@
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from backend import async_db, broker, db, pool, wire, writer
+from backend.routers import async_events, async_feeds, async_teams, async_venues, metrics
+
+#Async variant of backend.main: run with "uvicorn backend.async_main:app"
+app = FastAPI(on_startup=[db.open_database],
+              on_shutdown=[broker.broker.close_all, writer.close_all, async_db.shutdown])
+
+app.include_router(async_events.router)
+app.include_router(async_teams.router)
+app.include_router(async_venues.router)
+app.include_router(async_feeds.router)
+app.include_router(metrics.router)
+metrics.install_timing(app, "fastapi-async")
+#Responses from the response cache arrive already compressed (Content-Encoding set) and pass through as they are
+app.add_middleware(GZipMiddleware, minimum_size=wire.MIN_SIZE, compresslevel=wire.GZIP_LEVEL)
+
+#Connection pool metrics for the database used by the routers
+@app.get("/pool")
+async def get_pool_stats():
+    return pool.get_pool(db.DB_PATH, db.init_db).stats()
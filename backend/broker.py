@@ -0,0 +1,242 @@
+"""In-process publish/subscribe for live event notifications (Server-Sent Events).
+
+Every subscriber has a bounded queue. Publishing never blocks: a subscriber whose
+queue is full is evicted and its stream ends, the client reconnects and catches
+up through /api/events/sync. Messages are encoded once per publish and shared by
+all subscribers, so an idle subscriber costs one small queue.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from backend import recurrence
+from backend.queries import CALENDAR_COLUMNS, CALENDAR_JOINS
+
+QUEUE_SIZE = int(os.environ.get('SPORTS_SSE_QUEUE', '100'))
+MAX_SUBSCRIBERS = int(os.environ.get('SPORTS_SSE_MAX_SUBSCRIBERS', '10000'))
+#Comment line sent on idle streams, keeps proxies from closing them and detects gone clients
+KEEPALIVE = float(os.environ.get('SPORTS_SSE_KEEPALIVE', '15'))
+
+
+class Message(NamedTuple):
+    event: str
+    payload: str
+
+
+def encode(event: str, data) -> Message:
+    return Message(event, f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n')
+
+
+class Evicted(Exception):
+    pass
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    """One client's queue. Read it with get() from a thread or get_async() from the event loop it was made on."""
+
+    __slots__ = ('broker', 'topic', '_queue', '_max', '_loop', '_ready', 'evicted')
+
+    def __init__(self, broker: 'Broker', topic: str, max_queued: int, loop: Optional[asyncio.AbstractEventLoop]):
+        self.broker = broker
+        self.topic = topic
+        self._queue: deque = deque()
+        self._max = max_queued
+        self._loop = loop
+        self._ready = asyncio.Event() if loop is not None else threading.Event()
+        self.evicted = False
+
+    #Called by the publisher, False when the queue was full and the subscriber got evicted
+    def _offer(self, message: Message) -> bool:
+        if len(self._queue) >= self._max:
+            self._evict()
+            return False
+        self._queue.append(message)
+        self._wake()
+        return True
+
+    #Ends the stream right away, the client reloads what it missed after reconnecting
+    def _evict(self) -> None:
+        self.evicted = True
+        self._queue.clear()
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._loop is None:
+            self._ready.set()
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            #Event loop already closed, nobody is reading any more
+            self.evicted = True
+
+    def _pop(self) -> Optional[Message]:
+        if self._queue:
+            return self._queue.popleft()
+        if self.evicted:
+            raise Evicted(self.topic)
+        self._ready.clear()
+        #A message may have arrived between the check and clear()
+        if self._queue:
+            return self._queue.popleft()
+        return None
+
+    #Next message, or None after timeout seconds without one
+    def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        message = self._pop()
+        if message is None and self._ready.wait(timeout):
+            message = self._pop()
+        return message
+
+    async def get_async(self, timeout: Optional[float] = None) -> Optional[Message]:
+        message = self._pop()
+        if message is None:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            message = self._pop()
+        return message
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def __init__(self, queue_size: int = QUEUE_SIZE, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._topics: Dict[str, List[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.evictions = 0
+
+    #loop: the running event loop for async readers, None for readers on a thread
+    def subscribe(self, topic: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        subscription = Subscription(self, os.path.abspath(topic), self.queue_size, loop)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers(topic)
+            #Copy on write, publish iterates a snapshot without holding the lock
+            self._topics[subscription.topic] = self._topics.get(subscription.topic, []) + [subscription]
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic, [])
+            if subscription in subscribers:
+                remaining = [s for s in subscribers if s is not subscription]
+                if remaining:
+                    self._topics[subscription.topic] = remaining
+                else:
+                    del self._topics[subscription.topic]
+                self._count -= 1
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._topics.get(os.path.abspath(topic)))
+
+    def publish(self, topic: str, message: Message) -> int:
+        delivered = 0
+        evicted = []
+        for subscription in self._topics.get(os.path.abspath(topic), ()):
+            if subscription._offer(message):
+                delivered += 1
+            else:
+                evicted.append(subscription)
+        for subscription in evicted:
+            self.unsubscribe(subscription)
+        with self._lock:
+            self.published += 1
+            self.delivered += delivered
+            self.evictions += len(evicted)
+        return delivered
+
+    #Ends every open stream, e.g. on shutdown so the server does not wait for clients to hang up
+    def close_all(self) -> None:
+        with self._lock:
+            subscriptions = [s for subscribers in self._topics.values() for s in subscribers]
+            self._topics = {}
+            self._count = 0
+        for subscription in subscriptions:
+            subscription._evict()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'subscribers': self._count,
+                'published': self.published,
+                'delivered': self.delivered,
+                'evictions': self.evictions,
+            }
+
+    def metric_lines(self) -> Iterable[str]:
+        stats = self.stats()
+        yield '# TYPE sports_sse_subscribers gauge'
+        yield f"sports_sse_subscribers {stats['subscribers']}"
+        for field in ('published', 'delivered', 'evictions'):
+            yield f'# TYPE sports_sse_{field}_total counter'
+            yield f'sports_sse_{field}_total {stats[field]}'
+
+
+#Shared by the Flask and FastAPI backends in this process, topics are database paths
+broker = Broker()
+
+#Sent first on every stream so the headers go out right away, retry is the client's reconnect delay in ms
+HELLO = 'retry: 3000\n: connected\n\n'
+PING = ': ping\n\n'
+
+
+#"created" with the new event in the /api/events format. Skips the query when nobody is listening
+def publish_event_created(db_path: str, conn: sqlite3.Connection, event_id: int) -> None:
+    if not broker.has_subscribers(db_path):
+        return
+    if recurrence.is_series(conn, event_id):
+        #Occurrences depend on each client's window, so clients sync instead
+        broker.publish(db_path, encode('changed', {'series': event_id}))
+        return
+    row = conn.execute(f'SELECT {CALENDAR_COLUMNS} FROM event e {CALENDAR_JOINS} WHERE e.event_id = ?',
+                       (event_id,)).fetchone()
+    if row is not None:
+        broker.publish(db_path, encode('created', dict(row)))
+
+
+#Bulk writes send one "changed" message instead of one per event, clients sync their window
+def publish_events_changed(db_path: str, inserted: int) -> None:
+    if inserted and broker.has_subscribers(db_path):
+        broker.publish(db_path, encode('changed', {'inserted': inserted}))
+
+
+#SSE body for a thread-per-connection server (Flask), ends when the subscriber is evicted
+def stream(subscription: Subscription, keepalive: float = KEEPALIVE) -> Iterable[str]:
+    try:
+        yield HELLO
+        while True:
+            message = subscription.get(keepalive)
+            yield PING if message is None else message.payload
+    except Evicted:
+        pass
+    finally:
+        subscription.close()
+
+
+async def stream_async(subscription: Subscription, keepalive: float = KEEPALIVE):
+    try:
+        yield HELLO
+        while True:
+            message = await subscription.get_async(keepalive)
+            yield PING if message is None else message.payload
+    except Evicted:
+        pass
+    finally:
+        subscription.close()
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('SPORTS_CACHE_ENTRIES', '512'))
+DEFAULT_TTL = float(os.environ.get('SPORTS_CACHE_TTL', '60'))
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    #Compressed copies of body by content coding, filled in by backend.wire as clients ask for them
+    encoded: Dict[str, bytes]
+
+
+def make_etag(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()
+
+
+#True when an If-None-Match header lists the (unquoted) etag, or is "*"
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """TTL + LRU cache of serialized responses, partitioned by database file.
+
+    Every write bumps the generation of its database, entries built under an older
+    generation are treated as misses, so invalidation is O(1).
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Tuple[str, Hashable], Tuple[float, int, CachedBody]]' = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self, db_path: str) -> int:
+        return self._generations.get(os.path.abspath(db_path), 0)
+
+    def invalidate(self, db_path: str) -> None:
+        key = os.path.abspath(db_path)
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    #Lookup without building, lets async callers answer hits without leaving the event loop
+    def peek(self, db_path: str, key: Hashable) -> Optional[CachedBody]:
+        db_path = os.path.abspath(db_path)
+        with self._lock:
+            entry = self._entries.get((db_path, key))
+            if entry is None or entry[0] <= time.monotonic() or entry[1] != self._generations.get(db_path, 0):
+                return None
+            self._entries.move_to_end((db_path, key))
+            self.hits += 1
+            return entry[2]
+
+    def get_or_build(self, db_path: str, key: Hashable,
+                     build: Callable[[], Tuple[bytes, Dict[str, str]]]) -> CachedBody:
+        db_path = os.path.abspath(db_path)
+        full_key = (db_path, key)
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generations.get(db_path, 0)
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] > now and entry[1] == generation:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        #Built outside the lock, concurrent misses for the same key may both build
+        body, headers = build()
+        return self.put(db_path, key, body, headers, generation)
+
+    #Stores a body built outside get_or_build, e.g. captured while streaming it.
+    #generation is the one read before building, nothing is stored if a write happened since
+    def put(self, db_path: str, key: Hashable, body: bytes, headers: Dict[str, str], generation: int) -> CachedBody:
+        db_path = os.path.abspath(db_path)
+        cached = CachedBody(body, make_etag(body), headers, {})
+        with self._lock:
+            if self._generations.get(db_path, 0) != generation:
+                return cached
+            self._entries[(db_path, key)] = (time.monotonic() + self.ttl, generation, cached)
+            self._entries.move_to_end((db_path, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return cached
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+#Shared by the Flask and FastAPI backends in this process
+response_cache = ResponseCache()
@@ -0,0 +1,269 @@
+"""Venue double-booking checks.
+
+An event occupies its venue from event_date + event_time for duration_minutes.
+Single inserts are checked with one seek in idx_event_venue_date_time: only
+events starting at most MAX_DURATION_MINUTES before the new end can overlap it.
+Bulk imports also keep the rows of the current chunk in a VenueSchedule per
+venue, and report() finds every overlapping pair with one sweep over the index.
+
+A recurring series occupies its venue at every occurrence. The series running
+at the venue during the checked window are expanded there, and a new series is
+checked occurrence by occurrence up to its last date, or DEFAULT_HORIZON_DAYS
+ahead when it has none.
+"""
+import bisect
+import datetime
+import heapq
+import os
+import sqlite3
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from backend import recurrence
+from backend.validation import (DEFAULT_DURATION_MINUTES, MAX_DURATION_MINUTES, EventFields,
+                                EventValidationError)
+
+#flag: insert and list the clashing events, reject: refuse the booking
+POLICIES = ('flag', 'reject')
+DEFAULT_POLICY = os.environ.get('SPORTS_CONFLICT_POLICY', 'flag')
+#Only the first pairs are kept in a report, the rest are just counted
+MAX_REPORTED_CONFLICTS = 1000
+
+INDEX = 'CREATE INDEX IF NOT EXISTS idx_event_venue_date_time ON event (venue_id_foreignkey, event_date, event_time)'
+
+_CANDIDATES = '''
+    SELECT event_id, event_date, event_time, duration_minutes
+    FROM event
+    WHERE venue_id_foreignkey = ? AND event_date BETWEEN ? AND ?
+      AND event_id NOT IN (SELECT event_id FROM event_recurrence)
+'''
+#Series at a venue that can have occurrences between two dates, the parameters are venue, last date, first date
+_SERIES = '''
+    SELECT e.event_id, e.event_date, e.event_time, e.duration_minutes, r.rrule, r.exdates
+    FROM event_recurrence r
+    JOIN event e ON e.event_id = r.event_id
+    WHERE e.venue_id_foreignkey = ? AND e.event_date <= ? AND (r.until_date IS NULL OR r.until_date >= ?)
+'''
+
+
+class BookingConflict(Exception):
+    def __init__(self, venue_id: int, event_ids: List[int]):
+        super().__init__(f"Venue {venue_id} is already booked by event {', '.join(str(i) for i in event_ids)}")
+        self.venue_id = venue_id
+        self.event_ids = event_ids
+
+
+#Adds duration_minutes and the venue index to databases created before them
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    columns = {r[1] for r in conn.execute('PRAGMA table_info(event)')}
+    if 'duration_minutes' not in columns:
+        conn.execute(f'ALTER TABLE event ADD COLUMN duration_minutes INTEGER NOT NULL '
+                     f'DEFAULT {DEFAULT_DURATION_MINUTES}')
+    conn.execute(INDEX)
+    conn.commit()
+
+
+def parse_policy(value: Optional[str]) -> str:
+    if not value:
+        return DEFAULT_POLICY
+    if value not in POLICIES:
+        raise EventValidationError(f"on_conflict must be one of: {', '.join(POLICIES)}")
+    return value
+
+
+#Start as minutes since 0001-01-01, None when the date or time is malformed
+def start_minute(event_date: str, event_time: str) -> Optional[int]:
+    try:
+        day = datetime.date.fromisoformat(str(event_date)[:10])
+        hour, minute = str(event_time).split(':')[:2]
+        return day.toordinal() * 1440 + int(hour) * 60 + int(minute)
+    except (TypeError, ValueError):
+        return None
+
+
+def _day(minute: int) -> str:
+    return datetime.date.fromordinal(minute // 1440).isoformat()
+
+
+def _next_day(minute: int) -> str:
+    return recurrence.days_after(_day(minute), 1)
+
+
+#Occurrence dates of a series in [start, end). Booking windows are one-off, so they stay out of the listing cache
+def _occurrences(rrule: str, dtstart: str, exdates: str, start: str, end: str) -> Tuple[str, ...]:
+    return recurrence.occurrences.__wrapped__(rrule, dtstart, exdates, start, end)
+
+
+def _series_at(conn: sqlite3.Connection, venue_id: int, start: int, end: int) -> List[Tuple]:
+    return conn.execute(_SERIES, (venue_id, _day(end - 1), _day(start - MAX_DURATION_MINUTES))).fetchall()
+
+
+def _plain_overlaps(conn: sqlite3.Connection, venue_id: int, start: int, end: int) -> List[int]:
+    rows = conn.execute(_CANDIDATES, (venue_id, _day(start - MAX_DURATION_MINUTES), _day(end - 1)))
+    overlaps = []
+    for event_id, event_date, event_time, duration in rows:
+        other = start_minute(event_date, event_time)
+        if other is not None and other < end and other + duration > start:
+            overlaps.append(event_id)
+    return overlaps
+
+
+def _series_overlaps(series: Iterable[Tuple], start: int, end: int) -> List[int]:
+    first, last = _day(start - MAX_DURATION_MINUTES), _next_day(end - 1)
+    overlaps = []
+    for event_id, event_date, event_time, duration, rrule, exdates in series:
+        for day in _occurrences(rrule, event_date, exdates, first, last):
+            other = start_minute(day, event_time)
+            if other is not None and other < end and other + duration > start:
+                overlaps.append(event_id)
+                break
+    return overlaps
+
+
+#Events at the venue overlapping [start, end): one index range scan, plus the venue's series expanded there
+def find_overlaps(conn: sqlite3.Connection, venue_id: int, start: int, end: int) -> List[int]:
+    series = _series_at(conn, venue_id, start, end)
+    return sorted(set(_plain_overlaps(conn, venue_id, start, end) + _series_overlaps(series, start, end)))
+
+
+#Events overlapping any occurrence of a new series at its venue
+def _series_booking_overlaps(conn: sqlite3.Connection, fields: EventFields, series: recurrence.Recurrence,
+                             start: int) -> List[int]:
+    if series.until_date is None:
+        end_day = recurrence.days_after(fields.event_date, recurrence.DEFAULT_HORIZON_DAYS)
+    else:
+        end_day = recurrence.days_after(series.until_date, 1)
+    days = _occurrences(series.rrule, fields.event_date, series.exdates, fields.event_date, end_day)
+    if not days:
+        return []
+    #The venue's series over the whole span, read once and expanded per occurrence
+    span_end = start_minute(days[-1], fields.event_time) + fields.duration_minutes
+    others = _series_at(conn, fields.venue_id, start, span_end)
+    overlaps = set()
+    for day in days:
+        occurrence = start_minute(day, fields.event_time)
+        occurrence_end = occurrence + fields.duration_minutes
+        overlaps.update(_plain_overlaps(conn, fields.venue_id, occurrence, occurrence_end))
+        overlaps.update(_series_overlaps(others, occurrence, occurrence_end))
+    return sorted(overlaps)
+
+
+#Conflicting event ids for a new booking, raises BookingConflict instead when the policy is reject.
+#series is the booking's recurrence, every occurrence is checked. Run it inside the inserting write
+#transaction so no other booking slips in between
+def check_booking(conn: sqlite3.Connection, fields: EventFields, policy: str = DEFAULT_POLICY,
+                  series: Optional[recurrence.Recurrence] = None) -> List[int]:
+    start = start_minute(fields.event_date, fields.event_time)
+    if start is None:
+        return []
+    if series is None:
+        overlaps = find_overlaps(conn, fields.venue_id, start, start + fields.duration_minutes)
+    else:
+        overlaps = _series_booking_overlaps(conn, fields, series, start)
+    if overlaps and policy == 'reject':
+        raise BookingConflict(fields.venue_id, overlaps)
+    return overlaps
+
+
+class VenueSchedule:
+    """Bookings of one venue sorted by start, for overlap lookups without the database."""
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.bookings: List[Tuple[int, int, object]] = []
+        self.longest = 0
+
+    def add(self, start: int, end: int, key: object) -> None:
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.bookings.insert(i, (start, end, key))
+        self.longest = max(self.longest, end - start)
+
+    #Keys of the bookings overlapping [start, end), only the ones starting within the longest booking are looked at
+    def overlaps(self, start: int, end: int) -> List[object]:
+        lo = bisect.bisect_right(self.starts, start - self.longest)
+        hi = bisect.bisect_left(self.starts, end)
+        return [key for other_start, other_end, key in self.bookings[lo:hi] if other_end > start]
+
+
+class Conflict(NamedTuple):
+    venue_id: int
+    event_id: int
+    other_event_id: int
+    overlap_minutes: int
+
+    def to_dict(self) -> Dict:
+        return self._asdict()
+
+
+#Every overlapping pair at the same venue, in calendar order, with a sweep over idx_event_venue_date_time.
+#The window filters by start date, so an event running into the window from the day before is not seen
+def report(conn: sqlite3.Connection, venue_id: Optional[int] = None, start_date: Optional[str] = None,
+           end_date: Optional[str] = None, max_reported: int = MAX_REPORTED_CONFLICTS) -> Dict:
+    where = []
+    params = []
+    if venue_id is not None:
+        where.append('venue_id_foreignkey = ?')
+        params.append(venue_id)
+    if start_date:
+        where.append('event_date >= ?')
+        params.append(start_date)
+    if end_date:
+        where.append('event_date < ?')
+        params.append(end_date)
+    query = 'SELECT venue_id_foreignkey, event_id, event_date, event_time, duration_minutes FROM event'
+    where.append('event_id NOT IN (SELECT event_id FROM event_recurrence)')
+    query += ' WHERE ' + ' AND '.join(where)
+    query += ' ORDER BY venue_id_foreignkey, event_date, event_time'
+    rows = heapq.merge(conn.execute(query, params), _series_rows(conn, venue_id, start_date, end_date),
+                       key=lambda row: (row[0], row[2], row[3]))
+
+    conflicts = []
+    total = 0
+    for conflict in _sweep(rows):
+        total += 1
+        if len(conflicts) < max_reported:
+            conflicts.append(conflict.to_dict())
+    return {'total': total, 'conflicts': conflicts}
+
+
+#One row per occurrence of the series in the window, shaped and sorted like the rows of report()'s query
+def _series_rows(conn: sqlite3.Connection, venue_id: Optional[int], start_date: Optional[str],
+                 end_date: Optional[str]) -> List[Tuple]:
+    start, end = recurrence.window(start_date, end_date)
+    query = '''
+        SELECT e.venue_id_foreignkey, e.event_id, e.event_date, e.event_time, e.duration_minutes, r.rrule, r.exdates
+        FROM event_recurrence r
+        JOIN event e ON e.event_id = r.event_id
+        WHERE e.event_date < ? AND (r.until_date IS NULL OR r.until_date >= ?)
+    '''
+    params = [end, start]
+    if venue_id is not None:
+        query += ' AND e.venue_id_foreignkey = ?'
+        params.append(venue_id)
+    rows = []
+    for venue, event_id, event_date, event_time, duration, rrule, exdates in conn.execute(query, params):
+        for day in recurrence.occurrences(rrule, event_date, exdates, start, end):
+            rows.append((venue, event_id, day, event_time, duration))
+    rows.sort(key=lambda row: (row[0], row[2], row[3]))
+    return rows
+
+
+def _sweep(rows: Iterable[sqlite3.Row]) -> Iterable[Conflict]:
+    venue = None
+    #Bookings still running at the current start, as a heap of (end, event_id)
+    active: List[Tuple[int, int]] = []
+    for venue_id, event_id, event_date, event_time, duration in rows:
+        start = start_minute(event_date, event_time)
+        if start is None:
+            continue
+        if venue_id != venue:
+            venue = venue_id
+            active = []
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        end = start + duration
+        for other_end, other_id in sorted(active, key=lambda a: a[1]):
+            #Occurrences of one series longer than its interval do not clash with each other
+            if other_id != event_id:
+                yield Conflict(venue_id, other_id, event_id, min(end, other_end) - start)
+        heapq.heappush(active, (end, event_id))
@@ -1,6 +1,22 @@
+import os
 import sqlite3
+from contextlib import contextmanager
+from backend import instrumentation, migrations, pool
 
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "sports.db")
+
+#Runs once per database file, the first time the pool opens a connection to it
+def init_db(conn: sqlite3.Connection) -> None:
+    migrations.migrate(conn)
+
+#Borrow a pooled connection, use it as "with get_db() as conn:" so it is always released.
+#A profiled request samples the borrowing thread meanwhile, see backend/instrumentation.py
+@contextmanager
 def get_db():
-    conn = sqlite3.connect("database/sports.db")
-    conn.row_factory = sqlite3.Row
-    return conn
\ No newline at end of file
+    with instrumentation.profiled_thread(), pool.connection(DB_PATH, init_db) as conn:
+        yield conn
+
+#Startup hook of the FastAPI apps: migrations run before the first request instead of during it
+def open_database() -> None:
+    with get_db():
+        pass
@@ -0,0 +1,467 @@
+"""Faceted event browsing: filter by sport, venue, city, team and date range and
+count the events behind every facet value.
+
+Each database gets one in-memory FacetIndex. Every event has a slot; slots are
+numbered in (date, time, id) order when the index is built, so a date range is
+a contiguous run of slots. Selections are big-int bitmaps over slots:
+
+- sport and city have few values and keep one bitmap per value, so counting
+  one value is an AND and a popcount;
+- venue and team have thousands of values and keep a posting list of slots
+  per value, their counts come from walking the matching slots;
+- totals per value are kept up to date as events are added and removed, an
+  unfiltered facet is answered straight from them.
+
+The index follows the event_change log that the write triggers maintain (see
+backend/sync.py): before answering it re-reads only the events changed since
+its revision. Changed events get new slots at the end (the unsorted tail) and
+their old slots are dropped from the live bitmap; once the tail or the dead
+slots grow past a 16th of the index it is rebuilt. A recurring event counts
+once, on the date of its first occurrence.
+"""
+import bisect
+import datetime
+import json
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter, defaultdict
+from heapq import merge, nsmallest
+from itertools import accumulate, chain, islice
+from typing import Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from backend import sync
+from backend.validation import check_window
+
+FACETS = ('sport', 'venue', 'city', 'team')
+#Values per facet in a response, ordered by count. Selected values are always listed
+DEFAULT_FACET_LIMIT = 20
+MAX_FACET_LIMIT = 1000
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+#Re-reading more changed events than this is slower than a rebuild
+MAX_CATCH_UP = 50000
+MIN_REBUILD_SLOTS = 1024
+BUILD_BATCH_SIZE = 50000
+
+#Unary + keeps SQLite off idx_event_date_time_id: sorting one sequential scan beats a table seek per row
+_EVENTS = '''
+    SELECT event_id, event_date, event_time, sport_id_foreignkey, venue_id_foreignkey
+    FROM event
+    ORDER BY +event_date, +event_time, event_id
+'''
+_VENUES = 'SELECT venue_id, city FROM venue'
+_PARTICIPANTS = 'SELECT event_id_foreignkey, team_id_foreignkey FROM event_participant'
+
+#The same columns for a few changed events, participants folded into one column
+_ROWS = '''
+    SELECT e.event_id, e.event_date, e.event_time, e.sport_id_foreignkey, e.venue_id_foreignkey, v.city,
+           (SELECT group_concat(DISTINCT ep.team_id_foreignkey)
+            FROM event_participant ep
+            WHERE ep.event_id_foreignkey = e.event_id)
+    FROM event e
+    LEFT JOIN venue v ON v.venue_id = e.venue_id_foreignkey
+    WHERE e.event_id IN (SELECT value FROM json_each(?))
+    ORDER BY e.event_date, e.event_time, e.event_id
+'''
+
+_LABELS = {
+    'sport': 'SELECT sport_id, name FROM sport WHERE sport_id IN (SELECT value FROM json_each(?))',
+    'venue': 'SELECT venue_id, name FROM venue WHERE venue_id IN (SELECT value FROM json_each(?))',
+    'team': 'SELECT team_id, name FROM team WHERE team_id IN (SELECT value FROM json_each(?))',
+}
+
+_ONES = re.compile('1')
+
+
+class Selection(NamedTuple):
+    sport_ids: FrozenSet[int] = frozenset()
+    venue_ids: FrozenSet[int] = frozenset()
+    cities: FrozenSet[str] = frozenset()
+    team_ids: FrozenSet[int] = frozenset()
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+
+class Page(NamedTuple):
+    total: int
+    event_ids: List[int]
+    facets: Dict[str, List[Dict]]
+
+
+#Dates are YYYY-MM-DD, end is the day after the last date like everywhere else
+def parse_selection(sport_ids: Iterable[int] = (), venue_ids: Iterable[int] = (), cities: Iterable[str] = (),
+                    team_ids: Iterable[int] = (), start: Optional[str] = None, end: Optional[str] = None) -> Selection:
+    check_window(start, end)
+    return Selection(frozenset(sport_ids), frozenset(venue_ids), frozenset(c for c in cities if c),
+                     frozenset(team_ids), start or None, end or None)
+
+
+def clamp(value: Optional[int], default: int, maximum: int) -> int:
+    if not value or value < 1:
+        return default
+    return min(value, maximum)
+
+
+def _ordinal(value: Optional[str]) -> int:
+    try:
+        return datetime.date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+def _minute(value: Optional[str]) -> int:
+    try:
+        hours, minutes = value.split(':')[:2]
+        return int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        return 0
+
+
+#Set bits of a bitmap in ascending order, bin() and the regex scan both run in C
+def _members(mask: int) -> Iterator[int]:
+    return (m.start() for m in _ONES.finditer(bin(mask)[:1:-1]))
+
+
+def _bitmap(slots: Iterable[int], size: int) -> int:
+    bits = bytearray((size >> 3) + 1)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _span(lo: int, hi: int) -> int:
+    return ((1 << hi) - 1) ^ ((1 << lo) - 1) if hi > lo else 0
+
+
+class FacetIndex:
+    """Columns, bitmaps and posting lists over the events of one database, see the module docstring."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.revision = -1
+        self._reset()
+
+    def _reset(self) -> None:
+        self.event_id = array('i')
+        self.day = array('i')
+        self.minute = array('i')
+        self.values = {'sport': array('i'), 'venue': array('i'), 'city': array('i')}
+        self.team_start = array('i', [0])
+        self.teams = array('i')
+        #Slot per event id, -1 for ids without one. An array, a dict of a million ints costs ~100 MB
+        self.slot_of = array('i')
+        self.sorted_end = 0
+        self.sorted_mask = 0
+        self.dead = 0
+        self.live = 0
+        self.bits: Dict[str, Dict[int, int]] = {'sport': {}, 'city': {}}
+        self.postings: Dict[str, Dict[int, array]] = {'venue': {}, 'team': {}}
+        self.totals: Dict[str, Counter] = {facet: Counter() for facet in FACETS}
+        self.city_ids: Dict[str, int] = {}
+        self.city_names: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.event_id) - self.dead
+
+    def city_values(self, cities: Iterable[str]) -> List[int]:
+        return [self.city_ids[c] for c in cities if c in self.city_ids]
+
+    def _city(self, name: Optional[str]) -> int:
+        city = self.city_ids.get(name or '')
+        if city is None:
+            city = self.city_ids[name or ''] = len(self.city_names)
+            self.city_names.append(name or '')
+        return city
+
+    #Appends one (event_id, date, time, sport, venue, city, teams) row and returns its slot
+    def _append(self, row: Tuple) -> int:
+        event_id, event_date, event_time, sport_id, venue_id, city, teams = row
+        slot = len(self.event_id)
+        if event_id >= len(self.slot_of):
+            self.slot_of.extend(array('i', [-1]) * max(event_id + 1 - len(self.slot_of), len(self.slot_of)))
+        self.slot_of[event_id] = slot
+        self.event_id.append(event_id)
+        self.day.append(_ordinal(event_date))
+        self.minute.append(_minute(event_time))
+        team_ids = [int(t) for t in teams.split(',')] if teams else []
+        self.teams.extend(team_ids)
+        self.team_start.append(len(self.teams))
+        for facet, value in (('sport', sport_id or 0), ('venue', venue_id or 0), ('city', self._city(city))):
+            self.values[facet].append(value)
+            self.totals[facet][value] += 1
+        self.postings['venue'].setdefault(venue_id or 0, array('i')).append(slot)
+        for team_id in team_ids:
+            self.postings['team'].setdefault(team_id, array('i')).append(slot)
+            self.totals['team'][team_id] += 1
+        return slot
+
+    def _teams_of(self, slot: int) -> array:
+        return self.teams[self.team_start[slot]:self.team_start[slot + 1]]
+
+    def _remove(self, event_id: int) -> None:
+        slot = self.slot_of[event_id] if event_id < len(self.slot_of) else -1
+        if slot < 0:
+            return
+        self.slot_of[event_id] = -1
+        self.live &= ~(1 << slot)
+        self.dead += 1
+        for facet, column in self.values.items():
+            self._decrement(facet, column[slot])
+        for team_id in self._teams_of(slot):
+            self._decrement('team', team_id)
+
+    def _decrement(self, facet: str, value: int) -> None:
+        totals = self.totals[facet]
+        totals[value] -= 1
+        if totals[value] <= 0:
+            del totals[value]
+
+    def build(self, conn: sqlite3.Connection) -> None:
+        #Changes after this revision are applied again by the next refresh, which is harmless
+        revision = sync.current_revision(conn)
+        self._reset()
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        venue_city = defaultdict(lambda: self._city(None),
+                                 {venue_id: self._city(city) for venue_id, city in cursor.execute(_VENUES)})
+        days: Dict[str, int] = {}
+        minutes: Dict[str, int] = {}
+        cursor.execute(_EVENTS)
+        #A batch of columns at a time: a Python call per event would dominate the build, a
+        #million row tuples at once would dominate its memory
+        for rows in iter(lambda: cursor.fetchmany(BUILD_BATCH_SIZE), []):
+            ids, dates, times, sports, venues = zip(*rows)
+            days.update((value, _ordinal(value)) for value in set(dates).difference(days))
+            minutes.update((value, _minute(value)) for value in set(times).difference(minutes))
+            self.event_id.extend(ids)
+            self.day.extend(map(days.__getitem__, dates))
+            self.minute.extend(map(minutes.__getitem__, times))
+            self.values['sport'].extend(value or 0 for value in sports)
+            self.values['venue'].extend(value or 0 for value in venues)
+            self.values['city'].extend(map(venue_city.__getitem__, venues))
+        size = len(self.event_id)
+        self.slot_of = array('i', [-1]) * (max(self.event_id, default=0) + 1)
+        for slot, event_id in enumerate(self.event_id):
+            self.slot_of[event_id] = slot
+        for facet, column in self.values.items():
+            self.totals[facet] = Counter(column)
+        self._build_teams(cursor, size)
+        postings = defaultdict(list)
+        for slot, venue_id in enumerate(self.values['venue']):
+            postings[venue_id].append(slot)
+        self.postings['venue'] = {value: array('i', slots) for value, slots in postings.items()}
+
+        self.sorted_end = size
+        self.sorted_mask = self.live = _span(0, size)
+        #One pass per bitmap facet, setting bits in a bytearray is far cheaper than growing ints
+        for facet, bits in self.bits.items():
+            buffers: Dict[int, bytearray] = {}
+            for slot, value in enumerate(self.values[facet]):
+                buffer = buffers.get(value)
+                if buffer is None:
+                    buffer = buffers[value] = bytearray((size >> 3) + 1)
+                buffer[slot >> 3] |= 1 << (slot & 7)
+            bits.update((value, int.from_bytes(buffer, 'little')) for value, buffer in buffers.items())
+        self.revision = revision
+
+    #Teams per slot, laid out like a CSR matrix: a counting sort of the participants by slot
+    def _build_teams(self, cursor: sqlite3.Cursor, size: int) -> None:
+        slots, teams = array('i'), array('i')
+        for event_id, team_id in cursor.execute(_PARTICIPANTS):
+            slot = self.slot_of[event_id] if 0 <= event_id < len(self.slot_of) else -1
+            if slot >= 0:
+                slots.append(slot)
+                teams.append(team_id)
+        counts = array('i', [0]) * (size + 1)
+        for slot in slots:
+            counts[slot + 1] += 1
+        start = array('i', accumulate(counts))
+        fill = array('i', start)
+        layout = array('i', [0]) * len(teams)
+        postings = defaultdict(list)
+        duplicates = False
+        for slot, team_id in zip(slots, teams):
+            position = fill[slot]
+            #Two players of the same team still make one event for that team
+            if team_id in layout[start[slot]:position]:
+                duplicates = True
+                continue
+            layout[position] = team_id
+            fill[slot] = position + 1
+            postings[team_id].append(slot)
+        if duplicates:
+            kept = [layout[start[slot]:fill[slot]] for slot in range(size)]
+            layout = array('i', chain.from_iterable(kept))
+            start = array('i', accumulate(map(len, kept), initial=0))
+        self.teams, self.team_start = layout, start
+        self.totals['team'] = Counter(layout)
+        self.postings['team'] = {value: array('i', slots) for value, slots in postings.items()}
+
+    #Brings the index up to the latest revision of the change log
+    def refresh(self, conn: sqlite3.Connection) -> None:
+        latest = sync.current_revision(conn)
+        if latest == self.revision:
+            return
+        #Never built, or the database went back in time (e.g. a restore)
+        if self.revision < 0 or latest < self.revision:
+            self.build(conn)
+            return
+        changed = [r[0] for r in conn.execute('SELECT event_id FROM event_change WHERE revision > ? LIMIT ?',
+                                              (self.revision, MAX_CATCH_UP + 1))]
+        if len(changed) > MAX_CATCH_UP:
+            self.build(conn)
+            return
+        for event_id in changed:
+            self._remove(event_id)
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        for row in cursor.execute(_ROWS, (json.dumps(changed),)):
+            slot = self._append(row)
+            self.live |= 1 << slot
+            for facet, bits in self.bits.items():
+                value = self.values[facet][slot]
+                bits[value] = bits.get(value, 0) | (1 << slot)
+        self.revision = latest
+        if len(self.event_id) - self.sorted_end + self.dead > max(MIN_REBUILD_SLOTS, len(self.event_id) // 16):
+            self.build(conn)
+
+    def _date_mask(self, start: Optional[str], end: Optional[str]) -> int:
+        first = _ordinal(start) if start else None
+        last = _ordinal(end) if end else None
+        lo = bisect.bisect_left(self.day, first, 0, self.sorted_end) if first is not None else 0
+        hi = bisect.bisect_left(self.day, last, 0, self.sorted_end) if last is not None else self.sorted_end
+        tail = (slot for slot in range(self.sorted_end, len(self.event_id))
+                if (first is None or self.day[slot] >= first) and (last is None or self.day[slot] < last))
+        return _span(lo, hi) | _bitmap(tail, len(self.event_id))
+
+    def _filter_masks(self, selection: Selection) -> Dict[str, int]:
+        size = len(self.event_id)
+        #Unknown cities select nothing, they are not dropped from the filter
+        chosen = {'sport': selection.sport_ids, 'venue': selection.venue_ids, 'team': selection.team_ids,
+                  'city': self.city_values(selection.cities)}
+        masks = {}
+        for facet in FACETS:
+            if not (selection.cities if facet == 'city' else chosen[facet]):
+                continue
+            if facet in self.bits:
+                mask = 0
+                for value in chosen[facet]:
+                    mask |= self.bits[facet].get(value, 0)
+            else:
+                postings = self.postings[facet]
+                mask = _bitmap(chain.from_iterable(postings.get(v, ()) for v in chosen[facet]), size)
+            masks[facet] = mask
+        return masks
+
+    def _count(self, facet: str, mask: int) -> Counter:
+        if facet in self.bits:
+            counts = Counter()
+            for value, bits in self.bits[facet].items():
+                count = (bits & mask).bit_count()
+                if count:
+                    counts[value] = count
+            return counts
+        #Events added since the build sit past sorted_end, they are walked on their own
+        head = mask & self.sorted_mask
+        counts = self._walk(facet, mask ^ head) if mask != head else Counter()
+        if not head:
+            return counts
+        #A date window is one run of sorted slots: count the run with C-level slices and walk
+        #only the slots inside it that the mask leaves out, when they are the smaller side
+        lo, hi = (head & -head).bit_length() - 1, head.bit_length()
+        outside = _span(lo, hi) & ~head
+        if outside.bit_count() < head.bit_count():
+            run = self._slice(facet, lo, hi)
+            run.subtract(self._walk(facet, outside))
+            counts.update(+run)
+        else:
+            counts.update(self._walk(facet, head))
+        return counts
+
+    def _slice(self, facet: str, lo: int, hi: int) -> Counter:
+        if facet == 'venue':
+            return Counter(self.values['venue'][lo:hi])
+        return Counter(self.teams[self.team_start[lo]:self.team_start[hi]])
+
+    def _walk(self, facet: str, mask: int) -> Counter:
+        if facet == 'venue':
+            return Counter(map(self.values['venue'].__getitem__, _members(mask)))
+        return Counter(chain.from_iterable(map(self._teams_of, _members(mask))))
+
+    def _ordered(self, mask: int) -> Iterator[int]:
+        #Sorted slots are in date order already, the tail is sorted on the fly
+        head = _members(mask & self.sorted_mask)
+        tail = sorted(_members(mask >> self.sorted_end << self.sorted_end),
+                      key=lambda s: (self.day[s], self.minute[s], self.event_id[s]))
+        return merge(head, tail, key=lambda s: (self.day[s], self.minute[s], self.event_id[s]))
+
+    #(total, event ids of the page in date order, counts per facet). Each facet is counted with the
+    #other facets' filters only, so picking a sport still shows how many events the other sports have
+    def select(self, selection: Selection, offset: int, limit: int) -> Tuple[int, List[int], Dict[str, Counter]]:
+        masks = self._filter_masks(selection)
+        dated = bool(selection.start or selection.end)
+        base = self.live & self._date_mask(selection.start, selection.end) if dated else self.live
+        matching = base
+        for mask in masks.values():
+            matching &= mask
+
+        counts = {}
+        for facet in FACETS:
+            others = [mask for other, mask in masks.items() if other != facet]
+            if not others and not dated:
+                #Copied, the caller reads it after the lock is released
+                counts[facet] = self.totals[facet].copy()
+                continue
+            mask = base
+            for other in others:
+                mask &= other
+            counts[facet] = self._count(facet, mask)
+
+        page = [self.event_id[slot] for slot in islice(self._ordered(matching), offset, offset + limit)]
+        return matching.bit_count(), page, counts
+
+
+_indexes: Dict[str, FacetIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+#One index per database file, keyed by the path SQLite reports for the connection
+def index_for(conn: sqlite3.Connection) -> FacetIndex:
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = FacetIndex()
+    return index
+
+
+def _values(conn: sqlite3.Connection, facet: str, counts: Counter, selected: Iterable, limit: int,
+            names: Optional[Dict] = None) -> List[Dict]:
+    selected = set(selected)
+    top = nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+    listed = {value for value, _ in top}
+    top.extend((value, counts.get(value, 0)) for value in sorted(selected - listed))
+    if names is None:
+        ids = [value for value, _ in top]
+        names = dict(conn.execute(_LABELS[facet], (json.dumps(ids),)).fetchall()) if ids else {}
+    return [{'id': value, 'name': names.get(value), 'count': count, 'selected': value in selected}
+            for value, count in top]
+
+
+def browse(conn: sqlite3.Connection, selection: Selection, offset: int = 0, limit: int = DEFAULT_PAGE_SIZE,
+           facet_limit: int = DEFAULT_FACET_LIMIT) -> Page:
+    index = index_for(conn)
+    with index.lock:
+        index.refresh(conn)
+        total, event_ids, counts = index.select(selection, offset, limit)
+        city_names = list(index.city_names)
+    #Cities are their own ids, counted by name from here on
+    counts['city'] = Counter({city_names[value]: count for value, count in counts['city'].items()})
+    selected = {'sport': selection.sport_ids, 'venue': selection.venue_ids, 'city': selection.cities,
+                'team': selection.team_ids}
+    facets = {facet: _values(conn, facet, counts[facet], selected[facet], facet_limit,
+                             {name: name for name in chain(city_names, selection.cities)} if facet == 'city' else None)
+              for facet in FACETS}
+    return Page(total, event_ids, facets)
@@ -0,0 +1,238 @@
+"""iCalendar (RFC 5545) subscription feeds per sport, venue or team.
+
+Feeds are rendered straight off the cursor in batches, so memory stays flat
+whatever the feed size. The ETag and Last-Modified come from the newest entry
+in the change log (backend/sync.py), which lets polling calendar clients be
+answered with 304 after two index lookups. Renaming a sport or venue touches its
+events in the change log, but a team rename, or a rename of anything without
+events, does not, so the calendar name is part of the ETag as well. Feeds up to
+CACHE_MAX_BYTES are kept in the response cache, keyed by both.
+"""
+import email.utils
+import os
+import sqlite3
+import time
+import zlib
+from typing import Callable, ContextManager, Dict, Iterator, NamedTuple, Optional, Tuple, Union
+
+from backend import sync
+from backend.cache import etag_matches, response_cache
+
+CACHE_MAX_BYTES = int(os.environ.get('SPORTS_ICS_CACHE_BYTES', str(1024 * 1024)))
+BATCH_SIZE = 500
+PRODID = '-//SportsCalendar//Event feed//EN'
+UID_DOMAIN = 'sportscalendar'
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
+#kind -> (name lookup, event filter), both take the feed id as their only parameter
+FEEDS = {
+    'sport': ('SELECT name FROM sport WHERE sport_id = ?', 'e.sport_id_foreignkey = ?'),
+    'venue': ('SELECT name FROM venue WHERE venue_id = ?', 'e.venue_id_foreignkey = ?'),
+    'team': ('SELECT name FROM team WHERE team_id = ?',
+             'e.event_id IN (SELECT event_id_foreignkey FROM event_participant WHERE team_id_foreignkey = ?)'),
+}
+ALL_EVENTS_NAME = 'All events'
+
+_FEED_QUERY = '''
+    SELECT e.event_id, e.event_date, e.event_time, e.duration_minutes, e.description,
+           s.name AS sport_name, v.name AS venue_name, v.city AS venue_city,
+           (SELECT group_concat(ep.participant_name, ', ')
+            FROM event_participant ep
+            WHERE ep.event_id_foreignkey = e.event_id) AS participants,
+           r.rrule, r.exdates
+    FROM event e
+    LEFT JOIN sport s ON e.sport_id_foreignkey = s.sport_id
+    LEFT JOIN venue v ON e.venue_id_foreignkey = v.venue_id
+    LEFT JOIN event_recurrence r ON r.event_id = e.event_id
+    WHERE {where}
+    ORDER BY e.event_date, e.event_time, e.event_id
+'''
+
+
+def escape_text(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n'))
+
+
+#Content lines are folded at 75 octets, continuation lines start with a space
+def fold(line: str) -> str:
+    if len(line) <= 75 and line.isascii():
+        return line + '\r\n'
+    parts = []
+    current = []
+    size = 0
+    for ch in line:
+        width = len(ch.encode('utf-8'))
+        if size + width > 75:
+            parts.append(''.join(current))
+            current = [' ']
+            size = 1
+        current.append(ch)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def _utc_stamp(timestamp: Optional[int]) -> str:
+    return time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(timestamp or 0))
+
+
+#DTSTART as local ("floating") time, the schema stores no time zone. None for malformed rows
+def _dtstart(event_date: str, event_time: str) -> Optional[str]:
+    day = str(event_date or '').replace('-', '')
+    if len(day) != 8 or not day.isdigit():
+        return None
+    clock = str(event_time or '').replace(':', '')
+    if not clock:
+        return f'DTSTART;VALUE=DATE:{day}'
+    clock = clock.ljust(6, '0')[:6]
+    if not clock.isdigit():
+        return None
+    return f'DTSTART:{day}T{clock}'
+
+
+def _vevent(row: sqlite3.Row, dtstamp: str) -> str:
+    dtstart = _dtstart(row['event_date'], row['event_time'])
+    if dtstart is None:
+        return ''
+    summary = f"{row['sport_name'] or 'Event'} @ {row['venue_name'] or 'Venue'}"
+    if row['participants']:
+        summary += f" ({row['participants']})"
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:event-{row['event_id']}@{UID_DOMAIN}",
+        f'DTSTAMP:{dtstamp}',
+        dtstart,
+        f"DURATION:PT{row['duration_minutes']}M",
+        f'SUMMARY:{escape_text(summary)}',
+    ]
+    #Series are sent as one VEVENT with their rule, calendar clients expand them
+    if row['rrule']:
+        lines.append(f"RRULE:{row['rrule']}")
+        if row['exdates']:
+            name, value = dtstart.split(':', 1)
+            clock = value[8:]
+            lines.append(name.replace('DTSTART', 'EXDATE') + ':'
+                         + ','.join(d.replace('-', '') + clock for d in row['exdates'].split(',')))
+    if row['venue_name']:
+        location = row['venue_name'] + (f", {row['venue_city']}" if row['venue_city'] else '')
+        lines.append(f'LOCATION:{escape_text(location)}')
+    if row['description']:
+        lines.append(f"DESCRIPTION:{escape_text(row['description'])}")
+    if row['sport_name']:
+        lines.append(f"CATEGORIES:{escape_text(row['sport_name'])}")
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def feed_query(kind: str, feed_id: Optional[int]) -> Tuple[str, tuple]:
+    if kind == 'all':
+        return _FEED_QUERY.format(where='1'), ()
+    return _FEED_QUERY.format(where=FEEDS[kind][1]), (feed_id,)
+
+
+#Calendar name for the feed, None when the sport/venue/team does not exist
+def feed_name(conn: sqlite3.Connection, kind: str, feed_id: Optional[int]) -> Optional[str]:
+    if kind == 'all':
+        return ALL_EVENTS_NAME
+    row = conn.execute(FEEDS[kind][0], (feed_id,)).fetchone()
+    return row[0] if row is not None else None
+
+
+#The feed as UTF-8 chunks, one per batch of events
+def render(conn: sqlite3.Connection, kind: str, feed_id: Optional[int], name: str,
+           changed_at: Optional[int]) -> Iterator[bytes]:
+    dtstamp = _utc_stamp(changed_at)
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+    )).encode('utf-8')
+    cur = conn.execute(*feed_query(kind, feed_id))
+    while True:
+        rows = cur.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        yield ''.join(_vevent(row, dtstamp) for row in rows).encode('utf-8')
+    yield b'END:VCALENDAR\r\n'
+
+
+class Feed(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: Union[bytes, Iterator[bytes]]
+
+
+def _not_modified(if_none_match: Optional[str], if_modified_since: Optional[str], etag: str,
+                  changed_at: Optional[int]) -> bool:
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if if_modified_since and changed_at:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return changed_at <= since
+    return False
+
+
+#Renders while streaming and keeps a copy for the cache until the feed outgrows CACHE_MAX_BYTES
+def _stream_and_cache(db_path: str, key: tuple, connect: Callable[[], ContextManager[sqlite3.Connection]],
+                      kind: str, feed_id: Optional[int], name: str, changed_at: Optional[int]) -> Iterator[bytes]:
+    generation = response_cache.generation(db_path)
+    captured = []
+    size = 0
+    with connect() as conn:
+        for chunk in render(conn, kind, feed_id, name, changed_at):
+            if captured is not None:
+                size += len(chunk)
+                captured.append(chunk)
+                if size > CACHE_MAX_BYTES:
+                    captured = None
+            yield chunk
+    if captured is not None:
+        response_cache.put(db_path, key, b''.join(captured), {}, generation)
+
+
+#(calendar name, revision, changed_at) for a feed, None when the sport/venue/team does not exist
+def feed_state(conn: sqlite3.Connection, kind: str, feed_id: Optional[int]) -> Optional[Tuple[str, int, Optional[int]]]:
+    name = feed_name(conn, kind, feed_id)
+    if name is None:
+        return None
+    return (name,) + sync.latest_change(conn)
+
+
+#Conditional GET, cache lookup and streaming for one feed. None when the sport/venue/team does not exist.
+#connect() borrows a pooled connection, like db_connection() in the Flask app or db.get_db() in FastAPI.
+#Async callers look up state with feed_state() on their own executor and pass it in
+def open_feed(db_path: str, connect: Callable[[], ContextManager[sqlite3.Connection]], kind: str,
+              feed_id: Optional[int], if_none_match: Optional[str] = None, if_modified_since: Optional[str] = None,
+              state: Optional[Tuple[str, int, Optional[int]]] = None) -> Optional[Feed]:
+    if state is None:
+        with connect() as conn:
+            state = feed_state(conn, kind, feed_id)
+        if state is None:
+            return None
+    name, revision, changed_at = state
+
+    etag = f'ics-{revision}-{zlib.crc32(name.encode("utf-8")):08x}'
+    filename = kind if feed_id is None else f'{kind}-{feed_id}'
+    headers = {
+        'ETag': f'"{etag}"',
+        #Clients may keep the feed but have to revalidate it
+        'Cache-Control': 'no-cache',
+        'Content-Disposition': f'inline; filename="{filename}.ics"',
+    }
+    if changed_at:
+        headers['Last-Modified'] = email.utils.formatdate(changed_at, usegmt=True)
+    if _not_modified(if_none_match, if_modified_since, etag, changed_at):
+        return Feed(304, headers, b'')
+
+    key = ('ics', kind, feed_id, revision, name)
+    cached = response_cache.peek(db_path, key)
+    if cached is not None:
+        return Feed(200, headers, cached.body)
+    return Feed(200, headers, _stream_and_cache(db_path, key, connect, kind, feed_id, name, changed_at))
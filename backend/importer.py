@@ -0,0 +1,276 @@
+"""Bulk event loader.
+
+Reads JSON Lines or CSV as a stream and writes events plus their participants with
+executemany in chunked transactions, so memory stays bounded by the chunk size.
+
+    python -m backend.importer season.jsonl
+    python -m backend.importer season.csv --format csv --db database/sports.db
+"""
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from backend import conflicts, recurrence, search, sync
+from backend.validation import EventFields, EventValidationError, validate_event
+
+DEFAULT_CHUNK_SIZE = 5000
+#Only the first errors are kept in the report, the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+#A record is (row number, parsed dict) or (row number, error message) when it could not be parsed
+Record = Tuple[int, object]
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.conflicts: List[Dict] = []
+
+    def add_error(self, row: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'error': error})
+
+    #Rows inserted although they overlap another booking, with the event ids and earlier rows they clash with
+    def add_conflict(self, row: int, event_ids: List[int], rows: List[int]) -> None:
+        if len(self.conflicts) < MAX_REPORTED_ERRORS:
+            self.conflicts.append({'row': row, 'event_ids': event_ids, 'rows': rows})
+
+    def to_dict(self) -> Dict:
+        return {'inserted': self.inserted, 'failed': self.failed, 'errors': self.errors, 'conflicts': self.conflicts}
+
+
+def iter_jsonl(stream: TextIO) -> Iterator[Record]:
+    for row, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield row, f'Invalid JSON: {e}'
+            continue
+        yield row, data if isinstance(data, dict) else 'Expected a JSON object'
+
+
+#CSV columns match the JSON field names, participants and exdates are separated by ";"
+def iter_csv(stream: TextIO) -> Iterator[Record]:
+    reader = csv.DictReader(stream)
+    for row, data in enumerate(reader, start=2):
+        names = data.pop('participants', None) or ''
+        data['participants'] = [n.strip() for n in names.split(';') if n.strip()]
+        if not data.get('description'):
+            data['description'] = None
+        yield row, data
+
+
+def read_records(stream: TextIO, fmt: str = 'jsonl') -> Iterator[Record]:
+    if fmt == 'csv':
+        return iter_csv(stream)
+    if fmt == 'jsonl':
+        return iter_jsonl(stream)
+    raise ValueError(f'Unknown import format: {fmt}')
+
+
+def load_teams(conn: sqlite3.Connection) -> Dict[str, int]:
+    return {r[0]: r[1] for r in conn.execute('SELECT name, team_id FROM team')}
+
+
+#Participants are team names, or {"name": ..., "team_id": ...} when the display name differs from the team
+def resolve_participants(data: Dict, teams: Dict[str, int]) -> List[Tuple[str, int]]:
+    resolved = []
+    seen = set()
+    for participant in data.get('participants') or []:
+        if isinstance(participant, dict):
+            name = participant.get('name') or participant.get('participant_name')
+            team_id = participant.get('team_id') or participant.get('team_id_foreignkey')
+            if team_id is None:
+                team_id = teams.get(name)
+        else:
+            name = participant
+            team_id = teams.get(participant)
+        if not name:
+            raise EventValidationError('Participant without a name')
+        if team_id is None:
+            raise EventValidationError(f'Unknown team: {name}')
+        try:
+            team_id = int(team_id)
+        except (TypeError, ValueError):
+            raise EventValidationError(f'Invalid team_id for {name}')
+        if name in seen:
+            raise EventValidationError(f'Duplicate participant: {name}')
+        seen.add(name)
+        resolved.append((name, team_id))
+    return resolved
+
+
+def _next_event_id(conn: sqlite3.Connection) -> int:
+    row = conn.execute('''
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'event'), 0),
+                   COALESCE((SELECT MAX(event_id) FROM event), 0))
+    ''').fetchone()
+    return row[0] + 1
+
+
+def _insert_chunk(conn: sqlite3.Connection,
+                  chunk: List[Tuple[int, EventFields, List[Tuple[str, int]], Optional[recurrence.Recurrence]]]) -> None:
+    #Explicit ids inside one write transaction, so participants can be batched without lastrowid round trips
+    first_id = _next_event_id(conn)
+    events = []
+    participants = []
+    series = []
+    for offset, (_, fields, people, rule) in enumerate(chunk):
+        event_id = first_id + offset
+        events.append((event_id,) + tuple(fields))
+        participants.extend((event_id, name, team_id) for name, team_id in people)
+        if rule:
+            series.append((event_id, rule))
+    #Per-row FTS and change log triggers would dominate the cost, the chunk is recorded in one pass instead
+    fts = search.suspend_triggers(conn)
+    changes = sync.suspend_triggers(conn)
+    conn.executemany('''
+        INSERT INTO event (event_id, sport_id_foreignkey, venue_id_foreignkey, event_date, event_time, description,
+                           duration_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', events)
+    if participants:
+        conn.executemany('''
+            INSERT INTO event_participant (event_id_foreignkey, participant_name, team_id_foreignkey)
+            VALUES (?, ?, ?)
+        ''', participants)
+    if series:
+        recurrence.insert_recurrences(conn, series)
+    if fts:
+        search.resume_triggers(conn, first_id, first_id + len(chunk) - 1)
+    if changes:
+        sync.resume_triggers(conn, first_id, first_id + len(chunk) - 1)
+
+
+def _insert_rows_one_by_one(conn: sqlite3.Connection, chunk, result: ImportResult) -> None:
+    #Slow path after a failed batch, isolates the offending rows with savepoints
+    for entry in chunk:
+        row = entry[0]
+        conn.execute('SAVEPOINT import_row')
+        try:
+            _insert_chunk(conn, [entry])
+            conn.execute('RELEASE import_row')
+            result.inserted += 1
+        except sqlite3.DatabaseError as e:
+            conn.execute('ROLLBACK TO import_row')
+            conn.execute('RELEASE import_row')
+            result.add_error(row, str(e))
+
+
+#Checks the chunk against the stored events (index seeks) and against its own earlier rows (in memory).
+#Returns the rows to insert, conflicting rows are dropped as errors or kept and reported depending on the policy
+def _check_conflicts(conn: sqlite3.Connection, chunk, policy: str, result: ImportResult):
+    schedules: Dict[int, conflicts.VenueSchedule] = {}
+    accepted = []
+    for entry in chunk:
+        row, fields = entry[0], entry[1]
+        start = conflicts.start_minute(fields.event_date, fields.event_time)
+        if start is None:
+            accepted.append(entry)
+            continue
+        end = start + fields.duration_minutes
+        schedule = schedules.setdefault(fields.venue_id, conflicts.VenueSchedule())
+        #Every occurrence of a series against the database, rows of the chunk only at its first one
+        event_ids = conflicts.check_booking(conn, fields, 'flag', entry[3])
+        rows = schedule.overlaps(start, end)
+        if event_ids or rows:
+            if policy == 'reject':
+                clashes = [f'event {i}' for i in event_ids] + [f'row {r}' for r in rows]
+                result.add_error(row, f"Venue {fields.venue_id} is already booked by {', '.join(clashes)}")
+                continue
+            result.add_conflict(row, event_ids, rows)
+        schedule.add(start, end, row)
+        accepted.append(entry)
+    return accepted
+
+
+def import_events(conn: sqlite3.Connection, records: Iterable[Record],
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, on_conflict: str = conflicts.DEFAULT_POLICY) -> ImportResult:
+    result = ImportResult()
+    chunk_size = max(1, chunk_size)
+    teams = load_teams(conn)
+    records = iter(records)
+
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            break
+        chunk = []
+        for row, data in batch:
+            if not isinstance(data, dict):
+                result.add_error(row, str(data))
+                continue
+            try:
+                fields = validate_event(data)
+                chunk.append((row, fields, resolve_participants(data, teams),
+                              recurrence.parse_recurrence(data, fields.event_date)))
+            except EventValidationError as e:
+                result.add_error(row, str(e))
+        if not chunk:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            chunk = _check_conflicts(conn, chunk, on_conflict, result)
+            if not chunk:
+                conn.rollback()
+                continue
+            _insert_chunk(conn, chunk)
+            conn.commit()
+            result.inserted += len(chunk)
+        except sqlite3.DatabaseError:
+            conn.rollback()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                _insert_rows_one_by_one(conn, chunk, result)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        except Exception:
+            conn.rollback()
+            raise
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from backend import pool
+    from backend.db import DB_PATH, init_db
+
+    parser = argparse.ArgumentParser(description='Bulk import events from JSON Lines or CSV.')
+    parser.add_argument('path', help='input file, or - for stdin')
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help='defaults to the file extension')
+    parser.add_argument('--db', default=DB_PATH, help='SQLite database to import into')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--on-conflict', choices=conflicts.POLICIES, default=conflicts.DEFAULT_POLICY,
+                        help='flag (import and report) or reject rows that double-book a venue')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'jsonl')
+    stream = sys.stdin if args.path == '-' else open(args.path, 'r', encoding='utf-8', newline='')
+    try:
+        with pool.connection(args.db, init_db) as conn:
+            result = import_events(conn, read_records(stream, fmt), args.chunk_size, args.on_conflict)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    for error in result.errors:
+        print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+    for conflict in result.conflicts:
+        print(f"row {conflict['row']}: overlaps events {conflict['event_ids']} and rows {conflict['rows']}", file=sys.stderr)
+    print(json.dumps({'inserted': result.inserted, 'failed': result.failed, 'conflicts': len(result.conflicts)}))
+    return 1 if result.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
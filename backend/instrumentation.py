@@ -0,0 +1,335 @@
+"""Opt-in request and SQL instrumentation shared by the Flask and FastAPI backends.
+
+SPORTS_INSTRUMENT=1 records every request, otherwise only requests sent with
+"X-Debug-Timing: 1" are recorded. Recorded requests get a Server-Timing header
+and feed the Prometheus histograms served at /metrics.
+
+SPORTS_PROFILING=1 lets "X-Profile: 1" run the sampling profiler for that request,
+SPORTS_PROFILING=all samples every request. Collapsed stacks (flamegraph.pl /
+speedscope format) are written to SPORTS_PROFILE_DIR. Flask requests sample the
+thread that handles them. FastAPI requests start on the event loop, which runs
+every other request too, so there the threads are sampled while they hold a
+connection from backend.db.get_db: the threadpool thread of a sync route and the
+DB executor thread of an async one.
+"""
+import bisect
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TIMING_HEADER = 'X-Debug-Timing'
+PROFILE_HEADER = 'X-Profile'
+
+INSTRUMENT_ALL = os.environ.get('SPORTS_INSTRUMENT', '') not in ('', '0')
+PROFILING = os.environ.get('SPORTS_PROFILING', '')
+PROFILE_DIR = os.environ.get('SPORTS_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'sports-profiles'))
+PROFILE_INTERVAL = float(os.environ.get('SPORTS_PROFILE_INTERVAL', '0.001'))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                #Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            prefix = labels + ',' if labels else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}'
+            suffix = '{' + labels + '}' if labels else ''
+            yield f'{self.name}_sum{suffix} {total}'
+            yield f'{self.name}_count{suffix} {count}'
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('sports_http_request_duration_seconds', 'Request handling time.',
+                            ('app', 'method', 'route', 'status'), LATENCY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram('sports_http_request_db_seconds', 'Time spent in SQLite per request.',
+                               ('app', 'route'), LATENCY_BUCKETS)
+QUERY_SECONDS = Histogram('sports_db_query_duration_seconds', 'SQLite time per execute or fetch call.',
+                          ('statement',), LATENCY_BUCKETS)
+QUERY_ROWS = Histogram('sports_db_rows_returned', 'Rows returned per fetch call.', ('statement',), ROW_BUCKETS)
+#Recorded by the group-commit writer for every batch, see backend/writer.py
+WRITE_BATCH_SIZE = Histogram('sports_write_batch_size', 'Events per group commit.', (), BATCH_BUCKETS)
+WRITE_COMMIT_SECONDS = Histogram('sports_write_commit_duration_seconds', 'Time to write and commit one batch.',
+                                 (), LATENCY_BUCKETS)
+HISTOGRAMS = (REQUEST_SECONDS, REQUEST_DB_SECONDS, QUERY_SECONDS, QUERY_ROWS, WRITE_BATCH_SIZE, WRITE_COMMIT_SECONDS)
+
+
+class RequestProfile:
+    __slots__ = ('started', 'db_time', 'queries', 'rows', 'phases', 'sampler')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.phases: Dict[str, float] = {}
+        self.sampler: Optional['SamplingProfiler'] = None
+
+    def server_timing(self, total: float) -> str:
+        parts = [f'db;dur={self.db_time * 1000:.3f};desc="{self.queries} queries, {self.rows} rows"']
+        for name, duration in self.phases.items():
+            parts.append(f'{name};dur={duration * 1000:.3f}')
+        parts.append(f'app;dur={max(total - self.db_time, 0) * 1000:.3f}')
+        parts.append(f'total;dur={total * 1000:.3f}')
+        return ', '.join(parts)
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar('sports_request_profile', default=None)
+
+
+def current() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+def _statement_kind(sql: str) -> str:
+    words = sql.lstrip().split(None, 1)
+    return words[0].upper() if words else 'UNKNOWN'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Times execute and fetch calls while a request is being recorded, a plain cursor otherwise."""
+
+    _kind = 'UNKNOWN'
+
+    def _timed(self, method, *args):
+        profile = _current.get()
+        if profile is None:
+            return method(*args)
+        began = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - began
+            profile.db_time += elapsed
+            QUERY_SECONDS.observe(elapsed, self._kind)
+
+    def execute(self, sql, parameters=()):
+        self._kind = _statement_kind(sql)
+        profile = _current.get()
+        if profile is not None:
+            profile.queries += 1
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._kind = _statement_kind(sql)
+        profile = _current.get()
+        if profile is not None:
+            profile.queries += 1
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def _fetch(self, method, *args):
+        profile = _current.get()
+        if profile is None:
+            return method(*args)
+        rows = self._timed(method, *args)
+        count = 0 if rows is None else (1 if not isinstance(rows, list) else len(rows))
+        profile.rows += count
+        QUERY_ROWS.observe(count, self._kind)
+        return rows
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, size if size is not None else self.arraysize)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    #sqlite3.Connection.execute creates its cursor in C, so the shortcuts are routed through cursor() here
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+#Times a named part of the request (e.g. serialize), shown as its own Server-Timing entry
+@contextmanager
+def phase(name: str):
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[name] = profile.phases.get(name, 0.0) + time.perf_counter() - began
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of a request's threads every interval from a background thread."""
+
+    def __init__(self, thread_ids: Iterable[int] = (), interval: float = PROFILE_INTERVAL):
+        #Threads working for the request right now, see profiled_thread()
+        self.thread_ids = set(thread_ids)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sports-profiler', daemon=True)
+
+    def start(self) -> 'SamplingProfiler':
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                if stack:
+                    self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, label: str) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'request'
+        path = os.path.join(PROFILE_DIR, f'{time.strftime("%Y%m%d-%H%M%S")}-{safe}-{os.getpid()}.folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+
+#Adds the calling thread to the current request's profile while the block runs
+@contextmanager
+def profiled_thread():
+    profile = _current.get()
+    sampler = profile.sampler if profile is not None else None
+    thread_id = threading.get_ident()
+    if sampler is None or thread_id in sampler.thread_ids:
+        yield
+        return
+    sampler.thread_ids.add(thread_id)
+    try:
+        yield
+    finally:
+        sampler.thread_ids.discard(thread_id)
+
+
+def wants_timing(headers) -> bool:
+    return INSTRUMENT_ALL or headers.get(TIMING_HEADER, '') not in ('', '0')
+
+
+def wants_profile(headers) -> bool:
+    if PROFILING == 'all':
+        return True
+    return PROFILING not in ('', '0') and headers.get(PROFILE_HEADER, '') not in ('', '0')
+
+
+#Starts recording the current request, returns a token for finish_request or None when not recording.
+#sample_caller=False leaves the calling thread out of the profile, for an event loop shared by requests
+def start_request(headers, sample_caller: bool = True):
+    if not (wants_timing(headers) or wants_profile(headers)):
+        return None
+    profile = RequestProfile()
+    if wants_profile(headers):
+        profile.sampler = SamplingProfiler([threading.get_ident()] if sample_caller else []).start()
+    return _current.set(profile), profile
+
+
+#Stops recording, observes the histograms and returns the headers to add to the response
+def finish_request(token, app: str, method: str, route: str, status: int) -> Dict[str, str]:
+    if token is None:
+        return {}
+    context_token, profile = token
+    _current.reset(context_token)
+    total = time.perf_counter() - profile.started
+    REQUEST_SECONDS.observe(total, app, method, route, str(status))
+    REQUEST_DB_SECONDS.observe(profile.db_time, app, route)
+    headers = {'Server-Timing': profile.server_timing(total)}
+    if profile.sampler is not None:
+        profile.sampler.stop()
+        headers['X-Profile-File'] = profile.sampler.write(f'{method}-{route}')
+    return headers
+
+
+def render_metrics(extra: Iterable[str] = ()) -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(extra)
+    return '\n'.join(lines) + '\n'
+
+
+def pool_gauges() -> Iterable[str]:
+    from backend import pool
+    stats = pool.all_stats()
+    for field, kind in (('size', 'gauge'), ('in_use', 'gauge'), ('idle', 'gauge'),
+                        ('checkouts', 'counter'), ('waits', 'counter'), ('timeouts', 'counter')):
+        name = f'sports_db_pool_{field}' + ('_total' if kind == 'counter' else '')
+        yield f'# TYPE {name} {kind}'
+        for s in stats:
+            yield f'{name}{{path="{_escape(s["path"])}"}} {s[field]}'
+
+
+def writer_gauges() -> Iterable[str]:
+    from backend import writer
+    stats = writer.all_stats()
+    for field, kind in (('queue_depth', 'gauge'), ('batches', 'counter'), ('written', 'counter'),
+                        ('failed', 'counter')):
+        name = f'sports_write_{field}' + ('_total' if kind == 'counter' else '')
+        yield f'# TYPE {name} {kind}'
+        for s in stats:
+            yield f'{name}{{path="{_escape(s["path"])}"}} {s[field]}'
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
@@ -1,8 +1,20 @@
 from fastapi import FastAPI
-from backend.routers import events, teams, venues
+from fastapi.middleware.gzip import GZipMiddleware
+from backend import broker, db, pool, wire, writer
+from backend.routers import events, feeds, metrics, teams, venues
 
-app = FastAPI()
+app = FastAPI(on_startup=[db.open_database], on_shutdown=[broker.broker.close_all, writer.close_all])
 
 app.include_router(events.router)
 app.include_router(teams.router)
-app.include_router(venues.router)
\ No newline at end of file
+app.include_router(venues.router)
+app.include_router(feeds.router)
+app.include_router(metrics.router)
+metrics.install_timing(app, "fastapi")
+#Responses from the response cache arrive already compressed (Content-Encoding set) and pass through as they are
+app.add_middleware(GZipMiddleware, minimum_size=wire.MIN_SIZE, compresslevel=wire.GZIP_LEVEL)
+
+#Connection pool metrics for the database used by the routers
+@app.get("/pool")
+def get_pool_stats():
+    return pool.get_pool(db.DB_PATH, db.init_db).stats()
@@ -0,0 +1,107 @@
+"""Versioned schema migrations, shared by the Flask and FastAPI backends.
+
+PRAGMA user_version is the number of the last applied migration. migrate()
+runs the missing ones in order when the pool opens its first connection to a
+database file, so a process pays for them once at startup and a database that
+is up to date costs one pragma read. Each step runs after BEGIN IMMEDIATE and a
+second look at the version, so processes starting together apply it once.
+
+Steps must be idempotent: databases from before versioning (user_version 0)
+may already have any part of the schema, and some steps commit on their own
+before the version is written. A schema change is a new entry at the end of
+MIGRATIONS, never an edit of an applied one.
+"""
+import os
+import sqlite3
+from typing import Callable, Iterator, List, Tuple
+
+from backend import conflicts, recurrence, search, sync
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_PATH = os.path.join(ROOT, 'database', 'schema.sql')
+INSERT_PATH = os.path.join(ROOT, 'database', 'insert.sql')
+
+#Keyset index of the calendar listings, missing in databases created before schema.sql had it
+CALENDAR_INDEX = 'CREATE INDEX IF NOT EXISTS idx_event_date_time_id ON event (event_date, event_time, event_id)'
+#Sport feeds and facet counts, filtered by sport and read in calendar order
+SPORT_INDEX = 'CREATE INDEX IF NOT EXISTS idx_event_sport_date_time ON event (sport_id_foreignkey, event_date, event_time)'
+#Team feeds and schedules: the events of a team without reading every participant row
+TEAM_INDEX = ('CREATE INDEX IF NOT EXISTS idx_event_participant_team '
+              'ON event_participant (team_id_foreignkey, event_id_foreignkey)')
+
+
+#The statements of a SQL script, one at a time
+def _statements(script: str) -> Iterator[str]:
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ''
+    if statement.strip():
+        yield statement
+
+
+#New databases get schema.sql and the seed data, existing ones are left as they are.
+#executescript() would commit the held transaction first and let a second process in
+def _base_schema(conn: sqlite3.Connection) -> None:
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event'").fetchone() is not None:
+        return
+    for path in (SCHEMA_PATH, INSERT_PATH):
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for statement in _statements(f.read()):
+                    conn.execute(statement)
+
+
+#Without FTS5 the step still counts as applied, search falls back to LIKE scans
+def _search_index(conn: sqlite3.Connection) -> None:
+    search.ensure_fts_index(conn)
+
+
+def _lookup_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute(CALENDAR_INDEX)
+    conn.execute(SPORT_INDEX)
+    conn.execute(TEAM_INDEX)
+    #Fresh statistics so the planner picks the new indexes
+    conn.execute('ANALYZE')
+
+
+#(version, description, step)
+MIGRATIONS: Tuple[Tuple[int, str, Callable[[sqlite3.Connection], None]], ...] = (
+    (1, 'base schema and seed data', _base_schema),
+    (2, 'event durations and the venue booking index', conflicts.ensure_schema),
+    (3, 'recurrence rules', recurrence.ensure_schema),
+    (4, 'change log for sync tokens and feed ETags', sync.ensure_change_log),
+    (5, 'full-text search index', _search_index),
+    (6, 'calendar, sport and team lookup indexes', _lookup_indexes),
+)
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+#Applies the missing migrations and returns their versions
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    applied = []
+    if current_version(conn) < LATEST:
+        for version, _, step in MIGRATIONS:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if current_version(conn) >= version:
+                    conn.rollback()
+                    continue
+                step(conn)
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            applied.append(version)
+    if applied:
+        #Re-analyzes tables whose statistics the new steps left stale, a database that is up to date skips it
+        conn.execute('PRAGMA optimize')
+    return applied
@@ -0,0 +1,203 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from backend.instrumentation import InstrumentedConnection
+
+#Per-connection settings applied once when a connection is opened.
+#journal_mode=WAL is persistent in the database file, the rest only live as long as the connection.
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -16000),
+    ('temp_store', 'MEMORY'),
+)
+
+DEFAULT_POOL_SIZE = int(os.environ.get('SPORTS_DB_POOL_SIZE', '8'))
+DEFAULT_TIMEOUT = 30.0
+#Size of sqlite3's per-connection prepared statement cache
+STATEMENT_CACHE_SIZE = 256
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections for one database file.
+
+    Connections are created lazily up to max_size and handed out one thread at a time.
+    The initializer runs once, on the first connection, e.g. to create the schema.
+    """
+
+    def __init__(self, path: str, max_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT,
+                 initializer: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._initializer = initializer
+        self._initialized = False
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        #Held while the initializer runs (migrations can take a while) so release() and stats() are not blocked
+        self._init_lock = threading.Lock()
+        self._size = 0
+        self._closed = False
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.timeout,
+                               cached_statements=STATEMENT_CACHE_SIZE, factory=InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _run_initializer(self, conn: sqlite3.Connection) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            if self._initializer is not None:
+                self._initializer(conn)
+            self._initialized = True
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError('Connection pool is closed')
+        conn = None
+        waited = 0.0
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_grow = self._size < self.max_size
+                if can_grow:
+                    self._size += 1
+            if can_grow:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+            else:
+                #Every connection is checked out, wait for one to be released
+                began = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(f'No free database connection after {self.timeout}s')
+                finally:
+                    waited = time.perf_counter() - began
+        if not self._initialized:
+            try:
+                self._run_initializer(conn)
+            except Exception:
+                #Give the slot back, the next acquire runs the initializer again
+                self._discard(conn)
+                raise
+        with self._lock:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+                self._wait_time += waited
+                self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        #Never hand out a connection with a half finished transaction
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        if self._closed:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._size -= 1
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            idle = self._idle.qsize()
+            return {
+                'path': self.path,
+                'size': self._size,
+                'max_size': self.max_size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_ms': round(self._wait_time * 1000, 3),
+                'max_wait_ms': round(self._max_wait * 1000, 3),
+                'timeouts': self._timeouts,
+            }
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+#One pool per database file, shared by every backend in the process
+def get_pool(path: str, initializer: Optional[Callable[[sqlite3.Connection], None]] = None) -> ConnectionPool:
+    key = os.path.abspath(path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(key, initializer=initializer)
+                _pools[key] = pool
+    return pool
+
+
+def connection(path: str, initializer: Optional[Callable[[sqlite3.Connection], None]] = None):
+    return get_pool(path, initializer).connection()
+
+
+def all_stats() -> List[Dict]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [p.stats() for p in pools]
+
+
+def close_all() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
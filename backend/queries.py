@@ -0,0 +1,17 @@
+#SQL shared by the Flask endpoints that return FullCalendar events.
+#Title and start are built by SQLite so rows map 1:1 onto the JSON objects.
+
+CALENDAR_COLUMNS = '''
+    e.event_id AS id,
+    COALESCE(s.name, 'Event') || ' @ ' || COALESCE(v.name, 'Venue') AS title,
+    CASE WHEN e.event_date <> '' AND e.event_time <> ''
+         THEN e.event_date || 'T' || e.event_time END AS start,
+    e.description,
+    s.name AS sport_name,
+    v.name AS venue_name
+'''
+
+CALENDAR_JOINS = '''
+    LEFT JOIN sport s ON e.sport_id_foreignkey = s.sport_id
+    LEFT JOIN venue v ON e.venue_id_foreignkey = v.venue_id
+'''
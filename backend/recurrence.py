@@ -0,0 +1,363 @@
+"""Recurring events.
+
+A series is one event row (its date and time are the first occurrence) plus a
+row in event_recurrence with an RRULE subset and excluded dates. Occurrences
+are never stored: listings expand them lazily for the requested window only,
+and the expanded windows are memoized, so storage and query cost follow the
+number of series instead of the number of occurrences.
+
+Supported: FREQ=DAILY|WEEKLY|MONTHLY with INTERVAL, COUNT or UNTIL, and BYDAY
+(weekdays only, WEEKLY only). A new series is checked for double bookings at
+every occurrence inside the write transaction, so COUNT, INTERVAL and the span
+from the first to the last occurrence are capped.
+"""
+import datetime
+import functools
+import heapq
+import os
+import sqlite3
+from itertools import count, islice
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from backend.validation import EventValidationError
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+#Listings without an end date expand series this far past their start (or today)
+DEFAULT_HORIZON_DAYS = int(os.environ.get('SPORTS_RECURRENCE_HORIZON_DAYS', '366'))
+CACHE_SIZE = int(os.environ.get('SPORTS_RECURRENCE_CACHE', '4096'))
+MAX_EXDATES = 1000
+MAX_COUNT = 1000
+MAX_INTERVAL = 1000
+#First to last occurrence of a series with COUNT or UNTIL
+MAX_SPAN_DAYS = 10 * 366
+
+#until_date is the last possible occurrence (NULL for open-ended series), it lets listings skip finished series
+TABLE = '''
+    CREATE TABLE IF NOT EXISTS event_recurrence (
+        event_id INTEGER PRIMARY KEY,
+        rrule TEXT NOT NULL,
+        exdates TEXT NOT NULL DEFAULT '',
+        until_date DATE,
+        FOREIGN KEY (event_id) REFERENCES event(event_id)
+    )
+'''
+DELETE_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS event_recurrence_event_delete AFTER DELETE ON event
+    BEGIN DELETE FROM event_recurrence WHERE event_id = OLD.event_id; END
+'''
+
+#Joined onto listing queries, plain events have NULL here
+SERIES_COLUMNS = 'r.rrule AS series_rrule, r.exdates AS series_exdates'
+SERIES_JOIN = 'LEFT JOIN event_recurrence r ON r.event_id = e.event_id'
+#Series that can have occurrences in [start, end): the parameters are end, start
+SERIES_IN_WINDOW = '(? IS NULL OR e.event_date < ?) AND (? IS NULL OR r.until_date IS NULL OR r.until_date >= ?)'
+NOT_A_SERIES = 'e.event_id NOT IN (SELECT event_id FROM event_recurrence)'
+
+
+class Rule(NamedTuple):
+    freq: str
+    interval: int
+    count: Optional[int]
+    until: Optional[datetime.date]
+    byday: Tuple[int, ...]
+
+    def __str__(self) -> str:
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.count is not None:
+            parts.append(f'COUNT={self.count}')
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%d')}")
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(WEEKDAYS[d] for d in self.byday))
+        return ';'.join(parts)
+
+
+class Recurrence(NamedTuple):
+    rrule: str
+    exdates: str
+    until_date: Optional[str]
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(TABLE)
+    conn.execute(DELETE_TRIGGER)
+    conn.commit()
+
+
+def _parse_date(value: str) -> datetime.date:
+    value = value.strip()
+    if len(value) >= 8 and value[:8].isdigit():
+        return datetime.date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    return datetime.date.fromisoformat(value[:10])
+
+
+#Parses "FREQ=WEEKLY;BYDAY=TU,TH;COUNT=20", with or without the "RRULE:" prefix
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_rule(text: str) -> Rule:
+    text = text.strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[6:]
+    fields = {}
+    for part in text.split(';'):
+        if not part.strip():
+            continue
+        name, sep, value = part.partition('=')
+        if not sep:
+            raise EventValidationError(f'Invalid rrule part: {part}')
+        fields[name.strip().upper()] = value.strip().upper()
+
+    freq = fields.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise EventValidationError(f"rrule FREQ must be one of: {', '.join(FREQUENCIES)}")
+    try:
+        interval = int(fields.pop('INTERVAL', '1'))
+        count = int(fields['COUNT']) if 'COUNT' in fields else None
+        until = _parse_date(fields['UNTIL']) if 'UNTIL' in fields else None
+        byday = tuple(sorted({WEEKDAYS.index(d.strip()) for d in fields['BYDAY'].split(',')})) if 'BYDAY' in fields else ()
+    except ValueError:
+        raise EventValidationError('Invalid INTERVAL, COUNT, UNTIL or BYDAY in rrule')
+    fields.pop('COUNT', None)
+    fields.pop('UNTIL', None)
+    fields.pop('BYDAY', None)
+    if fields:
+        raise EventValidationError(f"Unsupported rrule parts: {', '.join(sorted(fields))}")
+    if interval < 1 or (count is not None and count < 1):
+        raise EventValidationError('rrule INTERVAL and COUNT must be positive')
+    if interval > MAX_INTERVAL or (count is not None and count > MAX_COUNT):
+        raise EventValidationError(f'rrule INTERVAL and COUNT can be at most {MAX_INTERVAL} and {MAX_COUNT}')
+    if count is not None and until is not None:
+        raise EventValidationError('rrule takes COUNT or UNTIL, not both')
+    if byday and freq != 'WEEKLY':
+        raise EventValidationError('rrule BYDAY is only supported with FREQ=WEEKLY')
+    return Rule(freq, interval, count, until, byday)
+
+
+def _past_calendar() -> EventValidationError:
+    return EventValidationError(f'rrule runs past the year {datetime.MAXYEAR}')
+
+
+#None when the day does not exist in that month, the caller checks the year is in range
+def _add_months(day: datetime.date, months: int) -> Optional[datetime.date]:
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    try:
+        return day.replace(year=year, month=month % 12 + 1)
+    except ValueError:
+        #No such day in that month (e.g. the 31st), RFC 5545 skips it
+        return None
+
+
+#Occurrence dates from `start` on, in order, until the end of the calendar. Jumps straight to `start`
+#instead of walking from dtstart, except for monthly rules with COUNT where skipped months have to be counted
+def iter_dates(rule: Rule, dtstart: datetime.date, start: datetime.date) -> Iterator[datetime.date]:
+    if rule.freq == 'DAILY':
+        first = max(0, -(-(start - dtstart).days // rule.interval))
+        candidates = ((k, dtstart + datetime.timedelta(days=k * rule.interval)) for k in count(first))
+    elif rule.freq == 'WEEKLY':
+        candidates = _weekly(rule, dtstart, start)
+    else:
+        first = 0
+        if rule.count is None:
+            months = (start.year - dtstart.year) * 12 + start.month - dtstart.month
+            first = max(0, months // rule.interval)
+        candidates = _monthly(rule, dtstart, first)
+
+    try:
+        for index, day in candidates:
+            if rule.count is not None and index >= rule.count:
+                return
+            if rule.until is not None and day > rule.until:
+                return
+            if day >= start:
+                yield day
+    except OverflowError:
+        #Daily and weekly steps past the year 9999
+        return
+
+
+def _weekly(rule: Rule, dtstart: datetime.date, start: datetime.date) -> Iterator[Tuple[int, datetime.date]]:
+    days = rule.byday or (dtstart.weekday(),)
+    first_days = [d for d in days if d >= dtstart.weekday()]
+    monday = dtstart - datetime.timedelta(days=dtstart.weekday())
+    period = max(0, (start - monday).days // (7 * rule.interval))
+    index = len(first_days) + (period - 1) * len(days) if period else 0
+    while True:
+        week = monday + datetime.timedelta(weeks=period * rule.interval)
+        for weekday in (first_days if period == 0 else days):
+            yield index, week + datetime.timedelta(days=weekday)
+            index += 1
+        period += 1
+
+
+def _monthly(rule: Rule, dtstart: datetime.date, first: int) -> Iterator[Tuple[int, datetime.date]]:
+    index = first
+    for k in count(first):
+        if dtstart.year + (dtstart.month - 1 + k * rule.interval) // 12 > datetime.MAXYEAR:
+            return
+        day = _add_months(dtstart, k * rule.interval)
+        if day is not None:
+            yield index, day
+            index += 1
+
+
+def last_date(rule: Rule, dtstart: datetime.date) -> Optional[datetime.date]:
+    if rule.until is not None:
+        return rule.until
+    if rule.count is None:
+        return None
+    try:
+        if rule.freq == 'DAILY':
+            return dtstart + datetime.timedelta(days=(rule.count - 1) * rule.interval)
+        if rule.freq == 'WEEKLY':
+            days = rule.byday or (dtstart.weekday(),)
+            first_days = [d for d in days if d >= dtstart.weekday()]
+            monday = dtstart - datetime.timedelta(days=dtstart.weekday())
+            if rule.count <= len(first_days):
+                return monday + datetime.timedelta(days=first_days[rule.count - 1])
+            period, weekday = divmod(rule.count - len(first_days) - 1, len(days))
+            return monday + datetime.timedelta(weeks=(period + 1) * rule.interval, days=days[weekday])
+    except OverflowError:
+        raise _past_calendar()
+    #Months without the day are skipped, so they are walked. COUNT is capped and the walk stops at the
+    #end of the calendar, so this ends
+    dates = list(islice(iter_dates(rule, dtstart, dtstart), rule.count))
+    if len(dates) < rule.count:
+        raise _past_calendar()
+    return dates[-1]
+
+
+#Dates of a series in [start, end) as ISO strings, memoized per window. All arguments are plain
+#strings, so a changed rule or exception list is a different key and never needs invalidating
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def occurrences(rrule: str, dtstart: str, exdates: str, start: str, end: str) -> Tuple[str, ...]:
+    first = datetime.date.fromisoformat(dtstart)
+    start_day = max(datetime.date.fromisoformat(start), first)
+    end_day = datetime.date.fromisoformat(end)
+    excluded = set(exdates.split(',')) if exdates else set()
+    dates = []
+    for day in iter_dates(parse_rule(rrule), first, start_day):
+        if day >= end_day:
+            break
+        iso = day.isoformat()
+        if iso not in excluded:
+            dates.append(iso)
+    return tuple(dates)
+
+
+def cache_stats() -> Dict:
+    info = occurrences.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'entries': info.currsize, 'max_entries': info.maxsize}
+
+
+#The rrule and exdates of a POST body, None for a one-off event
+def parse_recurrence(data: Dict, event_date: str) -> Optional[Recurrence]:
+    text = data.get('rrule')
+    if not text:
+        return None
+    try:
+        dtstart = datetime.date.fromisoformat(str(event_date))
+    except ValueError:
+        raise EventValidationError('Recurring events need an event_date like YYYY-MM-DD')
+    rule = parse_rule(str(text))
+    exdates = data.get('exdates') or []
+    if isinstance(exdates, str):
+        exdates = exdates.replace(';', ',').split(',')
+    try:
+        excluded = sorted({_parse_date(str(d)).isoformat() for d in exdates if str(d).strip()})
+    except ValueError:
+        raise EventValidationError('exdates must be dates like YYYY-MM-DD')
+    if len(excluded) > MAX_EXDATES:
+        raise EventValidationError(f'At most {MAX_EXDATES} exdates')
+    last = last_date(rule, dtstart)
+    if last is not None and (last - dtstart).days > MAX_SPAN_DAYS:
+        raise EventValidationError(f'A series can span at most {MAX_SPAN_DAYS} days from its first to its last date')
+    return Recurrence(str(rule), ','.join(excluded), last.isoformat() if last else None)
+
+
+def insert_recurrences(conn: sqlite3.Connection, rows: Iterable[Tuple[int, Recurrence]]) -> None:
+    conn.executemany('INSERT INTO event_recurrence (event_id, rrule, exdates, until_date) VALUES (?, ?, ?, ?)',
+                     [(event_id,) + tuple(r) for event_id, r in rows])
+
+
+def is_series(conn: sqlite3.Connection, event_id: int) -> bool:
+    return conn.execute('SELECT 1 FROM event_recurrence WHERE event_id = ?', (event_id,)).fetchone() is not None
+
+
+#The ISO date `days` after day, clamped to the last date of the calendar
+def days_after(day: str, days: int) -> str:
+    ordinal = min(datetime.date.fromisoformat(day).toordinal() + days, datetime.date.max.toordinal())
+    return datetime.date.fromordinal(ordinal).isoformat()
+
+
+#[start, end) as ISO dates for expanding series: a missing end is DEFAULT_HORIZON_DAYS after the start,
+#a missing start is the series' own first date
+def window(start: Optional[str], end: Optional[str]) -> Tuple[str, str]:
+    if end is None:
+        end = days_after(start or datetime.date.today().isoformat(), DEFAULT_HORIZON_DAYS)
+    return start or '0001-01-01', end
+
+
+#One row per occurrence of each series row in [start, end). date_of(row) gives the first date,
+#with_date(row, date) the row for one occurrence; rows for plain events pass through
+def expand(rows: Iterable, start: str, end: str, date_of: Callable[[Dict], Optional[str]],
+           with_date: Callable[[Dict, str], Dict]) -> Iterator[Dict]:
+    for row in rows:
+        row = dict(row)
+        rrule = row.pop('series_rrule', None)
+        exdates = row.pop('series_exdates', None)
+        if rrule is None:
+            yield row
+            continue
+        dtstart = date_of(row)
+        if not dtstart:
+            continue
+        for day in occurrences(rrule, dtstart, exdates or '', start, end):
+            yield with_date(row, day)
+
+
+#Occurrences of every series, merged in order. Each series is already in date order, so this is lazy too
+def expand_sorted(rows: Iterable, start: str, end: str, date_of: Callable[[Dict], Optional[str]],
+                  with_date: Callable[[Dict, str], Dict], key: Callable[[Dict], tuple]) -> Iterator[Dict]:
+    series = [expand([row], start, end, date_of, with_date) for row in rows]
+    return heapq.merge(*series, key=key)
+
+
+#/api/events shape: occurrences keep the series' fields, get their own start and an id like "12@2025-12-01"
+def calendar_date(row: Dict) -> Optional[str]:
+    return row['start'][:10] if row.get('start') else None
+
+
+def calendar_occurrence(row: Dict, day: str) -> Dict:
+    event = dict(row)
+    series_id = row.get('series_id', row['id'])
+    event['id'] = f'{series_id}@{day}'
+    event['series_id'] = series_id
+    event['start'] = day + row['start'][10:]
+    return event
+
+
+#Sort key matching ORDER BY e.event_date, e.event_time, e.event_id
+def calendar_key(row: Dict) -> Tuple[str, int]:
+    return row['start'] or '', row.get('series_id', row['id'])
+
+
+#Search results in rank order, with each matching series replaced by its upcoming occurrences
+def upcoming(rows: Iterable, limit: int) -> Iterator[Dict]:
+    start, end = window(datetime.date.today().isoformat(), None)
+    return islice(expand(rows, start, end, calendar_date, calendar_occurrence), limit)
+
+
+#Plain rows (already in order) merged with the occurrences of the series rows in the window,
+#after an optional (date, time, id) keyset cursor
+def calendar_rows(plain: Iterable, series: Iterable, start: Optional[str], end: Optional[str],
+                  after: Optional[Tuple[str, str, int]] = None) -> Iterator[Dict]:
+    start, end = window(start, end)
+    if after:
+        start = max(start, after[0])
+    expanded = expand_sorted(series, start, end, calendar_date, calendar_occurrence, calendar_key)
+    if after:
+        expanded = (r for r in expanded if (r['start'][:10], r['start'][11:], r['series_id']) > after)
+    return heapq.merge((dict(r) for r in plain), expanded, key=calendar_key)
@@ -0,0 +1,110 @@
+import asyncio
+import tempfile
+from fastapi import APIRouter, Query, HTTPException, Request
+from backend import async_db, broker, conflicts, db, facets, importer, writer
+from backend.cache import response_cache
+from backend.routers import events
+from backend.validation import EventValidationError
+from typing import Optional, List, Dict
+
+#Same routes and response shapes as backend.routers.events, with async handlers on the DB executor
+router = APIRouter(prefix="/events", tags=["Events"])
+
+@router.get("/")
+async def get_events(
+    venue_name: Optional[str] = Query(None, description="Filter by the venue's name"),
+    participant_name: Optional[str] = Query(None, description="Filter by the participant's or team's name"),
+    ids: Optional[str] = Query(None, description="Comma separated event ids, returns their details with participants"),
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    format: Optional[str] = events.FORMAT
+) -> List[Dict]:
+    fmt = events.parse_format(format)
+    if ids is not None:
+        return events.encode_events(await async_db.run(events.fetch_events_by_ids, events.parse_ids(ids)), fmt)
+    events.check_window(start, end)
+    try:
+        rows = await async_db.run(events.fetch_events, venue_name, participant_name, start, end)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Error fetching data from the database.")
+    return events.encode_events(rows, fmt)
+
+@router.get("/with-participants")
+async def get_events_with_participants(
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    after_date: Optional[str] = Query(None),
+    after_time: Optional[str] = Query(None),
+    after_id: Optional[int] = Query(None),
+    limit: int = Query(500, ge=1, le=events.MAX_PAGE_SIZE)
+) -> List[Dict]:
+    events.check_window(start, end)
+    after = events.parse_after(after_date, after_time, after_id)
+    return await async_db.run(events.fetch_events_with_participants, start, end, after, limit)
+
+@router.get("/stream")
+async def get_event_stream():
+    return await events.stream_events()
+
+@router.get("/conflicts")
+async def get_conflicts(
+    venue_id: Optional[int] = Query(None),
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)")
+) -> Dict:
+    events.check_window(start, end)
+    return await async_db.run(conflicts.report, venue_id, start, end)
+
+@router.get("/facets")
+async def get_facets(
+    sport_id: List[int] = Query([]),
+    venue_id: List[int] = Query([]),
+    city: List[str] = Query([]),
+    team_id: List[int] = Query([]),
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(facets.DEFAULT_PAGE_SIZE, ge=1, le=facets.MAX_PAGE_SIZE),
+    facet_limit: int = Query(facets.DEFAULT_FACET_LIMIT, ge=1, le=facets.MAX_FACET_LIMIT)
+) -> Dict:
+    selection = events.parse_selection(sport_id, venue_id, city, team_id, start, end)
+    return await async_db.run(events.fetch_facets, selection, offset, limit, facet_limit)
+
+@router.get("/{event_id}")
+async def get_event(event_id: int):
+    event = await async_db.run(events.fetch_event, event_id)
+    if event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event
+
+@router.post("/")
+async def create_event(event: dict, on_conflict: Optional[str] = events.ON_CONFLICT):
+    policy = events.parse_policy(on_conflict)
+    try:
+        future = writer.submit(db.DB_PATH, db.init_db, writer.prepare(event, policy))
+        event_id, overlaps = await asyncio.wrap_future(future)
+    except EventValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except conflicts.BookingConflict as exc:
+        raise events.conflict_error(exc)
+    except writer.WriterBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return {"event_id": event_id, "conflicts": overlaps}
+
+#Bulk import of JSON Lines (default) or CSV (Content-Type: text/csv)
+@router.post("/bulk")
+async def bulk_import_events(
+    request: Request,
+    chunk_size: int = Query(importer.DEFAULT_CHUNK_SIZE, ge=1),
+    on_conflict: Optional[str] = events.ON_CONFLICT
+) -> Dict:
+    policy = events.parse_policy(on_conflict)
+    fmt = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "jsonl"
+    with tempfile.SpooledTemporaryFile(max_size=events.SPOOL_MAX_MEMORY) as body:
+        await events.spool_upload(request, body)
+        try:
+            result = await async_db.run(events.import_file, body, fmt, chunk_size, policy)
+        finally:
+            response_cache.invalidate(db.DB_PATH)
+        broker.publish_events_changed(db.DB_PATH, result["inserted"])
+        return result
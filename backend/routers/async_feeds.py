@@ -0,0 +1,29 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from backend import async_db, ics
+from backend.routers import feeds
+
+#Same routes as backend.routers.feeds, the lookups run on the DB executor and the body streams from the threadpool
+router = APIRouter(prefix="/feeds", tags=["Feeds"])
+
+async def _feed(request: Request, kind: str, feed_id: Optional[int]):
+    state = await async_db.run(ics.feed_state, kind, feed_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    return feeds.feed_response(feeds.open_feed(request, kind, feed_id, state))
+
+@router.get("/all.ics")
+async def get_all_feed(request: Request):
+    return await _feed(request, "all", None)
+
+@router.get("/sport/{sport_id}.ics")
+async def get_sport_feed(request: Request, sport_id: int):
+    return await _feed(request, "sport", sport_id)
+
+@router.get("/venue/{venue_id}.ics")
+async def get_venue_feed(request: Request, venue_id: int):
+    return await _feed(request, "venue", venue_id)
+
+@router.get("/team/{team_id}.ics")
+async def get_team_feed(request: Request, team_id: int):
+    return await _feed(request, "team", team_id)
@@ -0,0 +1,44 @@
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Query, Request
+from backend import async_db, schedules
+from backend.routers import teams
+from backend.routers.responses import async_cached_json_response
+from backend.routers.teams import fetch_teams
+
+router = APIRouter(prefix="/teams", tags=["Teams"])
+
+@router.get("/")
+async def get_teams(request: Request):
+    return await async_cached_json_response(request, "teams", fetch_teams)
+
+@router.get("/fixtures")
+async def get_fixtures(
+    team_id: List[int] = Query([]),
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    limit: int = teams.FIXTURE_LIMIT
+) -> Dict:
+    team_ids = teams.parse_team_ids(team_id)
+    teams.check_window(start, end)
+    return {"teams": await async_db.run(schedules.fixtures, team_ids, start, end, limit)}
+
+@router.get("/{team_id}/fixtures")
+async def get_team_fixtures(
+    team_id: int,
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    limit: int = teams.FIXTURE_LIMIT
+) -> Dict:
+    teams.check_window(start, end)
+    return teams.one_schedule(await async_db.run(schedules.fixtures, [team_id], start, end, limit))
+
+@router.get("/{team_id}/head-to-head/{other_id}")
+async def get_head_to_head(
+    team_id: int,
+    other_id: int,
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)")
+) -> Dict:
+    teams.check_head_to_head(team_id, other_id)
+    teams.check_window(start, end)
+    return teams.found_head_to_head(await async_db.run(schedules.head_to_head, team_id, other_id, start, end))
@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Request
+from backend.routers.responses import async_cached_json_response
+from backend.routers.venues import fetch_venues
+
+router = APIRouter(prefix="/venues", tags=["Venues"])
+
+@router.get("/")
+async def get_venues(request: Request):
+    return await async_cached_json_response(request, "venues", fetch_venues)
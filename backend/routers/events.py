@@ -1,49 +1,77 @@
-from fastapi import APIRouter, Query, HTTPException
+import asyncio
+import heapq
+import sqlite3
+import tempfile
+import io
+import json
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from backend.db import get_db
+from backend import broker, conflicts, db, facets, importer, recurrence, snapshot, validation, wire, writer
+from backend.cache import response_cache
+from backend.validation import EventValidationError
+from itertools import islice
 from typing import Optional, Tuple, List, Dict
 
 router = APIRouter(prefix="/events", tags=["Events"])
 
-@router.get("/")
-def get_events():
-    conn = get_db()
-    events = conn.execute("""
-        SELECT
-            e.event_id,
-            e.event_date,
-            e.event_time,
-            s.name as sport,
-            v.name as venue
-        FROM event e
-        JOIN sport s ON e.sport_id = s.sport_id
-        JOIN venue v ON e.venue_id = v.venue_id
-        ORDER BY e.event_date ASC;
-    """).fetchall()
+#Upper bounds for the batched endpoints
+MAX_IDS = 1000
+MAX_PAGE_SIZE = 1000
 
-    return [dict(row) for row in events]
+#The fetch_* and import helpers take an open connection so the sync and async routers share the same SQL
 
 #This fucnction builds the SQL query dynamically based on the provided key words. It's a helper for the next function. 
 def _build_events_query(
     venue_name: Optional[str],
-    participant_name: Optional[str]
+    participant_name: Optional[str],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    series_only: bool = False
 ) -> Tuple[str, List[str]]:
 
-    base_query = """
+    #Series come back once with their rule and are expanded by fetch_events
+    base_query = f"""
         SELECT DISTINCT
             e.event_id,
             e.event_date,
             e.event_time,
             s.name AS sport,
-            v.name AS venue
+            v.name AS venue,
+            {recurrence.SERIES_COLUMNS}
         FROM event e
-        JOIN sport s ON e.sport_id = s.sport_id
-        JOIN venue v ON e.venue_id = v.venue_id
+        JOIN sport s ON e.sport_id_foreignkey = s.sport_id
+        JOIN venue v ON e.venue_id_foreignkey = v.venue_id
+        {recurrence.SERIES_JOIN}
     """
     
     where_clauses = []
     join_clauses = []
     query_params = []
 
+    #Optional date window, series are kept when any of their occurrences can fall inside it.
+    #Both OR terms filter the event table only, so SQLite answers each with its own index:
+    #plain events with a range seek in idx_event_date_time_id, series through their rule rows
+    series = ["e.event_id IN (SELECT event_id FROM event_recurrence"
+              + (" WHERE until_date IS NULL OR until_date >= ?)" if start else ")")]
+    series_params = [start] if start else []
+    if end:
+        series.append("e.event_date < ?")
+        series_params.append(end)
+    if series_only:
+        #The plain events come from the snapshot, see backend/snapshot.py
+        where_clauses.append(" AND ".join(series))
+        query_params.extend(series_params)
+    elif start or end:
+        plain = [recurrence.NOT_A_SERIES]
+        for clause, value in (("e.event_date >= ?", start), ("e.event_date < ?", end)):
+            if value:
+                plain.append(clause)
+                query_params.append(value)
+        where_clauses.append(f"({' AND '.join(plain)} OR {' AND '.join(series)})")
+        query_params.extend(series_params)
+
     #Filter by Venue Name
     if venue_name:
         where_clauses.append("v.name LIKE ?")
@@ -53,7 +81,7 @@ def _build_events_query(
     #Filter by participant name
     if participant_name:
         #Add join for the event_participant table
-        join_clauses.append("JOIN event_participant ep ON e.event_id = ep.event_id")
+        join_clauses.append("JOIN event_participant ep ON e.event_id = ep.event_id_foreignkey")
         where_clauses.append("ep.participant_name LIKE ?")
         query_params.append(f"%{participant_name}%")
 
@@ -67,75 +95,340 @@ def _build_events_query(
         #All filter conditions combined 
         full_query += " WHERE " + " AND ".join(where_clauses)
         
-    full_query += " ORDER BY e.event_date ASC;"
+    full_query += " ORDER BY e.event_date, e.event_time, e.event_id;"
 
     return full_query, query_params
 
+#Row helpers for expanding series into occurrences, see backend/recurrence.py
+def _event_date(row: Dict) -> str:
+    return row["event_date"]
+
+def _on_date(row: Dict, day: str) -> Dict:
+    return dict(row, event_date=day)
+
+def _event_key(row: Dict) -> Tuple[str, str, int]:
+    return row["event_date"], row["event_time"], row["event_id"]
+
+def fetch_events(conn: sqlite3.Connection, venue_name: Optional[str], participant_name: Optional[str],
+                 start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+    #Get the SQL query and parameters from the helper method
+    if snapshot.enabled():
+        plain = snapshot.event_rows(conn, venue_name, participant_name, start, end)
+        query, params = _build_events_query(venue_name, participant_name, start, end, series_only=True)
+        series = conn.execute(query, tuple(params)).fetchall()
+    else:
+        query, params = _build_events_query(venue_name, participant_name, start, end)
+        rows = conn.execute(query, tuple(params)).fetchall()
+        plain = [row for row in rows if row["series_rrule"] is None]
+        series = [row for row in rows if row["series_rrule"] is not None]
+    lo, hi = recurrence.window(start, end)
+    return list(heapq.merge(recurrence.expand(plain, lo, hi, _event_date, _on_date),
+                            recurrence.expand_sorted(series, lo, hi, _event_date, _on_date, _event_key),
+                            key=_event_key))
+
+#Participants are folded into each row with json_group_array, so any number of events costs one query
+_EVENT_DETAIL_QUERY = """
+    SELECT
+        e.*,
+        s.name AS sport,
+        v.name AS venue,
+        r.rrule,
+        r.exdates,
+        (SELECT json_group_array(ep.participant_name)
+         FROM event_participant ep
+         WHERE ep.event_id_foreignkey = e.event_id) AS participants
+    FROM event e
+    JOIN sport s ON e.sport_id_foreignkey = s.sport_id
+    JOIN venue v ON e.venue_id_foreignkey = v.venue_id
+    LEFT JOIN event_recurrence r ON r.event_id = e.event_id
+    WHERE e.event_id IN (SELECT value FROM json_each(?))
+    ORDER BY e.event_date, e.event_time, e.event_id
+"""
+
+def _split_participants(row: sqlite3.Row) -> Dict:
+    event = dict(row)
+    participants = json.loads(event.pop("participants"))
+    return {"event": event, "participants": participants}
+
+#Detail objects for many events at once, in calendar order. Unknown ids are skipped
+def fetch_events_by_ids(conn: sqlite3.Connection, event_ids: List[int]) -> List[Dict]:
+    rows = conn.execute(_EVENT_DETAIL_QUERY, (json.dumps(event_ids),)).fetchall()
+    return [_split_participants(row) for row in rows]
+
+def fetch_event(conn: sqlite3.Connection, event_id: int) -> Optional[Dict]:
+    events = fetch_events_by_ids(conn, [event_id])
+    return events[0] if events else None
+
+#A calendar page with the participants of every event embedded, keyset paginated like /api/events.
+#Occurrences of a series share its event_id, so the cursor still identifies one row
+def fetch_events_with_participants(
+    conn: sqlite3.Connection,
+    start: Optional[str],
+    end: Optional[str],
+    after: Optional[Tuple[str, str, int]],
+    limit: int
+) -> List[Dict]:
+    where_clauses = [recurrence.NOT_A_SERIES]
+    params = []
+    if start:
+        where_clauses.append("e.event_date >= ?")
+        params.append(start)
+    if end:
+        where_clauses.append("e.event_date < ?")
+        params.append(end)
+    if after:
+        where_clauses.append("(e.event_date, e.event_time, e.event_id) > (?, ?, ?)")
+        params.extend(after)
+    columns = """
+            e.event_id,
+            e.event_date,
+            e.event_time,
+            e.description,
+            s.name AS sport,
+            v.name AS venue,
+            (SELECT json_group_array(ep.participant_name)
+             FROM event_participant ep
+             WHERE ep.event_id_foreignkey = e.event_id) AS participants
+    """
+    query = f"""
+        SELECT {columns}
+        FROM event e
+        JOIN sport s ON e.sport_id_foreignkey = s.sport_id
+        JOIN venue v ON e.venue_id_foreignkey = v.venue_id
+        WHERE {" AND ".join(where_clauses)}
+        ORDER BY e.event_date, e.event_time, e.event_id LIMIT ?
+    """
+    params.append(limit)
+    series_query = f"""
+        SELECT {columns}, {recurrence.SERIES_COLUMNS}
+        FROM event_recurrence r
+        JOIN event e ON e.event_id = r.event_id
+        JOIN sport s ON e.sport_id_foreignkey = s.sport_id
+        JOIN venue v ON e.venue_id_foreignkey = v.venue_id
+        WHERE {recurrence.SERIES_IN_WINDOW}
+    """
+    series = conn.execute(series_query, (end, end, start, start)).fetchall()
+
+    lo, hi = recurrence.window(start, end)
+    if after:
+        lo = max(lo, after[0])
+    occurrences = recurrence.expand_sorted(series, lo, hi, _event_date, _on_date, _event_key)
+    if after:
+        occurrences = (row for row in occurrences if _event_key(row) > after)
+    rows = heapq.merge((dict(row) for row in conn.execute(query, params)), occurrences, key=_event_key)
+
+    events = []
+    for event in islice(rows, limit):
+        event["participants"] = json.loads(event["participants"])
+        events.append(event)
+    return events
+
+#A facet page with the details of its events, see backend/facets.py
+def fetch_facets(conn: sqlite3.Connection, selection: facets.Selection, offset: int, limit: int, facet_limit: int) -> Dict:
+    page = facets.browse(conn, selection, offset, limit, facet_limit)
+    return {"total": page.total, "events": fetch_events_by_ids(conn, page.event_ids), "facets": page.facets}
+
+def check_window(start: Optional[str], end: Optional[str]) -> None:
+    try:
+        validation.check_window(start, end)
+    except EventValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def parse_selection(sport_id: List[int], venue_id: List[int], city: List[str], team_id: List[int],
+                    start: Optional[str], end: Optional[str]) -> facets.Selection:
+    try:
+        return facets.parse_selection(sport_id, venue_id, city, team_id, start, end)
+    except EventValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def parse_ids(ids: str) -> List[int]:
+    try:
+        event_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma separated integers")
+    if len(event_ids) > MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS} ids per request")
+    return event_ids
+
+def parse_after(after_date: Optional[str], after_time: Optional[str], after_id: Optional[int]) -> Optional[Tuple[str, str, int]]:
+    if after_date is None and after_time is None and after_id is None:
+        return None
+    if after_date is None or after_time is None or after_id is None:
+        raise HTTPException(status_code=400, detail="after_date, after_time and after_id go together")
+    return after_date, after_time, after_id
+
+def import_file(conn: sqlite3.Connection, body, fmt: str, chunk_size: int, policy: str = conflicts.DEFAULT_POLICY) -> Dict:
+    body.seek(0)
+    stream = io.TextIOWrapper(body, encoding="utf-8", newline="")
+    return importer.import_events(conn, importer.read_records(stream, fmt), chunk_size, policy).to_dict()
+
+def parse_policy(on_conflict: Optional[str]) -> str:
+    try:
+        return conflicts.parse_policy(on_conflict)
+    except EventValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def conflict_error(exc: conflicts.BookingConflict) -> HTTPException:
+    return HTTPException(status_code=409, detail={"error": str(exc), "conflicts": exc.event_ids})
+
+ON_CONFLICT = Query(None, description="flag (insert and list overlapping events) or reject double bookings with 409")
+FORMAT = Query(None, description="json (default), columns (one array per field) or msgpack (the same columns)")
+
+def parse_format(fmt: Optional[str]) -> str:
+    try:
+        return wire.check_format(fmt)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except LookupError as exc:
+        raise HTTPException(status_code=406, detail=str(exc))
+
+#Plain lists go through the response model, the compact formats are encoded here
+def encode_events(rows: List[Dict], fmt: str):
+    if fmt == "json":
+        return rows
+    body, content_type = wire.encode_listing(rows, fmt, lambda payload: json.dumps(payload, separators=(",", ":")))
+    return Response(body, media_type=content_type)
+
+#Server-Sent Events: "created" with each new event, "changed" after bulk imports
+async def stream_events():
+    try:
+        subscription = broker.broker.subscribe(db.DB_PATH, asyncio.get_running_loop())
+    except broker.TooManySubscribers:
+        return JSONResponse({"detail": "Too many subscribers"}, status_code=503)
+    return StreamingResponse(broker.stream_async(subscription), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.get("/")
 def get_events(
     venue_name: Optional[str] = Query(None, description="Filter by the venue's name"),
-    participant_name: Optional[str] = Query(None, description="Filter by the participant's or team's name")
+    participant_name: Optional[str] = Query(None, description="Filter by the participant's or team's name"),
+    ids: Optional[str] = Query(None, description="Comma separated event ids, returns their details with participants"),
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    format: Optional[str] = FORMAT
 ) -> List[Dict]:
-    #Get the SQL query and parameters from the helper method
-    query, params = _build_events_query(venue_name, participant_name)
-    
+    fmt = parse_format(format)
+    if ids is not None:
+        event_ids = parse_ids(ids)
+        with get_db() as conn:
+            return encode_events(fetch_events_by_ids(conn, event_ids), fmt)
+    check_window(start, end)
     #Execute the query
-    conn = get_db()
     try:
-        events = conn.execute(query, tuple(params)).fetchall()
+        with get_db() as conn:
+            rows = fetch_events(conn, venue_name, participant_name, start, end)
     except Exception as exc:
         print(f"Database query error: {exc}")
         raise HTTPException(status_code=500, detail="Error fetching data from the database.")
+    return encode_events(rows, fmt)
+
+#Next page: pass the event_date, event_time and event_id of the last event as after_date, after_time, after_id
+@router.get("/with-participants")
+def get_events_with_participants(
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    after_date: Optional[str] = Query(None),
+    after_time: Optional[str] = Query(None),
+    after_id: Optional[int] = Query(None),
+    limit: int = Query(500, ge=1, le=MAX_PAGE_SIZE)
+) -> List[Dict]:
+    check_window(start, end)
+    after = parse_after(after_date, after_time, after_id)
+    with get_db() as conn:
+        return fetch_events_with_participants(conn, start, end, after, limit)
 
-    return [dict(row) for row in events]
+@router.get("/stream")
+async def get_event_stream():
+    return await stream_events()
+
+#Overlapping bookings at the same venue, e.g. after a bulk import
+@router.get("/conflicts")
+def get_conflicts(
+    venue_id: Optional[int] = Query(None),
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)")
+) -> Dict:
+    check_window(start, end)
+    with get_db() as conn:
+        return conflicts.report(conn, venue_id, start, end)
+
+#Faceted browsing: repeat sport_id, venue_id, city and team_id to select several values
+@router.get("/facets")
+def get_facets(
+    sport_id: List[int] = Query([]),
+    venue_id: List[int] = Query([]),
+    city: List[str] = Query([]),
+    team_id: List[int] = Query([]),
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(facets.DEFAULT_PAGE_SIZE, ge=1, le=facets.MAX_PAGE_SIZE),
+    facet_limit: int = Query(facets.DEFAULT_FACET_LIMIT, ge=1, le=facets.MAX_FACET_LIMIT)
+) -> Dict:
+    selection = parse_selection(sport_id, venue_id, city, team_id, start, end)
+    with get_db() as conn:
+        return fetch_facets(conn, selection, offset, limit, facet_limit)
 
 @router.get("/{event_id}")
 def get_event(event_id: int):
-    conn = get_db()
-
-    event = conn.execute("""
-        SELECT
-            e.*,
-            s.name AS sport,
-            v.name AS venue
-        FROM event e
-        JOIN sport s ON e.sport_id = s.sport_id
-        JOIN venue v ON e.venue_id = v.venue_id
-        WHERE e.event_id = ?
-    """, (event_id,)).fetchone()
-
-    participants = conn.execute("""
-        SELECT participant_name
-        FROM event_participant
-        WHERE event_id = ?
-    """, (event_id,)).fetchall()
-
-    return {
-        "event": dict(event),
-        "participants": [p["participant_name"] for p in participants]
-    }
+    with get_db() as conn:
+        event = fetch_event(conn, event_id)
+    if event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event
 
 @router.post("/")
-def create_event(event: dict):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO event (sport_id, venue_id, event_date, event_time, description)
-        VALUES (?, ?, ?, ?, ?)
-    """, (
-        event["sport_id"],
-        event["venue_id"],
-        event["event_date"],
-        event["event_time"],
-        event.get("description", None)
-    ))
-    event_id = cursor.lastrowid
-
-    for participant in event.get("participants", []):
-        cursor.execute("""
-            INSERT INTO event_participant (event_id, participant_name)
-            VALUES (?, ?)
-        """, (event_id, participant))
-
-    conn.commit()
-    return {"event_id": event_id}
\ No newline at end of file
+def create_event(event: dict, on_conflict: Optional[str] = ON_CONFLICT):
+    policy = parse_policy(on_conflict)
+    try:
+        #Group committed with concurrent requests, the writer invalidates the cache and notifies streams
+        #No deadline: the writer resolves every future, and giving up on a write that still commits
+        #would have a retrying client insert it twice
+        future = writer.submit(db.DB_PATH, db.init_db, writer.prepare(event, policy))
+        event_id, overlaps = future.result()
+    except EventValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except conflicts.BookingConflict as exc:
+        raise conflict_error(exc)
+    except writer.WriterBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return {"event_id": event_id, "conflicts": overlaps}
+
+#Uploads are spooled to disk past SPOOL_MAX_MEMORY so memory stays bounded
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+#Upload chunks are gathered up to this many bytes per write to the spool file
+SPOOL_WRITE_SIZE = 1024 * 1024
+
+#Copies the request body into a SpooledTemporaryFile. Writes go through the threadpool, a file
+#write on the event loop would stall every other request once the spool is on disk
+async def spool_upload(request: Request, body) -> None:
+    pending, size = [], 0
+    async for chunk in request.stream():
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= SPOOL_WRITE_SIZE:
+            await run_in_threadpool(body.writelines, pending)
+            pending, size = [], 0
+    await run_in_threadpool(body.writelines, pending)
+
+def _import_file(body, fmt: str, chunk_size: int, policy: str) -> Dict:
+    try:
+        with get_db() as conn:
+            result = import_file(conn, body, fmt, chunk_size, policy)
+        broker.publish_events_changed(db.DB_PATH, result["inserted"])
+        return result
+    finally:
+        response_cache.invalidate(db.DB_PATH)
+
+#Bulk import of JSON Lines (default) or CSV (Content-Type: text/csv)
+@router.post("/bulk")
+async def bulk_import_events(
+    request: Request,
+    chunk_size: int = Query(importer.DEFAULT_CHUNK_SIZE, ge=1),
+    on_conflict: Optional[str] = ON_CONFLICT
+) -> Dict:
+    policy = parse_policy(on_conflict)
+    fmt = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "jsonl"
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as body:
+        await spool_upload(request, body)
+        return await run_in_threadpool(_import_file, body, fmt, chunk_size, policy)
@@ -0,0 +1,35 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from backend import db, ics
+from backend.db import get_db
+
+#iCalendar subscription feeds for calendar apps, answered with 304 until the next change
+router = APIRouter(prefix="/feeds", tags=["Feeds"])
+
+def feed_response(feed: Optional[ics.Feed]) -> Response:
+    if feed is None:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    if isinstance(feed.body, bytes):
+        return Response(feed.body, status_code=feed.status, headers=feed.headers, media_type=ics.CONTENT_TYPE)
+    return StreamingResponse(feed.body, status_code=feed.status, headers=feed.headers, media_type=ics.CONTENT_TYPE)
+
+def open_feed(request: Request, kind: str, feed_id: Optional[int], state=None) -> Optional[ics.Feed]:
+    return ics.open_feed(db.DB_PATH, get_db, kind, feed_id, request.headers.get("if-none-match"),
+                         request.headers.get("if-modified-since"), state)
+
+@router.get("/all.ics")
+def get_all_feed(request: Request):
+    return feed_response(open_feed(request, "all", None))
+
+@router.get("/sport/{sport_id}.ics")
+def get_sport_feed(request: Request, sport_id: int):
+    return feed_response(open_feed(request, "sport", sport_id))
+
+@router.get("/venue/{venue_id}.ics")
+def get_venue_feed(request: Request, venue_id: int):
+    return feed_response(open_feed(request, "venue", venue_id))
+
+@router.get("/team/{team_id}.ics")
+def get_team_feed(request: Request, team_id: int):
+    return feed_response(open_feed(request, "team", team_id))
@@ -0,0 +1,35 @@
+import itertools
+
+from fastapi import APIRouter, FastAPI, Request, Response
+from backend import broker, instrumentation
+
+router = APIRouter(tags=["Metrics"])
+
+
+#Prometheus histograms for recorded requests and queries, plus pool and SSE gauges
+@router.get("/metrics")
+def get_metrics():
+    body = instrumentation.render_metrics(itertools.chain(instrumentation.pool_gauges(), instrumentation.writer_gauges(),
+                                                          broker.broker.metric_lines()))
+    return Response(body, media_type=instrumentation.PROMETHEUS_CONTENT_TYPE)
+
+
+#Opt-in request timing, see backend/instrumentation.py
+def install_timing(app: FastAPI, name: str) -> None:
+    @app.middleware("http")
+    async def timing(request: Request, call_next):
+        #The loop runs every request's coroutines, the handler threads join the profile in db.get_db
+        token = instrumentation.start_request(request.headers, sample_caller=False)
+        if token is None:
+            return await call_next(request)
+        try:
+            response = await call_next(request)
+        except Exception:
+            route = request.scope.get("route")
+            instrumentation.finish_request(token, name, request.method, getattr(route, "path", "unmatched"), 500)
+            raise
+        route = request.scope.get("route")
+        headers = instrumentation.finish_request(
+            token, name, request.method, getattr(route, "path", "unmatched"), response.status_code)
+        response.headers.update(headers)
+        return response
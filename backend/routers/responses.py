@@ -0,0 +1,50 @@
+import json
+from typing import Callable, Dict, Hashable, Tuple
+
+from fastapi import Request, Response
+from backend import async_db, db, wire
+from backend.cache import CachedBody, etag_matches, response_cache
+
+
+def _cache_key(key: Hashable) -> tuple:
+    return ("fastapi",) + (key if isinstance(key, tuple) else (key,))
+
+
+def _serializer(build: Callable[[], Tuple[object, Dict[str, str]]]):
+    def serialize():
+        payload, headers = build()
+        return json.dumps(payload, separators=(",", ":")).encode("utf-8"), headers
+    return serialize
+
+
+def _respond(request: Request, cached: CachedBody) -> Response:
+    body, coding = wire.cached_body(cached, request.headers.get("accept-encoding"))
+    etag = wire.variant_etag(cached.etag, coding)
+    headers = dict(cached.headers)
+    headers["ETag"] = f'"{etag}"'
+    #Clients may keep the body but have to revalidate it
+    headers["Cache-Control"] = "no-cache"
+    headers["Vary"] = "Accept-Encoding"
+    if coding:
+        headers["Content-Encoding"] = coding
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+#Serves a JSON payload from the shared response cache with a strong ETag, answering If-None-Match with 304.
+#build() returns (payload, extra headers) and only runs on a miss
+def cached_json_response(request: Request, key: Hashable, build: Callable[[], Tuple[object, Dict[str, str]]]) -> Response:
+    cached = response_cache.get_or_build(db.DB_PATH, _cache_key(key), _serializer(build))
+    return _respond(request, cached)
+
+
+#Async flavour: hits are answered on the event loop, misses run fetch(conn) on the DB executor
+async def async_cached_json_response(request: Request, key: Hashable, fetch: Callable) -> Response:
+    cached = response_cache.peek(db.DB_PATH, _cache_key(key))
+    if cached is None:
+        def build_with(conn):
+            build = _serializer(lambda: (fetch(conn), {}))
+            return response_cache.get_or_build(db.DB_PATH, _cache_key(key), build)
+        cached = await async_db.run(build_with)
+    return _respond(request, cached)
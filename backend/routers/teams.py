@@ -1,11 +1,17 @@
-from fastapi import APIRouter
+import sqlite3
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from backend import schedules, validation
 from backend.db import get_db
+from backend.routers.responses import cached_json_response
+from backend.validation import EventValidationError
 
 router = APIRouter(prefix="/teams", tags=["Teams"])
 
-@router.get("/") 
-def get_teams():
-    conn = get_db()
+FIXTURE_LIMIT = Query(schedules.DEFAULT_FIXTURE_LIMIT, ge=1, le=schedules.MAX_FIXTURE_LIMIT,
+                      description="Fixtures per team, the earliest of the window")
+
+def fetch_teams(conn: sqlite3.Connection) -> List[Dict]:
     teams = conn.execute("""
         SELECT
             t.team_id,
@@ -14,4 +20,76 @@ def get_teams():
         ORDER BY t.name ASC;
     """).fetchall()
 
-    return [dict(row) for row in teams]
\ No newline at end of file
+    return [dict(row) for row in teams]
+
+def check_window(start: Optional[str], end: Optional[str]) -> None:
+    try:
+        validation.check_window(start, end)
+    except EventValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+def parse_team_ids(team_id: List[int]) -> List[int]:
+    if not team_id:
+        raise HTTPException(status_code=400, detail="Pass at least one team_id")
+    if len(team_id) > schedules.MAX_TEAMS:
+        raise HTTPException(status_code=400, detail=f"At most {schedules.MAX_TEAMS} teams per request")
+    return team_id
+
+def one_schedule(found: List[Dict]) -> Dict:
+    if not found:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return found[0]
+
+def check_head_to_head(team_id: int, other_id: int) -> None:
+    if team_id == other_id:
+        raise HTTPException(status_code=400, detail="Head to head needs two different teams")
+
+def found_head_to_head(result: Optional[Dict]) -> Dict:
+    if result is None:
+        raise HTTPException(status_code=404, detail="Team not found")
+    return result
+
+@router.get("/")
+def get_teams(request: Request):
+    def build():
+        with get_db() as conn:
+            return fetch_teams(conn), {}
+
+    return cached_json_response(request, "teams", build)
+
+#Batch schedules: repeat team_id to get several teams from one query, unknown teams are left out
+@router.get("/fixtures")
+def get_fixtures(
+    team_id: List[int] = Query([]),
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    limit: int = FIXTURE_LIMIT
+) -> Dict:
+    team_ids = parse_team_ids(team_id)
+    check_window(start, end)
+    with get_db() as conn:
+        return {"teams": schedules.fixtures(conn, team_ids, start, end, limit)}
+
+#Fixtures of one team with the rest days before each of them
+@router.get("/{team_id}/fixtures")
+def get_team_fixtures(
+    team_id: int,
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)"),
+    limit: int = FIXTURE_LIMIT
+) -> Dict:
+    check_window(start, end)
+    with get_db() as conn:
+        return one_schedule(schedules.fixtures(conn, [team_id], start, end, limit))
+
+@router.get("/{team_id}/head-to-head/{other_id}")
+def get_head_to_head(
+    team_id: int,
+    other_id: int,
+    start: Optional[str] = Query(None, description="First date of the window (YYYY-MM-DD)"),
+    end: Optional[str] = Query(None, description="Day after the last date of the window (YYYY-MM-DD)")
+) -> Dict:
+    check_head_to_head(team_id, other_id)
+    check_window(start, end)
+    with get_db() as conn:
+        return found_head_to_head(schedules.head_to_head(conn, team_id, other_id, start, end))
@@ -1,11 +1,12 @@
-from fastapi import APIRouter
+import sqlite3
+from typing import Dict, List
+from fastapi import APIRouter, Request
 from backend.db import get_db
+from backend.routers.responses import cached_json_response
 
 router = APIRouter(prefix="/venues", tags=["Venues"])
 
-@router.get("/")
-def get_venues(): 
-    conn = get_db()
+def fetch_venues(conn: sqlite3.Connection) -> List[Dict]:
     venues = conn.execute("""
         SELECT
             v.venue_id,
@@ -16,4 +17,12 @@ def get_venues():
         ORDER BY v.name ASC;
     """).fetchall()
 
-    return [dict(row) for row in venues]
\ No newline at end of file
+    return [dict(row) for row in venues]
+
+@router.get("/")
+def get_venues(request: Request):
+    def build():
+        with get_db() as conn:
+            return fetch_venues(conn), {}
+
+    return cached_json_response(request, "venues", build)
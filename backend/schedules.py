@@ -0,0 +1,122 @@
+"""Team schedules: fixtures with rest days, batched over many teams, and head to head.
+
+Teams are resolved by id through idx_event_participant_team, so a schedule reads
+the index entries and event rows of its own teams and nothing else; the cost
+follows the size of those teams' calendars, not the number of teams, venues or
+events in the league. Rest days come from LAG() over each team's events in
+(date, time, id) order. They are computed before the date window is applied, so
+the first fixture of a window still counts from the team's previous match.
+
+A recurring event is one fixture, on the date of its first occurrence, like in
+the facet counts.
+"""
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+#Teams in one batch request
+MAX_TEAMS = 100
+#Fixtures per team in a response, the earliest of the window
+DEFAULT_FIXTURE_LIMIT = 100
+MAX_FIXTURE_LIMIT = 1000
+
+#The IN subquery reads one team's distinct event ids from the index, a team listed twice under
+#two participant names still plays the event once
+_FIXTURES = '''
+    WITH chosen(team_id) AS (SELECT DISTINCT value FROM json_each(:team_ids)),
+    played AS (
+        SELECT t.team_id, e.event_id, e.event_date, e.event_time,
+               CAST(julianday(e.event_date) - julianday(LAG(e.event_date) OVER team_order) AS INTEGER) AS rest_days
+        FROM chosen t
+        JOIN event e ON e.event_id IN (SELECT ep.event_id_foreignkey FROM event_participant ep
+                                       WHERE ep.team_id_foreignkey = t.team_id)
+        WINDOW team_order AS (PARTITION BY t.team_id ORDER BY e.event_date, e.event_time, e.event_id)
+    ),
+    windowed AS (
+        SELECT p.*, ROW_NUMBER() OVER (PARTITION BY p.team_id ORDER BY p.event_date, p.event_time, p.event_id) AS n
+        FROM played p
+        WHERE (:start IS NULL OR p.event_date >= :start) AND (:end IS NULL OR p.event_date < :end)
+    )
+    SELECT w.team_id, w.event_id, w.event_date, w.event_time, e.duration_minutes, e.description,
+           s.name AS sport_name, v.name AS venue_name, v.city, w.rest_days,
+           (SELECT json_group_array(json_object('team_id', o.team_id_foreignkey, 'name', o.participant_name))
+            FROM event_participant o
+            WHERE o.event_id_foreignkey = w.event_id AND o.team_id_foreignkey <> w.team_id) AS opponents
+    FROM windowed w
+    JOIN event e ON e.event_id = w.event_id
+    LEFT JOIN sport s ON s.sport_id = e.sport_id_foreignkey
+    LEFT JOIN venue v ON v.venue_id = e.venue_id_foreignkey
+    WHERE w.n <= :limit
+    ORDER BY w.team_id, w.event_date, w.event_time, w.event_id
+'''
+
+#SQLite materializes the first team's event ids from the index and probes the second's for each
+_HEAD_TO_HEAD = '''
+    WITH met AS (
+        SELECT e.event_id, e.event_date, e.event_time,
+               CAST(julianday(e.event_date) - julianday(LAG(e.event_date) OVER meetings) AS INTEGER) AS days_since_last
+        FROM event e
+        WHERE e.event_id IN (SELECT event_id_foreignkey FROM event_participant WHERE team_id_foreignkey = :team_id)
+          AND e.event_id IN (SELECT event_id_foreignkey FROM event_participant WHERE team_id_foreignkey = :other_id)
+        WINDOW meetings AS (ORDER BY e.event_date, e.event_time, e.event_id)
+    )
+    SELECT m.event_id, m.event_date, m.event_time, e.duration_minutes, e.description,
+           s.name AS sport_name, v.name AS venue_name, v.city, m.days_since_last
+    FROM met m
+    JOIN event e ON e.event_id = m.event_id
+    LEFT JOIN sport s ON s.sport_id = e.sport_id_foreignkey
+    LEFT JOIN venue v ON v.venue_id = e.venue_id_foreignkey
+    WHERE (:start IS NULL OR m.event_date >= :start) AND (:end IS NULL OR m.event_date < :end)
+    ORDER BY m.event_date, m.event_time, m.event_id
+'''
+
+_TEAMS = 'SELECT team_id, name FROM team WHERE team_id IN (SELECT value FROM json_each(?))'
+
+
+def team_names(conn: sqlite3.Connection, team_ids: Iterable[int]) -> Dict[int, str]:
+    return {row[0]: row[1] for row in conn.execute(_TEAMS, (json.dumps(list(team_ids)),))}
+
+
+def _rest_summary(fixtures: List[Dict]) -> Dict:
+    gaps = [f['rest_days'] for f in fixtures if f['rest_days'] is not None]
+    if not gaps:
+        return {'min': None, 'max': None, 'avg': None}
+    return {'min': min(gaps), 'max': max(gaps), 'avg': round(sum(gaps) / len(gaps), 2)}
+
+
+#Schedules of several teams from one query, in the order of team_ids. Unknown teams are left out
+def fixtures(conn: sqlite3.Connection, team_ids: List[int], start: Optional[str] = None, end: Optional[str] = None,
+             limit: int = DEFAULT_FIXTURE_LIMIT) -> List[Dict]:
+    names = team_names(conn, team_ids)
+    by_team: Dict[int, List[Dict]] = {team_id: [] for team_id in names}
+    params = {'team_ids': json.dumps(list(names)), 'start': start or None, 'end': end or None, 'limit': limit}
+    for row in conn.execute(_FIXTURES, params):
+        fixture = dict(row)
+        team_id = fixture.pop('team_id')
+        fixture['opponents'] = json.loads(fixture['opponents'])
+        by_team[team_id].append(fixture)
+    schedules, seen = [], set()
+    for team_id in team_ids:
+        if team_id in names and team_id not in seen:
+            seen.add(team_id)
+            played = by_team[team_id]
+            schedules.append({'team_id': team_id, 'name': names[team_id], 'rest_days': _rest_summary(played),
+                              'fixtures': played})
+    return schedules
+
+
+#Every meeting of two teams in the window, None when either team does not exist
+def head_to_head(conn: sqlite3.Connection, team_id: int, other_id: int, start: Optional[str] = None,
+                 end: Optional[str] = None) -> Optional[Dict]:
+    names = team_names(conn, (team_id, other_id))
+    if len(names) < 2:
+        return None
+    params = {'team_id': team_id, 'other_id': other_id, 'start': start or None, 'end': end or None}
+    meetings = [dict(row) for row in conn.execute(_HEAD_TO_HEAD, params)]
+    return {
+        'teams': [{'team_id': t, 'name': names[t]} for t in (team_id, other_id)],
+        'meetings': len(meetings),
+        'first_date': meetings[0]['event_date'] if meetings else None,
+        'last_date': meetings[-1]['event_date'] if meetings else None,
+        'events': meetings,
+    }
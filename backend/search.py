@@ -0,0 +1,158 @@
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from backend.queries import CALENDAR_COLUMNS, CALENDAR_JOINS
+from backend.recurrence import SERIES_COLUMNS, SERIES_JOIN, upcoming
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+#bm25 weights, in the column order of event_fts
+WEIGHTS = (5.0, 4.0, 2.0, 1.0, 4.0, 1.0, 1.0)
+
+FTS_TABLE = '''
+    CREATE VIRTUAL TABLE event_fts USING fts5(
+        sport, venue, city, description, participants, event_date, event_time,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+'''
+
+#Bulk writers switch the triggers off inside their own transaction and reindex once per batch
+CONTROL_TABLE = 'CREATE TABLE IF NOT EXISTS event_fts_control (suspended INTEGER NOT NULL)'
+_ACTIVE = 'WHEN (SELECT suspended FROM event_fts_control) = 0'
+
+#Denormalized document for the events selected by the WHERE clause, event_fts.rowid is the event_id
+_DOCUMENT_SELECT = '''
+    INSERT INTO event_fts (rowid, sport, venue, city, description, participants, event_date, event_time)
+    SELECT e.event_id, s.name, v.name, v.city, e.description,
+           (SELECT group_concat(ep.participant_name, ' ')
+            FROM event_participant ep
+            WHERE ep.event_id_foreignkey = e.event_id),
+           e.event_date, e.event_time
+    FROM event e
+    LEFT JOIN sport s ON e.sport_id_foreignkey = s.sport_id
+    LEFT JOIN venue v ON e.venue_id_foreignkey = v.venue_id
+    WHERE {where};
+'''
+
+
+def _refresh(where: str, ids: str) -> str:
+    return f'DELETE FROM event_fts WHERE rowid IN ({ids});' + _DOCUMENT_SELECT.format(where=where)
+
+
+#Triggers keep event_fts in sync with every write to the indexed tables
+TRIGGERS = {
+    'event_fts_event_insert': ('AFTER INSERT ON event',
+                               _refresh('e.event_id = NEW.event_id', 'NEW.event_id')),
+    'event_fts_event_update': ('AFTER UPDATE ON event',
+                               'DELETE FROM event_fts WHERE rowid = OLD.event_id;'
+                               + _refresh('e.event_id = NEW.event_id', 'NEW.event_id')),
+    'event_fts_event_delete': ('AFTER DELETE ON event',
+                               'DELETE FROM event_fts WHERE rowid = OLD.event_id;'),
+    'event_fts_participant_insert': ('AFTER INSERT ON event_participant',
+                                     _refresh('e.event_id = NEW.event_id_foreignkey', 'NEW.event_id_foreignkey')),
+    'event_fts_participant_delete': ('AFTER DELETE ON event_participant',
+                                     _refresh('e.event_id = OLD.event_id_foreignkey', 'OLD.event_id_foreignkey')),
+    'event_fts_sport_update': ('AFTER UPDATE OF name ON sport',
+                               _refresh('e.sport_id_foreignkey = NEW.sport_id',
+                                        'SELECT event_id FROM event WHERE sport_id_foreignkey = NEW.sport_id')),
+    'event_fts_venue_update': ('AFTER UPDATE OF name, city ON venue',
+                               _refresh('e.venue_id_foreignkey = NEW.venue_id',
+                                        'SELECT event_id FROM event WHERE venue_id_foreignkey = NEW.venue_id')),
+}
+
+
+#Creates the FTS5 index and its triggers if needed, returns False when this SQLite build has no FTS5
+def ensure_fts_index(conn: sqlite3.Connection) -> bool:
+    try:
+        exists = has_fts_index(conn)
+        if not exists:
+            conn.execute(FTS_TABLE)
+        conn.execute(CONTROL_TABLE)
+        if conn.execute('SELECT 1 FROM event_fts_control').fetchone() is None:
+            conn.execute('INSERT INTO event_fts_control (suspended) VALUES (0)')
+        for name, (event, body) in TRIGGERS.items():
+            conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} {_ACTIVE} BEGIN {body} END')
+        if not exists:
+            #Index the rows that were there before the index
+            conn.execute(_DOCUMENT_SELECT.format(where='1'))
+        conn.commit()
+        return True
+    except sqlite3.OperationalError:
+        conn.rollback()
+        return False
+
+
+def has_fts_index(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_fts'").fetchone()
+    return row is not None
+
+
+#Must be called inside the caller's write transaction, other connections never see the triggers off
+def suspend_triggers(conn: sqlite3.Connection) -> bool:
+    if not has_fts_index(conn):
+        return False
+    conn.execute('UPDATE event_fts_control SET suspended = 1')
+    return True
+
+
+#Re-enables the triggers and indexes the events written while they were off in one statement
+def resume_triggers(conn: sqlite3.Connection, first_event_id: int, last_event_id: int) -> None:
+    conn.execute('UPDATE event_fts_control SET suspended = 0')
+    conn.execute('DELETE FROM event_fts WHERE rowid BETWEEN ? AND ?', (first_event_id, last_event_id))
+    conn.execute(_DOCUMENT_SELECT.format(where='e.event_id BETWEEN ? AND ?'), (first_event_id, last_event_id))
+
+
+#Turns user input into an FTS5 query: every word is a quoted prefix match and all words must match
+def build_match_query(q: str) -> Optional[str]:
+    terms = []
+    for word in q.split():
+        word = word.replace('"', '')
+        if word:
+            terms.append(f'"{word}"*')
+    return ' '.join(terms) or None
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_LIMIT
+    return min(limit, MAX_LIMIT)
+
+
+#Best matches first. Uses the FTS5 index when present and falls back to LIKE scans otherwise
+def build_search_query(conn: sqlite3.Connection, q: str, limit: Optional[int] = None) -> Optional[Tuple[str, tuple]]:
+    limit = clamp_limit(limit)
+    if has_fts_index(conn):
+        match = build_match_query(q)
+        if match is None:
+            return None
+        weights = ', '.join(str(w) for w in WEIGHTS)
+        return f'''
+            SELECT {CALENDAR_COLUMNS}, {SERIES_COLUMNS}
+            FROM event_fts f
+            JOIN event e ON e.event_id = f.rowid
+            {CALENDAR_JOINS}
+            {SERIES_JOIN}
+            WHERE event_fts MATCH ?
+            ORDER BY bm25(event_fts, {weights}), e.event_date, e.event_time
+            LIMIT ?
+        ''', (match, limit)
+
+    like = f"%{q}%"
+    return f'''
+        SELECT {CALENDAR_COLUMNS}, {SERIES_COLUMNS}
+        FROM event e
+        {CALENDAR_JOINS}
+        {SERIES_JOIN}
+        WHERE s.name LIKE ? OR v.name LIKE ? OR e.event_date LIKE ? OR e.event_time LIKE ?
+        ORDER BY e.event_date, e.event_time
+        LIMIT ?
+    ''', (like, like, like, like, limit)
+
+
+#Matching series are replaced by their upcoming occurrences
+def search_events(conn: sqlite3.Connection, q: str, limit: Optional[int] = None) -> List[Dict]:
+    query = build_search_query(conn, q, limit)
+    if query is None:
+        return []
+    return list(upcoming(conn.execute(*query), clamp_limit(limit)))
@@ -1,102 +1,266 @@
-from flask import Flask, jsonify, send_from_directory, request
+from flask import Flask, jsonify, send_from_directory, request, g
 import sqlite3
 import os
-from typing import Optional
+import io
+import json
+import base64
+import datetime
+import itertools
+import mimetypes
+from itertools import islice
+import sys
+from typing import Optional, Tuple
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT = os.path.abspath(os.path.join(APP_DIR, '..'))
+
+#Allows running this file directly (python backend/server.py) and still importing the backend package
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend import (assets, broker, conflicts, facets, ics, importer, instrumentation, migrations, pool, recurrence,
+                     search, snapshot, sync, wire, writer)
+from backend.cache import response_cache
+from backend.queries import CALENDAR_COLUMNS, CALENDAR_JOINS
+from backend.validation import EventValidationError
 DB_PATH = os.path.join(ROOT, "database", "sports.db")
-SCHEMA_PATH = os.path.join(ROOT, 'database', 'schema.sql')
-INSERT_PATH = os.path.join(ROOT, 'database', 'insert.sql')
 
 app = Flask(__name__, static_folder=os.path.join(ROOT, 'frontend'))
+#Fingerprinted, precompressed frontend from python -m backend.assets, None serves frontend/ as it is
+built_assets = assets.load()
+
+#Runs once per database file, the first time the pool opens a connection to it
+def init_db(conn: sqlite3.Connection) -> None:
+    applied = migrations.migrate(conn)
+    if applied:
+        app.logger.info('Applied schema migrations %s to %s', applied, DB_PATH)
+
+    #Full-text index for /api/events/search, search falls back to LIKE if FTS5 is missing
+    if not search.has_fts_index(conn):
+        app.logger.warning('SQLite FTS5 is unavailable, event search will use LIKE scans')
 
-#Establishing a connection to the database
-def get_db_connection() -> sqlite3.Connection:
-    need_init = not os.path.exists(DB_PATH)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    
-    #Just in case the DB needs initialization
-    if need_init:
-        if os.path.exists(SCHEMA_PATH):
-            with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
-                conn.executescript(f.read())
-            conn.commit()
-        #Seed data if insert.sql exists
-        if os.path.exists(INSERT_PATH):
-            with open(INSERT_PATH, 'r', encoding='utf-8') as f:
-                conn.executescript(f.read())
-            conn.commit()
-        else:
-            conn.commit()
 
-    return conn
+#Borrowing a pooled connection to the database, it goes back to the pool when the block exits
+def db_connection():
+    return pool.connection(DB_PATH, init_db)
+
+
+#Serves a JSON payload from the response cache with a strong ETag, answering If-None-Match with 304.
+#build() returns (payload, extra headers) and only runs on a miss. With fmt the payload is a list of
+#rows, encoded as a listing in that format (see backend/wire.py)
+def cached_json(key, build, fmt=None):
+    def serialize():
+        payload, headers = build()
+        with instrumentation.phase('serialize'):
+            if fmt is None:
+                return app.json.dumps(payload).encode('utf-8'), headers
+            body, content_type = wire.encode_listing(payload, fmt, app.json.dumps)
+            return body, dict(headers, **{'Content-Type': content_type})
+
+    cached = response_cache.get_or_build(DB_PATH, key, serialize)
+    body, coding = wire.cached_body(cached, request.headers.get('Accept-Encoding'))
+    response = app.response_class(body, mimetype='application/json')
+    response.headers.update(cached.headers)
+    if coding:
+        response.headers['Content-Encoding'] = coding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(wire.variant_etag(cached.etag, coding))
+    #Clients may keep the body but have to revalidate it
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 #Utility endpoints for lookups
 @app.route('/api/sports')
 def api_sports():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('SELECT sport_id, name FROM sport ORDER BY name')
-    rows = cur.fetchall()
-    conn.close()
-    sports = [{'id': r['sport_id'], 'name': r['name']} for r in rows]
-    return jsonify(sports)
+    def build():
+        with db_connection() as conn:
+            rows = conn.execute('SELECT sport_id, name FROM sport ORDER BY name').fetchall()
+        return [{'id': r['sport_id'], 'name': r['name']} for r in rows], {}
+    return cached_json('sports', build)
 
 
 @app.route('/api/venues')
 def api_venues():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('SELECT venue_id, name, city FROM venue ORDER BY name')
-    rows = cur.fetchall()
-    conn.close()
-    venues = [{'id': r['venue_id'], 'name': r['name'], 'city': r['city']} for r in rows]
-    return jsonify(venues)
+    def build():
+        with db_connection() as conn:
+            rows = conn.execute('SELECT venue_id, name, city FROM venue ORDER BY name').fetchall()
+        return [{'id': r['venue_id'], 'name': r['name'], 'city': r['city']} for r in rows], {}
+    return cached_json('venues', build)
+
+
+#Upper bound for a single page of events
+MAX_PAGE_SIZE = 1000
+#Rows pulled from the cursor per streamed chunk
+STREAM_BATCH_SIZE = 500
+
+
+#Streaming is opt-in: ?stream=json (one JSON array) or ?stream=ndjson / Accept: application/x-ndjson
+def _stream_mode() -> Optional[str]:
+    mode = request.args.get('stream')
+    if mode in ('json', 'ndjson'):
+        return mode
+    if mode in ('1', 'true'):
+        return 'json'
+    if request.accept_mimetypes.best == 'application/x-ndjson':
+        return 'ndjson'
+    return None
+
+
+#Writes rows as they come off the cursor, so memory stays flat whatever the result size.
+#rows(conn) returns the rows to write: a cursor, or a generator over one
+def _stream_rows(rows, mode: str):
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+    def generate():
+        with db_connection() as conn:
+            source = iter(rows(conn))
+            if mode == 'json':
+                yield '['
+            separator = ''
+            while True:
+                batch = list(islice(source, STREAM_BATCH_SIZE))
+                if not batch:
+                    break
+                if mode == 'ndjson':
+                    yield ''.join(dumps(dict(r)) + '\n' for r in batch)
+                else:
+                    yield separator + ','.join(dumps(dict(r)) for r in batch)
+                    separator = ','
+            if mode == 'json':
+                yield ']'
+
+    mimetype = 'application/x-ndjson' if mode == 'ndjson' else 'application/json'
+    return app.response_class(generate(), mimetype=mimetype)
+
+
+def _parse_window_date(value: Optional[str]) -> Optional[str]:
+    #FullCalendar sends ISO timestamps like 2025-10-26T00:00:00+01:00, only the date part matters here
+    if not value:
+        return None
+    return datetime.date.fromisoformat(value.strip()[:10]).isoformat()
+
+
+def _encode_cursor(event_date: str, event_time: str, event_id: int) -> str:
+    raw = json.dumps([event_date, event_time, event_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str, int]:
+    event_date, event_time, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return str(event_date), str(event_time), int(event_id)
 
 
 #Returns events formatted to be compatible with FullCalendar 
 @app.route('/api/events', methods=['GET'])
 def api_events():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('''
-        SELECT e.event_id,
-               e.event_date,
-               e.event_time,
-               e.description,
-               s.name as sport_name,
-               v.name as venue_name
+    #Optional visible window and keyset pagination parameters
+    try:
+        window_start = _parse_window_date(request.args.get('start'))
+        window_end = _parse_window_date(request.args.get('end'))
+        cursor = request.args.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+        limit = request.args.get('limit', type=int)
+    except Exception:
+        return jsonify({'error': 'Invalid start, end or cursor'}), 400
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+    #?format=columns (or msgpack) sends one array per field instead of one object per event
+    try:
+        fmt = wire.check_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 406
+
+    #Series are listed through their expanded occurrences only
+    where_clauses = [recurrence.NOT_A_SERIES]
+    params = []
+    if window_start:
+        where_clauses.append('e.event_date >= ?')
+        params.append(window_start)
+    if window_end:
+        where_clauses.append('e.event_date < ?')
+        params.append(window_end)
+    if after:
+        #Row value comparison lets SQLite seek in idx_event_date_time_id
+        where_clauses.append('(e.event_date, e.event_time, e.event_id) > (?, ?, ?)')
+        params.extend(after)
+
+    query = f'''
+        SELECT {CALENDAR_COLUMNS}
         FROM event e
-        LEFT JOIN sport s ON e.sport_id_foreignkey = s.sport_id
-        LEFT JOIN venue v ON e.venue_id_foreignkey = v.venue_id
-        ORDER BY e.event_date, e.event_time
-    ''')
-    rows = cur.fetchall()
-    conn.close()
-
-    events = []
-    for r in rows:
-        date = r['event_date']
-        time = r['event_time']
-        desc = r['description'] if 'description' in r.keys() else None
-        start = f"{date}T{time}" if date and time else None
-        #Combining into a title
-        title = f"{r['sport_name'] or 'Event'} @ {r['venue_name'] or 'Venue'}"
-        events.append({
-            'id': r['event_id'],
-            'title': title,
-            'start': start,
-            'description': desc,
-            'sport_name': r['sport_name'],
-            'venue_name': r['venue_name']
-        })
-
-    return jsonify(events)
-
-#Simple search by keywords
+        {CALENDAR_JOINS}
+        WHERE {' AND '.join(where_clauses)}
+        ORDER BY e.event_date, e.event_time, e.event_id
+    '''
+    series_query = f'''
+        SELECT {CALENDAR_COLUMNS}, {recurrence.SERIES_COLUMNS}
+        FROM event_recurrence r
+        JOIN event e ON e.event_id = r.event_id
+        {CALENDAR_JOINS}
+        WHERE {recurrence.SERIES_IN_WINDOW}
+    '''
+    series_params = (window_end, window_end, window_start, window_start)
+    #Fetch one extra row to know whether there is a next page
+    fetch = None if limit is None else limit + 1
+    if fetch is not None:
+        query += ' LIMIT ?'
+        params.append(fetch)
+
+    #Plain events merged with the occurrences of the series in the window, lazily and in order
+    def listing(conn, count):
+        series = conn.execute(series_query, series_params).fetchall()
+        if snapshot.enabled():
+            plain = snapshot.calendar_rows(conn, window_start, window_end, after, fetch)
+        else:
+            plain = conn.execute(query, params)
+        rows = recurrence.calendar_rows(plain, series, window_start, window_end, after)
+        return rows if count is None else islice(rows, count)
+
+    mode = _stream_mode()
+    if mode:
+        #Streamed bodies start before the last row is known, so there is no X-Next-Cursor here
+        return _stream_rows(lambda conn: listing(conn, limit), mode)
+
+    #Only runs on a cache miss
+    def build():
+        with db_connection() as conn:
+            #Read before the rows, so a write in between is sent again by the next sync rather than missed
+            sync_token = sync.encode_token(sync.current_revision(conn))
+            rows = list(listing(conn, fetch))
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            event_date, event_time = last['start'].split('T', 1)
+            next_cursor = _encode_cursor(event_date, event_time, last.get('series_id', last['id']))
+
+        headers = {'X-Sync-Token': sync_token}
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+        return rows, headers
+
+    return cached_json(('events', window_start, window_end, after, limit, fmt), build, fmt)
+
+
+#Events created, updated and deleted since a token from X-Sync-Token or an earlier sync.
+#"reset": true means the client has to reload its events with /api/events instead
+@app.route('/api/events/sync')
+def api_events_sync():
+    try:
+        revision = sync.decode_token(request.args.get('token', ''))
+    except ValueError:
+        return jsonify({'error': 'Invalid sync token'}), 400
+
+    def build():
+        with db_connection() as conn:
+            return sync.changes_since(conn, revision), {}
+
+    return cached_json(('sync', revision), build)
+
+#Full-text search by keywords, best matches first
 @app.route('/api/events/search')
 def api_events_search():
     q = (request.args.get('q') or '').strip()
@@ -104,98 +268,215 @@ def api_events_search():
     if q == '':
         return jsonify([])
 
-    like = f"%{q}%"
-    conn = get_db_connection()
-    cur = conn.cursor()
+    mode = _stream_mode()
+    limit = search.clamp_limit(request.args.get('limit', type=int))
     try:
-        cur.execute('''
-            SELECT e.event_id,
-                   e.event_date,
-                   e.event_time,
-                   e.description,
-                   s.name as sport_name,
-                   v.name as venue_name
-            FROM event e
-            LEFT JOIN sport s ON e.sport_id_foreignkey = s.sport_id
-            LEFT JOIN venue v ON e.venue_id_foreignkey = v.venue_id
-            WHERE s.name LIKE ? OR v.name LIKE ? OR e.event_date LIKE ? OR e.event_time LIKE ?
-            ORDER BY e.event_date, e.event_time
-        ''', (like, like, like, like))
-        rows = cur.fetchall()
+        with db_connection() as conn:
+            query = search.build_search_query(conn, q, limit)
+            if query is None:
+                return jsonify([])
+            if not mode:
+                rows = list(recurrence.upcoming(conn.execute(*query), limit))
     #Just in case of errors
     except Exception as e:
         app.logger.exception('Error running search')
-        conn.close()
         return jsonify({'error': str(e)}), 500
-    conn.close()
-
-    results = []
-    for r in rows:
-        date = r['event_date']
-        time = r['event_time']
-        desc = r['description'] if 'description' in r.keys() else None
-        start = f"{date}T{time}" if date and time else None
-        title = f"{r['sport_name'] or 'Event'} @ {r['venue_name'] or 'Venue'}"
-        #Add results that match to the list
-        results.append({
-            'id': r['event_id'],
-            'title': title,
-            'start': start,
-            'description': desc,
-            'sport_name': r['sport_name'],
-            'venue_name': r['venue_name']
-        })
-
-    return jsonify(results)
+
+    if mode:
+        return _stream_rows(lambda conn: recurrence.upcoming(conn.execute(*query), limit), mode)
+    return jsonify(rows)
 
 #This part is responsible for adding new events
 @app.route('/api/events', methods=['POST'])
 def add_event():
     data = request.get_json(force=True)
-    sport_id = data.get('sport_id_foreignkey') or data.get('sport_id')
-    venue_id = data.get('venue_id_foreignkey') or data.get('venue_id')
-    event_date = data.get('event_date')
-    event_time = data.get('event_time')
-    description = data.get('description')
-
-    #Handling missing fields
-    if not (sport_id and venue_id and event_date and event_time):
-        app.logger.warning('POST /api/events missing fields: %s', data)
-        return jsonify({'error': 'Missing required fields'}), 400
-
     try:
-        sport_id = int(sport_id)
-        venue_id = int(venue_id)
-    except Exception:
-        app.logger.warning('POST /api/events invalid IDs: %s %s', sport_id, venue_id)
-        #Dealing with invalid IDs
-        return jsonify({'error': 'Invalid sport_id or venue_id'}), 400
+        #This endpoint never took participants, the FastAPI one does
+        write = writer.prepare(data, conflicts.parse_policy(request.args.get('on_conflict')), with_participants=False)
+    except EventValidationError as e:
+        app.logger.warning('POST /api/events rejected (%s): %s', e, data)
+        return jsonify({'error': str(e)}), 400
 
+    #Group committed with concurrent requests, the writer invalidates the cache and notifies streams
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('''
-            INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time, description)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (sport_id, venue_id, event_date, event_time, description))
-        conn.commit()
-        event_id = cur.lastrowid
-        conn.close()
-        app.logger.info('Inserted event id=%s', event_id)
-        return jsonify({'event_id': event_id}), 201
+        event_id, overlaps = writer.submit(DB_PATH, init_db, write).result()
+    except conflicts.BookingConflict as e:
+        return jsonify({'error': str(e), 'conflicts': e.event_ids}), 409
+    except writer.WriterBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         app.logger.exception('POST /api/events DB error')
         return jsonify({'error': str(e)}), 500
+    app.logger.info('Inserted event id=%s', event_id)
+    return jsonify({'event_id': event_id, 'conflicts': overlaps}), 201
+
+
+#Bulk import of JSON Lines (default) or CSV (Content-Type: text/csv), streamed in chunked transactions
+@app.route('/api/events/bulk', methods=['POST'])
+def bulk_import_events():
+    fmt = 'csv' if (request.mimetype or '').endswith('csv') else 'jsonl'
+    chunk_size = request.args.get('chunk_size', default=importer.DEFAULT_CHUNK_SIZE, type=int)
+    try:
+        policy = conflicts.parse_policy(request.args.get('on_conflict'))
+    except EventValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    try:
+        with db_connection() as conn:
+            result = importer.import_events(conn, importer.read_records(stream, fmt), chunk_size, policy)
+    except Exception as e:
+        app.logger.exception('POST /api/events/bulk DB error')
+        return jsonify({'error': str(e)}), 500
+    finally:
+        #Chunks that were committed before a failure are visible too
+        response_cache.invalidate(DB_PATH)
+    broker.publish_events_changed(DB_PATH, result.inserted)
+    app.logger.info('Bulk import inserted=%s failed=%s', result.inserted, result.failed)
+    return jsonify(result.to_dict())
+
+
+#Overlapping bookings at the same venue, e.g. after a bulk import. Optional venue_id and start/end date window
+@app.route('/api/events/conflicts')
+def api_events_conflicts():
+    try:
+        venue_id = request.args.get('venue_id', type=int)
+        window_start = _parse_window_date(request.args.get('start'))
+        window_end = _parse_window_date(request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end'}), 400
+
+    def build():
+        with db_connection() as conn:
+            return conflicts.report(conn, venue_id, window_start, window_end), {}
+
+    return cached_json(('conflicts', venue_id, window_start, window_end), build)
+
+
+#Faceted browsing: repeat sport_id, venue_id, city and team_id to select several values, plus a start/end
+#date window. Returns a page of matching events and the event count of every sport, venue, city and team
+@app.route('/api/events/facets')
+def api_events_facets():
+    try:
+        selection = facets.parse_selection(request.args.getlist('sport_id', type=int),
+                                           request.args.getlist('venue_id', type=int),
+                                           request.args.getlist('city'),
+                                           request.args.getlist('team_id', type=int),
+                                           request.args.get('start'), request.args.get('end'))
+    except EventValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    offset = max(0, request.args.get('offset', default=0, type=int))
+    limit = facets.clamp(request.args.get('limit', type=int), facets.DEFAULT_PAGE_SIZE, facets.MAX_PAGE_SIZE)
+    facet_limit = facets.clamp(request.args.get('facet_limit', type=int), facets.DEFAULT_FACET_LIMIT,
+                               facets.MAX_FACET_LIMIT)
+
+    def build():
+        with db_connection() as conn:
+            page = facets.browse(conn, selection, offset, limit, facet_limit)
+            rows = conn.execute(f'''
+                SELECT {CALENDAR_COLUMNS}
+                FROM event e
+                {CALENDAR_JOINS}
+                WHERE e.event_id IN (SELECT value FROM json_each(?))
+                ORDER BY e.event_date, e.event_time, e.event_id
+            ''', (json.dumps(page.event_ids),)).fetchall()
+        return {'total': page.total, 'events': [dict(row) for row in rows], 'facets': page.facets}, {}
+
+    return cached_json(('facets', selection, offset, limit, facet_limit), build)
+
+
+#Server-Sent Events: "created" with each new event, "changed" after bulk imports.
+#Every open stream holds a worker thread, so run behind a threaded server
+@app.route('/api/events/stream')
+def api_events_stream():
+    try:
+        subscription = broker.broker.subscribe(DB_PATH)
+    except broker.TooManySubscribers:
+        return jsonify({'error': 'Too many subscribers'}), 503
+    response = app.response_class(broker.stream(subscription), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    #Stops nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+#iCalendar subscription feeds for calendar apps, answered with 304 until the next change
+@app.route('/api/feeds/all.ics', defaults={'kind': 'all', 'feed_id': None})
+@app.route('/api/feeds/<any(sport, venue, team):kind>/<int:feed_id>.ics')
+def ics_feed(kind, feed_id):
+    feed = ics.open_feed(DB_PATH, db_connection, kind, feed_id,
+                         request.headers.get('If-None-Match'), request.headers.get('If-Modified-Since'))
+    if feed is None:
+        return jsonify({'error': 'Feed not found'}), 404
+    return app.response_class(feed.body, status=feed.status, headers=feed.headers, content_type=ics.CONTENT_TYPE)
+
+
+#Opt-in timing, see backend/instrumentation.py
+@app.before_request
+def start_timing():
+    g.timing = instrumentation.start_request(request.headers)
+
+
+@app.after_request
+def finish_timing(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    response.headers.update(instrumentation.finish_request(
+        g.pop('timing', None), 'flask', request.method, route, response.status_code))
+    return response
+
+
+#Prometheus histograms for recorded requests and queries, plus pool and SSE gauges
+@app.route('/metrics')
+def metrics():
+    body = instrumentation.render_metrics(itertools.chain(instrumentation.pool_gauges(), instrumentation.writer_gauges(),
+                                                          broker.broker.metric_lines()))
+    return app.response_class(body, content_type=instrumentation.PROMETHEUS_CONTENT_TYPE)
+
+
+#Connection pool metrics for the current database
+@app.route('/api/pool')
+def api_pool():
+    return jsonify(pool.get_pool(DB_PATH, init_db).stats())
+
+
+#Compresses the JSON bodies that do not come from the response cache, cached_json compresses those once
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    coding = wire.negotiate(request.headers.get('Accept-Encoding'), len(body))
+    response.vary.add('Accept-Encoding')
+    if coding:
+        response.set_data(wire.compress(body, coding))
+        response.headers['Content-Encoding'] = coding
+    return response
+
+
+#Built files are sent precompressed with their Cache-Control, anything else from frontend/
+def _send_frontend(filename):
+    found = built_assets and assets.resolve(built_assets, filename, request.headers.get('Accept-Encoding'))
+    if not found:
+        return send_from_directory(app.static_folder, filename)
+    stored, coding, cache_control = found
+    #The type of the file itself, not of its .gz or .br copy
+    response = send_from_directory(built_assets.directory, stored,
+                                   mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    if coding:
+        response.headers['Content-Encoding'] = coding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
 
 
 @app.route('/<path:filename>')
 def static_files(filename):
-    return send_from_directory(app.static_folder, filename)
+    return _send_frontend(filename)
 
 
 @app.route('/')
 def index():
-    return send_from_directory(app.static_folder, 'index.html')
+    return _send_frontend('index.html')
 
 
 if __name__ == '__main__':
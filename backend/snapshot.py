@@ -0,0 +1,352 @@
+"""In-memory columnar snapshot of the events, an optional read engine for the listings.
+
+SPORTS_READ_ENGINE=snapshot answers GET /api/events (Flask) and GET /events/
+(FastAPI) from the snapshot instead of SQL; sqlite, the default, keeps the
+queries. Both engines return the same rows, so the handlers only choose where
+the plain events come from. Series (events with a recurrence rule) are not in
+the snapshot, they are few and keep coming from SQL.
+
+Every event has a slot and slots are kept in (event_date, event_time,
+event_id) order, the order of idx_event_date_time_id: a date window or a keyset
+cursor is a bisect, a page is a slice. Columns are array('i') holding ids or
+codes into intern tables (dates and times, descriptions, participant names),
+participants are an append-only pair of columns found through two arrays
+indexed by event id. Filters run over array slices in C: a LIKE pattern is
+matched once per distinct venue or participant name, then itertools.compress
+keeps the slots whose value is in the matching set.
+
+Writes are followed through the event_change log like backend/facets.py does:
+changed events are taken out and put back at their sorted slot (array inserts
+and deletes are memmoves), and the snapshot is rebuilt when too many events
+changed or the entries left behind by removed events outnumber the live ones.
+"""
+import bisect
+import json
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from itertools import compress, repeat
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend import recurrence, sync
+
+ENGINES = ('sqlite', 'snapshot')
+ENGINE = os.environ.get('SPORTS_READ_ENGINE', 'sqlite')
+#Re-reading more changed events than this is slower than a rebuild
+MAX_CATCH_UP = 50000
+#Removed events leave their description and participant entries behind until the next build
+MIN_STALE_ENTRIES = 4096
+BUILD_BATCH_SIZE = 50000
+
+#Unary + keeps SQLite off idx_event_date_time_id: sorting one sequential scan beats a table seek per row
+_EVENTS = f'''
+    SELECT e.event_id, e.event_date, e.event_time, e.description, e.sport_id_foreignkey, e.venue_id_foreignkey
+    FROM event e
+    WHERE {recurrence.NOT_A_SERIES}
+    ORDER BY +e.event_date, +e.event_time, e.event_id
+'''
+_PARTICIPANTS = 'SELECT event_id_foreignkey, participant_name FROM event_participant ORDER BY event_id_foreignkey'
+
+#The same columns for a few changed events, with the names they join to
+_ROWS = f'''
+    SELECT e.event_id, e.event_date, e.event_time, e.description, e.sport_id_foreignkey, e.venue_id_foreignkey,
+           s.name, v.name,
+           (SELECT json_group_array(ep.participant_name)
+            FROM event_participant ep
+            WHERE ep.event_id_foreignkey = e.event_id)
+    FROM event e
+    LEFT JOIN sport s ON s.sport_id = e.sport_id_foreignkey
+    LEFT JOIN venue v ON v.venue_id = e.venue_id_foreignkey
+    WHERE e.event_id IN (SELECT value FROM json_each(?)) AND {recurrence.NOT_A_SERIES}
+'''
+
+
+def enabled() -> bool:
+    return ENGINE == 'snapshot'
+
+
+class _Strings:
+    """Intern table: every distinct string is stored once, columns hold its code. Code 0 is None."""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = [None]
+        self.codes: Optional[Dict[str, int]] = {}
+
+    #Drops the lookup table, later strings are appended without looking for a copy. For mostly
+    #unique values (descriptions) the table would cost more than the duplicates it saves
+    def seal(self) -> None:
+        self.codes = None
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        if self.codes is None:
+            self.values.append(value)
+            return len(self.values) - 1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+#SQLite's LIKE: % and _ are wildcards, case is ignored for ASCII letters only
+def _like(pattern: str) -> Callable[[str], Optional[re.Match]]:
+    regex = ''.join('.*' if ch == '%' else '.' if ch == '_' else re.escape(ch) for ch in pattern)
+    return re.compile(regex, re.IGNORECASE | re.ASCII | re.DOTALL).fullmatch
+
+
+#Grows an array indexed by event id so it holds event_id, new entries are -1
+def _cover(column: array, event_id: int) -> None:
+    if event_id >= len(column):
+        column.extend(array('i', [-1]) * max(event_id + 1 - len(column), len(column)))
+
+
+class EventSnapshot:
+    """Columns over the plain events of one database, see the module docstring."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.revision = -1
+        self._reset()
+
+    def _reset(self) -> None:
+        #One entry per slot, in calendar order
+        self.event_id = array('i')
+        self.date = array('i')
+        self.time = array('i')
+        self.description = array('i')
+        self.sport = array('i')
+        self.venue = array('i')
+        #Indexed by event id: the sort key of its slot (-1 when it has none) and its participant entries
+        self.date_of = array('i')
+        self.time_of = array('i')
+        self.participants_at = array('i')
+        self.participants_len = array('i')
+        #(event id, name code) pairs, removed entries get name code -1
+        self.participant_event = array('i')
+        self.participant_name = array('i')
+        self.stale = 0
+        self.dates = _Strings()
+        self.texts = _Strings()
+        self.names = _Strings()
+        self.sport_names: Dict[int, str] = {}
+        self.venue_names: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.event_id)
+
+    def _key(self, slot: int) -> Tuple[str, str, int]:
+        return (self.dates.values[self.date[slot]] or '', self.dates.values[self.time[slot]] or '',
+                self.event_id[slot])
+
+    def _day(self, slot: int) -> str:
+        return self.dates.values[self.date[slot]] or ''
+
+    def build(self, conn: sqlite3.Connection) -> None:
+        #Changes after this revision are applied again by the next refresh, which is harmless
+        revision = sync.current_revision(conn)
+        self._reset()
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        self.sport_names = dict(cursor.execute('SELECT sport_id, name FROM sport'))
+        self.venue_names = dict(cursor.execute('SELECT venue_id, name FROM venue'))
+        cursor.execute(_EVENTS)
+        #A batch of columns at a time, like FacetIndex.build
+        for rows in iter(lambda: cursor.fetchmany(BUILD_BATCH_SIZE), []):
+            ids, dates, times, descriptions, sports, venues = zip(*rows)
+            self.event_id.extend(ids)
+            self.date.extend(map(self.dates.code, dates))
+            self.time.extend(map(self.dates.code, times))
+            self.description.extend(map(self.texts.code, descriptions))
+            self.sport.extend(value or 0 for value in sports)
+            self.venue.extend(value or 0 for value in venues)
+        self.texts.seal()
+        size = max(self.event_id, default=0) + 1
+        self.date_of = array('i', [-1]) * size
+        self.time_of = array('i', [-1]) * size
+        for event_id, date, time in zip(self.event_id, self.date, self.time):
+            self.date_of[event_id] = date
+            self.time_of[event_id] = time
+
+        self.participants_at = array('i', [-1]) * size
+        self.participants_len = array('i', [0]) * size
+        cursor.execute(_PARTICIPANTS)
+        for rows in iter(lambda: cursor.fetchmany(BUILD_BATCH_SIZE), []):
+            ids, names = zip(*rows)
+            self.participant_event.extend(ids)
+            self.participant_name.extend(map(self.names.code, names))
+        #Rows come grouped by event, so each event's entries are one run
+        for position, event_id in enumerate(self.participant_event):
+            if 0 <= event_id < size:
+                if self.participants_len[event_id] == 0:
+                    self.participants_at[event_id] = position
+                self.participants_len[event_id] += 1
+        self.revision = revision
+
+    def _participants(self, event_id: int) -> array:
+        at = self.participants_at[event_id] if event_id < len(self.participants_at) else -1
+        return self.participant_name[at:at + self.participants_len[event_id]] if at >= 0 else array('i')
+
+    def _remove(self, event_id: int) -> None:
+        if event_id >= len(self.date_of) or self.date_of[event_id] < 0:
+            return
+        key = (self.dates.values[self.date_of[event_id]] or '', self.dates.values[self.time_of[event_id]] or '',
+               event_id)
+        slot = bisect.bisect_left(range(len(self.event_id)), key, key=self._key)
+        for column in (self.event_id, self.date, self.time, self.description, self.sport, self.venue):
+            del column[slot]
+        self.date_of[event_id] = self.time_of[event_id] = -1
+        self.stale += 1
+        at, count = self.participants_at[event_id], self.participants_len[event_id]
+        if count:
+            self.participant_name[at:at + count] = array('i', repeat(-1, count))
+            self.stale += count
+            self.participants_at[event_id], self.participants_len[event_id] = -1, 0
+
+    def _insert(self, row: Tuple) -> None:
+        event_id, event_date, event_time, description, sport_id, venue_id, sport_name, venue_name, names = row
+        #The joined names are current: a rename touches every event of the sport or venue
+        for known, key, name in ((self.sport_names, sport_id, sport_name), (self.venue_names, venue_id, venue_name)):
+            if name is None:
+                known.pop(key, None)
+            else:
+                known[key] = name
+        slot = bisect.bisect_left(range(len(self.event_id)),
+                                  (event_date or '', event_time or '', event_id), key=self._key)
+        date, time = self.dates.code(event_date), self.dates.code(event_time)
+        for column, value in ((self.event_id, event_id), (self.date, date), (self.time, time),
+                              (self.description, self.texts.code(description)), (self.sport, sport_id or 0),
+                              (self.venue, venue_id or 0)):
+            column.insert(slot, value)
+        for column in (self.date_of, self.time_of, self.participants_at, self.participants_len):
+            _cover(column, event_id)
+        self.date_of[event_id], self.time_of[event_id] = date, time
+        names = json.loads(names) if names else []
+        self.participants_at[event_id] = len(self.participant_event) if names else -1
+        self.participants_len[event_id] = len(names)
+        self.participant_event.extend(repeat(event_id, len(names)))
+        self.participant_name.extend(map(self.names.code, names))
+
+    #Brings the snapshot up to the latest revision of the change log
+    def refresh(self, conn: sqlite3.Connection) -> None:
+        latest = sync.current_revision(conn)
+        if latest == self.revision:
+            return
+        #Never built, or the database went back in time (e.g. a restore)
+        if self.revision < 0 or latest < self.revision:
+            self.build(conn)
+            return
+        changed = [r[0] for r in conn.execute('SELECT event_id FROM event_change WHERE revision > ? LIMIT ?',
+                                              (self.revision, MAX_CATCH_UP + 1))]
+        if len(changed) > MAX_CATCH_UP:
+            self.build(conn)
+            return
+        for event_id in changed:
+            self._remove(event_id)
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        for row in cursor.execute(_ROWS, (json.dumps(changed),)).fetchall():
+            self._insert(row)
+        self.revision = latest
+        if self.stale > max(MIN_STALE_ENTRIES, len(self.event_id) + len(self.participant_event) - self.stale):
+            self.build(conn)
+
+    #Slots of the events dated in [start, end)
+    def _window(self, start: Optional[str], end: Optional[str]) -> Tuple[int, int]:
+        slots = range(len(self.event_id))
+        lo = bisect.bisect_left(slots, start, key=self._day) if start else 0
+        hi = bisect.bisect_left(slots, end, key=self._day) if end else len(slots)
+        return lo, max(lo, hi)
+
+    #Rows shaped like backend.queries.CALENDAR_COLUMNS, after an optional (date, time, id) cursor
+    def calendar(self, start: Optional[str], end: Optional[str], after: Optional[Tuple[str, str, int]] = None,
+                 limit: Optional[int] = None) -> List[Dict]:
+        lo, hi = self._window(start, end)
+        if after:
+            lo = max(lo, bisect.bisect_right(range(len(self.event_id)), tuple(after), key=self._key))
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        dates, texts = self.dates.values, self.texts.values
+        rows = []
+        for slot in range(lo, hi):
+            event_date, event_time = dates[self.date[slot]], dates[self.time[slot]]
+            sport, venue = self.sport_names.get(self.sport[slot]), self.venue_names.get(self.venue[slot])
+            rows.append({
+                'id': self.event_id[slot],
+                'title': f"{sport or 'Event'} @ {venue or 'Venue'}",
+                'start': f'{event_date}T{event_time}' if event_date and event_time else None,
+                'description': texts[self.description[slot]],
+                'sport_name': sport,
+                'venue_name': venue,
+            })
+        return rows
+
+    #Rows shaped like the plain rows of backend.routers.events.fetch_events: events whose sport and
+    #venue exist (the query joins them), optionally matching LIKE '%venue_name%' / '%participant_name%'
+    def events(self, venue_name: Optional[str], participant_name: Optional[str], start: Optional[str] = None,
+               end: Optional[str] = None) -> List[Dict]:
+        lo, hi = self._window(start, end)
+        slots = range(lo, hi)
+        venues = self.venue_names
+        if venue_name:
+            match = _like(f'%{venue_name}%')
+            venues = {venue_id for venue_id, name in venues.items() if match(name)}
+        kept = compress(slots, map(venues.__contains__, self.venue[lo:hi]))
+        if participant_name:
+            match = _like(f'%{participant_name}%')
+            codes = {code for code, name in enumerate(self.names.values) if name is not None and match(name)}
+            if (hi - lo) * 8 < len(self.participant_event):
+                #A narrow window: look at the participants of its events only
+                kept = (slot for slot in kept if not codes.isdisjoint(self._participants(self.event_id[slot])))
+            else:
+                events = set(compress(self.participant_event, map(codes.__contains__, self.participant_name)))
+                kept = (slot for slot in kept if self.event_id[slot] in events)
+        dates = self.dates.values
+        rows = []
+        for slot in kept:
+            sport = self.sport_names.get(self.sport[slot])
+            if sport is None:
+                continue
+            rows.append({
+                'event_id': self.event_id[slot],
+                'event_date': dates[self.date[slot]],
+                'event_time': dates[self.time[slot]],
+                'sport': sport,
+                'venue': self.venue_names[self.venue[slot]],
+                'series_rrule': None,
+                'series_exdates': None,
+            })
+        return rows
+
+
+_snapshots: Dict[str, EventSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+
+#One snapshot per database file, keyed by the path SQLite reports for the connection
+def snapshot_for(conn: sqlite3.Connection) -> EventSnapshot:
+    path = conn.execute('PRAGMA database_list').fetchone()[2]
+    with _snapshots_lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is None:
+            snapshot = _snapshots[path] = EventSnapshot()
+    return snapshot
+
+
+def calendar_rows(conn: sqlite3.Connection, start: Optional[str], end: Optional[str],
+                  after: Optional[Tuple[str, str, int]] = None, limit: Optional[int] = None) -> List[Dict]:
+    snapshot = snapshot_for(conn)
+    with snapshot.lock:
+        snapshot.refresh(conn)
+        return snapshot.calendar(start, end, after, limit)
+
+
+def event_rows(conn: sqlite3.Connection, venue_name: Optional[str], participant_name: Optional[str],
+               start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+    snapshot = snapshot_for(conn)
+    with snapshot.lock:
+        snapshot.refresh(conn)
+        return snapshot.events(venue_name, participant_name, start, end)
@@ -0,0 +1,172 @@
+import sqlite3
+from typing import Dict, Optional, Tuple
+
+from backend.queries import CALENDAR_COLUMNS, CALENDAR_JOINS
+
+#A delta bigger than this is answered with reset, reloading the window is cheaper for the client then
+MAX_CHANGES = 5000
+
+#One row per event: the revision and unix time of its last change, the revision it was created at and
+#a tombstone flag. Events that existed before change tracking have created_revision 0.
+CHANGE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS event_change (
+        event_id INTEGER PRIMARY KEY,
+        revision INTEGER NOT NULL,
+        created_revision INTEGER NOT NULL,
+        deleted INTEGER NOT NULL DEFAULT 0,
+        changed_at INTEGER NOT NULL DEFAULT 0
+    )
+'''
+CHANGE_INDEX = 'CREATE INDEX IF NOT EXISTS idx_event_change_revision ON event_change (revision)'
+
+#Writes are serialized by SQLite, so max + 1 is strictly increasing
+_NEXT_REVISION = '(SELECT COALESCE(MAX(revision), 0) + 1 FROM event_change)'
+_NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+
+#Bumps the revision of the existing events selected by the WHERE clause
+def _touch(where: str) -> str:
+    return f'''
+        INSERT INTO event_change (event_id, revision, created_revision, changed_at)
+        SELECT event_id, {_NEXT_REVISION}, 0, {_NOW} FROM event WHERE {where}
+        ON CONFLICT (event_id) DO UPDATE SET revision = excluded.revision, changed_at = excluded.changed_at;
+    '''
+
+
+def _tombstone(event_id: str) -> str:
+    return f'''
+        INSERT INTO event_change (event_id, revision, created_revision, deleted, changed_at)
+        VALUES ({event_id}, {_NEXT_REVISION}, 0, 1, {_NOW})
+        ON CONFLICT (event_id) DO UPDATE SET revision = excluded.revision, deleted = 1,
+            changed_at = excluded.changed_at;
+    '''
+
+
+#Bulk writers switch the triggers off inside their own transaction and record the chunk in one statement
+CONTROL_TABLE = 'CREATE TABLE IF NOT EXISTS event_change_control (suspended INTEGER NOT NULL)'
+_ACTIVE = '(SELECT suspended FROM event_change_control) = 0'
+
+_CREATED = f'''
+    INSERT INTO event_change (event_id, revision, created_revision, deleted, changed_at)
+    SELECT event_id, {_NEXT_REVISION}, {_NEXT_REVISION}, 0, {_NOW} FROM event WHERE {{where}}
+    ON CONFLICT (event_id) DO UPDATE SET revision = excluded.revision,
+        created_revision = excluded.created_revision, deleted = 0, changed_at = excluded.changed_at;
+'''
+
+#Every write that changes what /api/events returns for an event bumps its revision: (event, extra condition, body)
+TRIGGERS = {
+    'event_change_event_insert': ('AFTER INSERT ON event', '', _CREATED.format(where='event_id = NEW.event_id')),
+    'event_change_event_update': ('AFTER UPDATE ON event', '', _touch('event_id = NEW.event_id')),
+    'event_change_event_rekey': ('AFTER UPDATE OF event_id ON event', 'OLD.event_id <> NEW.event_id',
+                                 _tombstone('OLD.event_id')),
+    'event_change_event_delete': ('AFTER DELETE ON event', '', _tombstone('OLD.event_id')),
+    'event_change_participant_insert': ('AFTER INSERT ON event_participant', '',
+                                        _touch('event_id = NEW.event_id_foreignkey')),
+    'event_change_participant_delete': ('AFTER DELETE ON event_participant', '',
+                                        _touch('event_id = OLD.event_id_foreignkey')),
+    'event_change_sport_update': ('AFTER UPDATE OF name ON sport', '',
+                                  _touch('sport_id_foreignkey = NEW.sport_id')),
+    'event_change_venue_update': ('AFTER UPDATE OF name ON venue', '',
+                                  _touch('venue_id_foreignkey = NEW.venue_id')),
+    #Not part of /api/events, but the facet index counts events by city
+    'event_change_venue_move': ('AFTER UPDATE OF city ON venue', 'OLD.city IS NOT NEW.city',
+                                _touch('venue_id_foreignkey = NEW.venue_id')),
+    'event_change_recurrence_insert': ('AFTER INSERT ON event_recurrence', '', _touch('event_id = NEW.event_id')),
+    'event_change_recurrence_update': ('AFTER UPDATE ON event_recurrence', '', _touch('event_id = NEW.event_id')),
+}
+
+
+def ensure_change_log(conn: sqlite3.Connection) -> None:
+    conn.execute(CHANGE_TABLE)
+    columns = {r[1] for r in conn.execute('PRAGMA table_info(event_change)')}
+    if 'changed_at' not in columns:
+        #Change logs from before changed_at: add the column and recreate the triggers that fill it
+        conn.execute('ALTER TABLE event_change ADD COLUMN changed_at INTEGER NOT NULL DEFAULT 0')
+        for name in TRIGGERS:
+            conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    conn.execute(CHANGE_INDEX)
+    conn.execute(CONTROL_TABLE)
+    if conn.execute('SELECT 1 FROM event_change_control').fetchone() is None:
+        conn.execute('INSERT INTO event_change_control (suspended) VALUES (0)')
+    for name, (event, condition, body) in TRIGGERS.items():
+        when = _ACTIVE + (f' AND {condition}' if condition else '')
+        conn.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} WHEN {when} BEGIN {body} END')
+    conn.commit()
+
+
+def has_change_log(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_change'").fetchone()
+    return row is not None
+
+
+#Must be called inside the caller's write transaction, other connections never see the triggers off
+def suspend_triggers(conn: sqlite3.Connection) -> bool:
+    if not has_change_log(conn):
+        return False
+    conn.execute('UPDATE event_change_control SET suspended = 1')
+    return True
+
+
+#Re-enables the triggers and records the events inserted while they were off as created
+def resume_triggers(conn: sqlite3.Connection, first_event_id: int, last_event_id: int) -> None:
+    conn.execute('UPDATE event_change_control SET suspended = 0')
+    conn.execute(_CREATED.format(where='event_id BETWEEN ? AND ?'), (first_event_id, last_event_id))
+
+
+def current_revision(conn: sqlite3.Connection) -> int:
+    return conn.execute('SELECT COALESCE(MAX(revision), 0) FROM event_change').fetchone()[0]
+
+
+#(revision, unix time) of the newest change, (0, None) before anything changed. One index seek
+def latest_change(conn: sqlite3.Connection) -> Tuple[int, Optional[int]]:
+    row = conn.execute('SELECT revision, changed_at FROM event_change ORDER BY revision DESC LIMIT 1').fetchone()
+    return (row[0], row[1] or None) if row is not None else (0, None)
+
+
+def encode_token(revision: int) -> str:
+    return str(revision)
+
+
+#Raises ValueError for anything that is not a revision this server could have handed out
+def decode_token(token: str) -> int:
+    revision = int(token)
+    if revision < 0:
+        raise ValueError(token)
+    return revision
+
+
+#Created, updated and deleted events after the given revision, with the token to pass next time.
+#Returns {'reset': True, ...} when the client has to reload instead: too many changes, a changed
+#recurring event (its occurrences depend on the client's window), or a token from a newer database
+#(e.g. after a restore).
+def changes_since(conn: sqlite3.Connection, revision: int, max_changes: int = MAX_CHANGES) -> Dict:
+    rows = conn.execute(f'''
+        SELECT c.event_id AS changed_id, c.revision, c.created_revision, c.deleted, {CALENDAR_COLUMNS},
+               r.event_id IS NOT NULL AS series
+        FROM event_change c
+        LEFT JOIN event e ON e.event_id = c.event_id
+        LEFT JOIN event_recurrence r ON r.event_id = c.event_id
+        {CALENDAR_JOINS}
+        WHERE c.revision > ?
+        ORDER BY c.revision, c.event_id
+        LIMIT ?
+    ''', (revision, max_changes + 1)).fetchall()
+
+    if (len(rows) > max_changes or (not rows and revision > current_revision(conn))
+            or any(r['series'] for r in rows)):
+        return {'reset': True, 'token': encode_token(current_revision(conn))}
+
+    created, updated, deleted = [], [], []
+    for r in rows:
+        if r['deleted'] or r['id'] is None:
+            #Created and deleted since the last sync: the client never saw it
+            if r['created_revision'] <= revision:
+                deleted.append(r['changed_id'])
+            continue
+        event = {k: r[k] for k in ('id', 'title', 'start', 'description', 'sport_name', 'venue_name')}
+        (created if r['created_revision'] > revision else updated).append(event)
+
+    #Rows are ordered by revision, so the last one is the newest change this client has seen
+    token = rows[-1]['revision'] if rows else revision
+    return {'created': created, 'updated': updated, 'deleted': deleted, 'token': encode_token(token)}
+
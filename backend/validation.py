@@ -0,0 +1,61 @@
+import datetime
+from typing import Dict, NamedTuple, Optional
+
+#Events have no end time of their own, they occupy their venue for duration_minutes
+DEFAULT_DURATION_MINUTES = 120
+MAX_DURATION_MINUTES = 24 * 60
+
+
+class EventValidationError(ValueError):
+    pass
+
+
+class EventFields(NamedTuple):
+    sport_id: int
+    venue_id: int
+    event_date: str
+    event_time: str
+    description: Optional[str]
+    duration_minutes: int
+
+
+#Field and ID rules shared by POST /api/events, FastAPI create_event and the bulk importer
+def validate_event(data: Dict) -> EventFields:
+    sport_id = data.get('sport_id_foreignkey') or data.get('sport_id')
+    venue_id = data.get('venue_id_foreignkey') or data.get('venue_id')
+    event_date = data.get('event_date')
+    event_time = data.get('event_time')
+    description = data.get('description')
+    duration = data.get('duration_minutes')
+
+    #Handling missing fields
+    if not (sport_id and venue_id and event_date and event_time):
+        raise EventValidationError('Missing required fields')
+
+    try:
+        sport_id = int(sport_id)
+        venue_id = int(venue_id)
+    except Exception:
+        #Dealing with invalid IDs
+        raise EventValidationError('Invalid sport_id or venue_id')
+
+    if duration is None or duration == '':
+        duration = DEFAULT_DURATION_MINUTES
+    try:
+        duration = int(duration)
+    except Exception:
+        duration = 0
+    if not 0 < duration <= MAX_DURATION_MINUTES:
+        raise EventValidationError(f'duration_minutes must be between 1 and {MAX_DURATION_MINUTES}')
+
+    return EventFields(sport_id, venue_id, event_date, event_time, description, duration)
+
+
+#Listing windows: dates are YYYY-MM-DD, end is the day after the last date
+def check_window(start: Optional[str], end: Optional[str]) -> None:
+    for name, value in (('start', start), ('end', end)):
+        if value:
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                raise EventValidationError(f'{name} must be a date (YYYY-MM-DD)')
@@ -0,0 +1,301 @@
+"""Group commit for single-event inserts.
+
+Each database gets one writer thread that owns one connection. POST handlers of
+both backends hand it a validated EventWrite and wait on a Future. The writer
+takes everything that queued up while it was busy, waits up to MAX_DELAY for
+more, and stores up to MAX_BATCH events in one transaction: one lock
+acquisition and one commit (one fsync with synchronous=FULL) for the whole
+batch instead of per event, and no writers spinning on "database is locked".
+
+Every event runs in its own savepoint, so a double booking or a bad team
+rolls back that event only. Futures are resolved after COMMIT, so a caller
+never sees an event id that is not stored, and an error that sinks the whole
+transaction is raised to every caller in the batch. Callers wait without a
+deadline, so the writer resolves every future it takes: cache invalidation and
+notifications after COMMIT cannot fail a write, and a writer thread that dies
+fails what is queued and is replaced by the next submit.
+
+Durability is a per-process setting: SPORTS_WRITE_SYNCHRONOUS is the
+synchronous pragma of the writer connection (OFF, NORMAL or FULL; with WAL,
+NORMAL can lose the last commits on power loss but never corrupts).
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from backend import broker, conflicts, importer, instrumentation, pool, recurrence
+from backend.cache import response_cache
+from backend.validation import EventFields, EventValidationError, validate_event
+
+MAX_BATCH = int(os.environ.get('SPORTS_WRITE_BATCH_SIZE', '256'))
+MAX_DELAY = float(os.environ.get('SPORTS_WRITE_MAX_DELAY_MS', '2')) / 1000
+SYNCHRONOUS = os.environ.get('SPORTS_WRITE_SYNCHRONOUS', 'NORMAL').upper()
+#Submitting to a full queue fails fast instead of piling up requests
+MAX_QUEUE = int(os.environ.get('SPORTS_WRITE_QUEUE_SIZE', '10000'))
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+_log = logging.getLogger(__name__)
+
+_INSERT = '''
+    INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time, description, duration_minutes)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+class WriterBusy(sqlite3.OperationalError):
+    pass
+
+
+#participants is the raw list from the request, None when the endpoint does not take participants
+class EventWrite(NamedTuple):
+    fields: EventFields
+    series: Optional[Tuple[str, str, Optional[str]]]
+    participants: Optional[list]
+    policy: str
+
+
+#Raises EventValidationError, so handlers can answer 400 before anything is queued
+def prepare(data: Dict, policy: str, with_participants: bool = True) -> EventWrite:
+    fields = validate_event(data)
+    series = recurrence.parse_recurrence(data, fields.event_date)
+    return EventWrite(fields, series, data.get('participants') if with_participants else None, policy)
+
+
+#Stores one event inside the caller's transaction, returns its id and the events it overlaps
+def insert(conn: sqlite3.Connection, write: EventWrite, teams: Dict[str, int]) -> Tuple[int, List[int]]:
+    participants = importer.resolve_participants({'participants': write.participants}, teams)
+    overlaps = conflicts.check_booking(conn, write.fields, write.policy, write.series)
+    event_id = conn.execute(_INSERT, tuple(write.fields)).lastrowid
+    if write.series:
+        recurrence.insert_recurrences(conn, [(event_id, write.series)])
+    if participants:
+        conn.executemany('''
+            INSERT INTO event_participant (event_id_foreignkey, participant_name, team_id_foreignkey)
+            VALUES (?, ?, ?)
+        ''', [(event_id, name, team_id) for name, team_id in participants])
+    return event_id, overlaps
+
+
+class _Pending(NamedTuple):
+    write: EventWrite
+    future: Future
+
+
+class GroupCommitWriter:
+    """Single writer thread for one database file, see the module docstring."""
+
+    def __init__(self, path: str, initializer: Optional[Callable[[sqlite3.Connection], None]] = None,
+                 max_batch: int = MAX_BATCH, max_delay: float = MAX_DELAY, synchronous: str = SYNCHRONOUS,
+                 max_queue: int = MAX_QUEUE):
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous must be one of: {', '.join(SYNCHRONOUS_MODES)}")
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.synchronous = synchronous
+        self._pool = pool.get_pool(path, initializer)
+        self._queue: 'queue.Queue[Optional[_Pending]]' = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.max_batch_seen = 0
+        self._last_batch = 0
+
+    def submit(self, write: EventWrite) -> Future:
+        if self._closed:
+            raise WriterBusy('Writer is closed')
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait(_Pending(write, future))
+        except queue.Full:
+            raise WriterBusy(f'More than {self._queue.maxsize} writes are waiting')
+        return future
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sports-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        #Holds one pooled connection for its lifetime, the pragma only applies to it
+        try:
+            conn = self._pool.acquire()
+            conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        except Exception as exc:
+            #The next submit starts a new thread, the writes queued so far get the error
+            with self._lock:
+                self._thread = None
+            self._fail_queued(exc)
+            return
+        batch: List[_Pending] = []
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch:
+                    self._commit(conn, batch)
+                if self._closed and self._queue.empty():
+                    break
+        except Exception as exc:
+            _log.exception('Writer for %s stopped', self.path)
+            with self._lock:
+                self._thread = None
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            self._fail_queued(exc)
+        finally:
+            try:
+                conn.execute(f"PRAGMA synchronous = {dict(pool.PRAGMAS)['synchronous']}")
+            finally:
+                self._pool.release(conn)
+
+    #Blocks for the first write, then takes what is queued. It only waits up to max_delay for more
+    #when the previous batch had company, so a lone client does not pay the delay on every insert
+    def _next_batch(self) -> List[_Pending]:
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + (self.max_delay if self._last_batch > 1 else 0)
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        self._last_batch = len(batch)
+        return batch
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[_Pending]) -> None:
+        began = time.perf_counter()
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            teams = importer.load_teams(conn) if any(p.write.participants for p in batch) else {}
+            for pending in batch:
+                conn.execute('SAVEPOINT event_write')
+                try:
+                    results.append(insert(conn, pending.write, teams))
+                except (EventValidationError, conflicts.BookingConflict, sqlite3.IntegrityError) as exc:
+                    conn.execute('ROLLBACK TO event_write')
+                    results.append(exc)
+                conn.execute('RELEASE event_write')
+            conn.commit()
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.rollback()
+            for pending in batch:
+                pending.future.set_exception(exc)
+            with self._lock:
+                self.failed += len(batch)
+            return
+        finally:
+            instrumentation.WRITE_COMMIT_SECONDS.observe(time.perf_counter() - began)
+            instrumentation.WRITE_BATCH_SIZE.observe(len(batch))
+
+        written = sum(1 for result in results if not isinstance(result, Exception))
+        with self._lock:
+            self.batches += 1
+            self.written += written
+            self.failed += len(batch) - written
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        if written:
+            #Once per batch, before any caller can read its own write
+            try:
+                response_cache.invalidate(self.path)
+            except Exception:
+                _log.exception('Invalidating the response cache of %s failed', self.path)
+        for pending, result in zip(batch, results):
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+        for result in results:
+            if not isinstance(result, Exception):
+                try:
+                    broker.publish_event_created(self.path, conn, result[0])
+                except Exception:
+                    _log.exception('Publishing event %s failed', result[0])
+
+    def _fail_queued(self, exc: Exception) -> None:
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if pending is not None:
+                pending.future.set_exception(exc)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'path': self.path,
+                'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'written': self.written,
+                'failed': self.failed,
+                'max_batch': self.max_batch_seen,
+                'avg_batch': round(self.written / self.batches, 2) if self.batches else 0.0,
+                'synchronous': self.synchronous,
+            }
+
+    #Writes already queued are still committed
+    def close(self) -> None:
+        self._closed = True
+        thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+_writers: Dict[str, GroupCommitWriter] = {}
+_writers_lock = threading.Lock()
+
+
+#One writer per database file, shared by every backend in the process
+def get_writer(path: str, initializer: Optional[Callable[[sqlite3.Connection], None]] = None) -> GroupCommitWriter:
+    key = os.path.abspath(path)
+    writer = _writers.get(key)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(key)
+            if writer is None:
+                writer = _writers[key] = GroupCommitWriter(key, initializer)
+    return writer
+
+
+def submit(path: str, initializer: Optional[Callable[[sqlite3.Connection], None]], write: EventWrite) -> Future:
+    return get_writer(path, initializer).submit(write)
+
+
+def all_stats() -> List[Dict]:
+    with _writers_lock:
+        writers = list(_writers.values())
+    return [w.stats() for w in writers]
+
+
+def close_all() -> None:
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,99 @@
+"""Sync vs async FastAPI routers under concurrent load.
+
+Seeds a throwaway database, then drives backend.main (sync handlers on the
+anyio threadpool) and backend.async_main (async handlers on the bounded DB
+executor) in-process through httpx's ASGI transport.
+
+    python -m benchmarks.bench_async --events 20000 --requests 512
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from backend import db
+from benchmarks import datagen
+
+CONCURRENCY = (1, 16, 128)
+
+
+#A mix of a filtered listing (a real query) and a cached lookup, like a calendar page load
+def next_url(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return f'/events/?venue_name=Venue {rng.randint(1, 199)}'
+    return f'/events/{rng.randint(1, 1000)}'
+
+
+async def drive(app, concurrency: int, total: int) -> dict:
+    rng = random.Random(concurrency)
+    urls = [next_url(rng) for _ in range(total)]
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+
+        async def worker():
+            while not queue.empty():
+                url = queue.get_nowait()
+                began = time.perf_counter()
+                r = await client.get(url)
+                latencies.append(time.perf_counter() - began)
+                assert r.status_code == 200, (url, r.status_code)
+
+        began = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'rps': round(total / elapsed, 1),
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=512)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='sports-bench-')
+    db.DB_PATH = os.path.join(workdir, 'bench.db')
+    datagen.generate(db.DB_PATH, args.events, venues=200, teams=100, sports=10)
+
+    #Imported after DB_PATH is set so both apps use the seeded database
+    from backend.async_main import app as async_app
+    from backend.main import app as sync_app
+
+    results = []
+    for name, app in (('sync', sync_app), ('async', async_app)):
+        for concurrency in CONCURRENCY:
+            row = asyncio.run(drive(app, concurrency, args.requests))
+            row['variant'] = name
+            results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'variant':<8}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for row in results:
+        print(f"{row['variant']:<8}{row['concurrency']:>8}{row['rps']:>10}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+
+if __name__ == '__main__':
+    main()
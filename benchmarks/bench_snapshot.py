@@ -0,0 +1,131 @@
+"""SQLite vs the in-memory snapshot (backend/snapshot.py) for the listing queries.
+
+Generates a throwaway database, builds the snapshot and reports its memory per
+event (tracemalloc) and the median latency of each query on both engines. The
+queries run in-process on one connection, without HTTP and JSON, so the
+numbers are the part of a request the engine choice changes:
+
+    python -m benchmarks.bench_snapshot --events 200000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from backend import migrations, recurrence, snapshot
+from backend.queries import CALENDAR_COLUMNS, CALENDAR_JOINS
+from backend.routers import events
+from benchmarks import datagen
+from benchmarks.suite import MONTHS, _next_month
+
+_CALENDAR = f'''
+    SELECT {CALENDAR_COLUMNS} FROM event e {CALENDAR_JOINS}
+    WHERE {recurrence.NOT_A_SERIES} AND e.event_date >= ? AND e.event_date < ?
+    ORDER BY e.event_date, e.event_time, e.event_id
+'''
+_FIRST_PAGE = f'''
+    SELECT {CALENDAR_COLUMNS} FROM event e {CALENDAR_JOINS}
+    WHERE {recurrence.NOT_A_SERIES}
+    ORDER BY e.event_date, e.event_time, e.event_id LIMIT 501
+'''
+
+
+def _median_ms(run: Callable, rng: random.Random, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        run(rng)
+        timings.append((time.perf_counter() - began) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def _sqlite_events(conn, venue_name, participant_name, start=None, end=None):
+    query, params = events._build_events_query(venue_name, participant_name, start, end)
+    return [dict(r) for r in conn.execute(query, params)]
+
+
+def run(events_count: int = 100000, venues: int = 1000, teams: int = 1000, repeat: int = 20) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        datagen.generate(path, events_count, venues, teams, fts=False)
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        migrations.migrate(conn)
+
+        #Measured on a second build, tracing slows every allocation down
+        tracemalloc.start()
+        traced_view = snapshot.EventSnapshot()
+        traced_view.build(conn)
+        traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del traced_view
+        began = time.perf_counter()
+        view = snapshot.EventSnapshot()
+        view.build(conn)
+        build_s = time.perf_counter() - began
+
+        month = lambda rng: (lambda m: (f'{m}-01', _next_month(m)))(rng.choice(MONTHS))
+        venue = lambda rng: f'Venue {rng.randint(1, venues)}'
+        team = lambda rng: f'Team {rng.randint(1, teams)}'
+        queries = {
+            'calendar_month': (lambda rng: [dict(r) for r in conn.execute(_CALENDAR, month(rng))],
+                               lambda rng: view.calendar(*month(rng))),
+            'calendar_first_page': (lambda rng: [dict(r) for r in conn.execute(_FIRST_PAGE)],
+                                    lambda rng: view.calendar(None, None, None, 501)),
+            'events_by_venue_name': (lambda rng: _sqlite_events(conn, venue(rng), None),
+                                     lambda rng: view.events(venue(rng), None)),
+            'events_by_team_in_month': (lambda rng: _sqlite_events(conn, None, team(rng), *month(rng)),
+                                        lambda rng: view.events(None, team(rng), *month(rng))),
+        }
+        results = {}
+        for name, (sqlite_run, snapshot_run) in queries.items():
+            sqlite_ms = _median_ms(sqlite_run, random.Random(1), repeat)
+            snapshot_ms = _median_ms(snapshot_run, random.Random(1), repeat)
+            results[name] = {'sqlite_ms': sqlite_ms, 'snapshot_ms': snapshot_ms,
+                             'speedup': round(sqlite_ms / snapshot_ms, 1) if snapshot_ms else None}
+
+        #One write, then the catch-up the next read pays for
+        conn.execute("INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) "
+                     "VALUES (1, 1, '2022-06-01', '10:00')")
+        conn.commit()
+        began = time.perf_counter()
+        view.refresh(conn)
+        refresh_ms = (time.perf_counter() - began) * 1000
+        conn.close()
+    return {
+        'events': events_count,
+        'build_s': round(build_s, 2),
+        'bytes_per_event': round(traced / events_count),
+        'refresh_after_insert_ms': round(refresh_ms, 2),
+        'queries': results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--teams', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    report = run(args.events, args.venues, args.teams, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['events']} events: build {report['build_s']}s, {report['bytes_per_event']} B/event, "
+          f"refresh after an insert {report['refresh_after_insert_ms']} ms")
+    print(f"{'query':<26}{'sqlite ms':>11}{'snapshot ms':>13}{'speedup':>9}")
+    for name, row in report['queries'].items():
+        print(f"{name:<26}{row['sqlite_ms']:>11}{row['snapshot_ms']:>13}{row['speedup']:>9}")
+
+
+if __name__ == '__main__':
+    main()
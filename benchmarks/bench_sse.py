@@ -0,0 +1,157 @@
+"""Cost of idle Server-Sent Events subscribers.
+
+Opens --subscribers streams on the broker, both the way FastAPI serves them
+(one task per stream on the event loop) and the way Flask does (one thread per
+stream), and reports memory per subscriber, CPU used while they sit idle and
+the cost of fanning one message out to all of them. No sockets are involved,
+so the numbers are the broker's share of a connection.
+
+    python -m benchmarks.bench_sse --subscribers 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict
+
+from backend import broker
+
+TOPIC = 'bench'
+
+
+def rss_kb() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        #Peak, not current, but good enough where /proc is missing
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _report(subscribers: int, traced: int, rss: int, idle_cpu: float, idle: float, fanout: list) -> Dict:
+    return {
+        'subscribers': subscribers,
+        'traced_bytes_per_subscriber': round(traced / subscribers),
+        'rss_kb_per_subscriber': round(rss / subscribers, 1),
+        'idle_cpu_pct': round(idle_cpu / idle * 100, 2),
+        'fanout_ms': round(sum(fanout) / len(fanout) * 1000, 3),
+        'fanout_us_per_subscriber': round(sum(fanout) / len(fanout) / subscribers * 1e6, 3),
+    }
+
+
+async def _run_async(subscribers: int, idle: float, messages: int, keepalive: float) -> Dict:
+    b = broker.Broker(max_subscribers=subscribers)
+    loop = asyncio.get_running_loop()
+    received = 0
+    done = asyncio.Event()
+
+    async def consume(subscription):
+        nonlocal received
+        async for chunk in broker.stream_async(subscription, keepalive):
+            if chunk.startswith('event:'):
+                received += 1
+                if received == subscribers * messages:
+                    done.set()
+
+    rss_before = rss_kb()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(consume(b.subscribe(TOPIC, loop))) for _ in range(subscribers)]
+    await asyncio.sleep(0.1)
+    traced = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    rss = rss_kb() - rss_before
+
+    cpu = time.process_time()
+    await asyncio.sleep(idle)
+    idle_cpu = time.process_time() - cpu
+
+    fanout = []
+    for i in range(messages):
+        began = time.perf_counter()
+        b.publish(TOPIC, broker.encode('created', {'id': i}))
+        fanout.append(time.perf_counter() - began)
+    await asyncio.wait_for(done.wait(), 30)
+
+    b.close_all()
+    await asyncio.gather(*tasks)
+    return _report(subscribers, traced, rss, idle_cpu, idle, fanout)
+
+
+def _run_threads(subscribers: int, idle: float, messages: int, keepalive: float) -> Dict:
+    b = broker.Broker(max_subscribers=subscribers)
+    received = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def consume(subscription):
+        for chunk in broker.stream(subscription, keepalive):
+            if chunk.startswith('event:'):
+                with lock:
+                    received.append(1)
+                    if len(received) == subscribers * messages:
+                        done.set()
+
+    rss_before = rss_kb()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    threads = [threading.Thread(target=consume, args=(b.subscribe(TOPIC),), daemon=True) for _ in range(subscribers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    traced = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    rss = rss_kb() - rss_before
+
+    cpu = time.process_time()
+    time.sleep(idle)
+    idle_cpu = time.process_time() - cpu
+
+    fanout = []
+    for i in range(messages):
+        began = time.perf_counter()
+        b.publish(TOPIC, broker.encode('created', {'id': i}))
+        fanout.append(time.perf_counter() - began)
+    done.wait(30)
+
+    b.close_all()
+    for thread in threads:
+        thread.join()
+    return _report(subscribers, traced, rss, idle_cpu, idle, fanout)
+
+
+def run(subscribers: int = 1000, idle: float = 2.0, messages: int = 20, keepalive: float = broker.KEEPALIVE) -> Dict:
+    return {
+        'async': asyncio.run(_run_async(subscribers, idle, messages, keepalive)),
+        'threads': _run_threads(subscribers, idle, messages, keepalive),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--idle', type=float, default=2.0, help='seconds to measure idle CPU for')
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--keepalive', type=float, default=broker.KEEPALIVE)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = run(args.subscribers, args.idle, args.messages, args.keepalive)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'variant':<9}{'subs':>7}{'B/sub':>9}{'RSS KB/sub':>12}{'idle CPU %':>12}{'fanout ms':>11}{'us/sub':>9}")
+    for name, row in results.items():
+        print(f"{name:<9}{row['subscribers']:>7}{row['traced_bytes_per_subscriber']:>9}"
+              f"{row['rss_kb_per_subscriber']:>12}{row['idle_cpu_pct']:>12}{row['fanout_ms']:>11}"
+              f"{row['fanout_us_per_subscriber']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Bytes on the wire and encoding CPU of a calendar load, per listing format and content coding.
+
+Generates a throwaway database, loads one month through the Flask /api/events
+endpoint and reports, for the rows of that load, the body size and the median
+time to serialize (and compress) it in each combination (see backend/wire.py):
+
+    python -m benchmarks.bench_wire --events 200000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict
+
+from backend import server, wire
+from benchmarks import datagen
+
+MONTH = ('2022-03-01', '2022-04-01')
+
+
+def _median_ms(run: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - began) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def run(events_count: int = 100000, venues: int = 500, teams: int = 500, repeat: int = 20) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, server.DB_PATH = server.DB_PATH, os.path.join(tmp, 'bench.db')
+        datagen.generate(server.DB_PATH, events_count, venues, teams, fts=False)
+        try:
+            rows = server.app.test_client().get(f'/api/events?start={MONTH[0]}&end={MONTH[1]}').get_json()
+        finally:
+            server.DB_PATH = db_path
+
+    results = {}
+    for fmt in ('json', 'columns'):
+        for coding in (None,) + wire.CODINGS:
+            def encode():
+                body = wire.encode_listing(rows, fmt, server.app.json.dumps)[0]
+                return wire.compress(body, coding) if coding else body
+            results[f"{fmt}+{coding or 'identity'}"] = {'bytes': len(encode()), 'encode_ms': _median_ms(encode, repeat)}
+    return {'events': events_count, 'rows_per_load': len(rows), 'results': results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--teams', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    report = run(args.events, args.venues, args.teams, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['events']} events, {report['rows_per_load']} rows in one month's load")
+    print(f"{'encoding':<18}{'bytes':>10}{'encode ms':>11}")
+    for name, row in report['results'].items():
+        print(f"{name:<18}{row['bytes']:>10}{row['encode_ms']:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""API benchmark suite.
+
+Runs the calendar scenarios against the Flask app (backend.server) and the
+FastAPI app (backend.main) in-process, reports throughput, p50/p95/p99
+latency and peak RSS, saves the results as JSON and compares them with a
+saved baseline:
+
+    python -m benchmarks.suite --events 100000 --save benchmarks/baselines/local.json
+    python -m benchmarks.suite --events 100000 --compare benchmarks/baselines/local.json
+
+With --compare the exit status is 1 when a scenario got slower than the
+baseline by more than --tolerance (p95 latency up or throughput down).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import datagen
+
+DEFAULT_TOLERANCE = 0.25
+MONTHS = [f'{year}-{month:02d}' for year in range(datagen.FIRST_SEASON, datagen.FIRST_SEASON + 5)
+          for month in range(1, 13)]
+
+
+def _next_month(month: str) -> str:
+    year, mon = int(month[:4]), int(month[5:])
+    return f'{year + mon // 12}-{mon % 12 + 1:02d}-01'
+
+
+def peak_rss_mb() -> float:
+    #ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class Target:
+    """One app under test: how to issue GET/POST requests and which URL each scenario hits."""
+
+    def __init__(self, name: str, get: Callable, post: Callable, urls: Dict[str, Optional[Callable]]):
+        self.name = name
+        self.get = get
+        self.post = post
+        self.urls = urls
+
+
+def flask_target(db_path: str) -> Target:
+    from backend import server
+    server.DB_PATH = db_path
+    client = server.app.test_client()
+
+    def get(url):
+        r = client.get(url)
+        r.get_data()
+        return r.status_code
+
+    def post(url, payload):
+        return client.post(url, json=payload).status_code
+
+    return Target('flask', get, post, {
+        'calendar_listing': lambda rng, ctx: '/api/events?limit=500',
+        'windowed_listing': lambda rng, ctx: (lambda m: f'/api/events?start={m}-01&end={_next_month(m)}')(rng.choice(MONTHS)),
+        'search': lambda rng, ctx: f'/api/events/search?q=Venue {rng.randint(1, ctx["venues"])}',
+        'event_detail': None,
+        'post_ingest': lambda rng, ctx: '/api/events',
+    })
+
+
+def fastapi_target(db_path: str) -> Target:
+    from fastapi.testclient import TestClient
+    from backend import db
+    from backend.main import app
+    db.DB_PATH = db_path
+    client = TestClient(app)
+
+    def get(url):
+        r = client.get(url)
+        return r.status_code
+
+    def post(url, payload):
+        return client.post(url, json=payload).status_code
+
+    return Target('fastapi', get, post, {
+        'calendar_listing': lambda rng, ctx: '/events/with-participants?limit=500',
+        'windowed_listing': lambda rng, ctx: (lambda m: f'/events/with-participants?start={m}-01&end={_next_month(m)}')(rng.choice(MONTHS)),
+        'search': lambda rng, ctx: f'/events/?participant_name=Team {rng.randint(1, ctx["teams"])}',
+        'event_detail': lambda rng, ctx: f'/events/{rng.randint(1, ctx["events"])}',
+        'post_ingest': lambda rng, ctx: '/events/',
+    })
+
+
+def _payload(rng: random.Random, ctx: Dict) -> Dict:
+    return {
+        'sport_id': rng.randint(1, ctx['sports']),
+        'venue_id': rng.randint(1, ctx['venues']),
+        'event_date': f'{rng.choice(MONTHS)}-{rng.randint(1, 28):02d}',
+        'event_time': '18:00',
+        'description': 'benchmark',
+    }
+
+
+def run_scenario(target: Target, scenario: str, requests: int, warmup: int, ctx: Dict) -> Optional[Dict]:
+    make_url = target.urls.get(scenario)
+    if make_url is None:
+        return None
+    rng = random.Random(f'{target.name}-{scenario}')
+    latencies = []
+    for i in range(warmup + requests):
+        url = make_url(rng, ctx)
+        began = time.perf_counter()
+        if scenario == 'post_ingest':
+            status = target.post(url, _payload(rng, ctx))
+        else:
+            status = target.get(url)
+        elapsed = time.perf_counter() - began
+        if status >= 400:
+            raise RuntimeError(f'{target.name} {scenario}: {url} returned {status}')
+        if i >= warmup:
+            latencies.append(elapsed)
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / sum(latencies), 1),
+        'p50_ms': round(quantiles[49] * 1000, 3),
+        'p95_ms': round(quantiles[94] * 1000, 3),
+        'p99_ms': round(quantiles[98] * 1000, 3),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+SCENARIOS = ('calendar_listing', 'windowed_listing', 'search', 'event_detail', 'post_ingest')
+
+
+def run_suite(db_path: str, ctx: Dict, requests: int = 200, warmup: int = 10, scenarios=SCENARIOS,
+              targets=('flask', 'fastapi'), use_cache: bool = False) -> Dict:
+    from backend.cache import response_cache
+    #Measure the database path by default, a warm response cache would hide regressions
+    max_entries = response_cache.max_entries
+    if not use_cache:
+        response_cache.max_entries = 0
+    response_cache.clear()
+
+    results = {}
+    factories = {'flask': flask_target, 'fastapi': fastapi_target}
+    try:
+        for name in targets:
+            target = factories[name](db_path)
+            for scenario in scenarios:
+                result = run_scenario(target, scenario, requests, warmup, ctx)
+                if result is not None:
+                    results[f'{name}.{scenario}'] = result
+    finally:
+        response_cache.max_entries = max_entries
+    return {
+        'meta': {
+            'dataset': ctx,
+            'requests': requests,
+            'cache': use_cache,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+#Scenarios slower than the baseline by more than the tolerance, as human readable lines
+def find_regressions(current: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    regressions = []
+    for key, base in baseline['results'].items():
+        now = current['results'].get(key)
+        if now is None:
+            continue
+        if now['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {base['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {base['throughput_rps']} -> {now['throughput_rps']} req/s")
+    return regressions
+
+
+def print_table(report: Dict) -> None:
+    print(f"{'scenario':<28}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rss MB':>10}")
+    for key, row in report['results'].items():
+        print(f"{key:<28}{row['throughput_rps']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['peak_rss_mb']:>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='reuse a database made by benchmarks.datagen instead of generating one')
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--venues', type=int, default=200)
+    parser.add_argument('--teams', type=int, default=200)
+    parser.add_argument('--sports', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='run only these scenarios')
+    parser.add_argument('--target', action='append', choices=('flask', 'fastapi'), help='run only these apps')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    parser.add_argument('--save', help='write the results as JSON to this path')
+    parser.add_argument('--compare', help='baseline JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    ctx = {'events': args.events, 'venues': args.venues, 'teams': args.teams, 'sports': args.sports}
+    db_path = args.db
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='sports-bench-'), 'bench.db')
+        datagen.generate(db_path, args.events, args.venues, args.teams, args.sports)
+
+    report = run_suite(db_path, ctx, args.requests, args.warmup, args.scenario or SCENARIOS,
+                       args.target or ('flask', 'fastapi'), args.cache)
+    print_table(report)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,10 +17,20 @@ CREATE TABLE event (
     description TEXT,
     event_date DATE NOT NULL,
     event_time TIME NOT NULL,
+    duration_minutes INTEGER NOT NULL DEFAULT 120,
     FOREIGN KEY (sport_id_foreignkey) REFERENCES sport(sport_id),
     FOREIGN KEY (venue_id_foreignkey) REFERENCES venue(venue_id)
 );
 
+--Keyset index for windowed calendar listing ordered by date, time and id
+CREATE INDEX IF NOT EXISTS idx_event_date_time_id ON event (event_date, event_time, event_id);
+
+--Venue bookings by start, for double-booking checks
+CREATE INDEX IF NOT EXISTS idx_event_venue_date_time ON event (venue_id_foreignkey, event_date, event_time);
+
+--Sport feeds and facet counts, in calendar order
+CREATE INDEX IF NOT EXISTS idx_event_sport_date_time ON event (sport_id_foreignkey, event_date, event_time);
+
 CREATE TABLE team (
     team_id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT NOT NULL UNIQUE
@@ -33,4 +43,16 @@ CREATE TABLE event_participant (
     PRIMARY KEY (event_id_foreignkey, participant_name),
     FOREIGN KEY (event_id_foreignkey) REFERENCES event(event_id),
     FOREIGN KEY (team_id_foreignkey) REFERENCES team(team_id)
-);
\ No newline at end of file
+);
+
+--Events of a team, for team feeds and schedules
+CREATE INDEX IF NOT EXISTS idx_event_participant_team ON event_participant (team_id_foreignkey, event_id_foreignkey);
+
+--Recurring events: the event row is the first occurrence, the rest are expanded on read
+CREATE TABLE event_recurrence (
+    event_id INTEGER PRIMARY KEY,
+    rrule TEXT NOT NULL,
+    exdates TEXT NOT NULL DEFAULT '',
+    until_date DATE,
+    FOREIGN KEY (event_id) REFERENCES event(event_id)
+);
@@ -1,4 +1,7 @@
 document.addEventListener('DOMContentLoaded', function () {
+    //Number of events requested per page from the backend
+    const PAGE_SIZE = 500;
+
     const calendarEl = document.getElementById('calendar');
     const eventsContainer = document.getElementById('events');
     const form = document.getElementById('eventForm');
@@ -12,11 +15,12 @@ document.addEventListener('DOMContentLoaded', function () {
             right: 'dayGridMonth,timeGridWeek,timeGridDay'
         },
         navLinks: true,
-        events: []
+        //Only the visible window is requested, FullCalendar calls this on every navigation
+        events: function (info, successCallback, failureCallback) {
+            loadWindow(info.startStr, info.endStr).then(successCallback).catch(failureCallback);
+        }
     });
 
-    calendar.render();
-
     //Events storage
     const events = [];
 
@@ -82,24 +86,125 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
-    //Take existing events from backend and add them to calendar and list
-    async function fetchEvents() {
-        try {
-            const res = await fetch('/api/events');
+    //Events of the loaded window by id, with the sync token they are current as of
+    const loadedWindow = { start: null, end: null, token: null, byId: new Map() };
+
+    function toCalendarEvent(re) {
+        return { id: re.id, title: re.title, start: re.start, description: re.description };
+    }
+
+    function inWindow(re, start, end) {
+        //Only events with a valid start are shown
+        if (!re.start) return false;
+        const day = re.start.slice(0, 10);
+        return day >= start.slice(0, 10) && day < end.slice(0, 10);
+    }
+
+    //Listing pages come as columns (one array per field), rebuilt into one object per event here
+    function fromColumns(page) {
+        const names = Object.keys(page);
+        const count = names.length ? page[names[0]].length : 0;
+        const rows = [];
+        for (let i = 0; i < count; i++) {
+            const row = {};
+            names.forEach(name => { row[name] = page[name][i]; });
+            rows.push(row);
+        }
+        return rows;
+    }
+
+    //Take events inside the visible window from backend, following pagination cursors
+    async function fetchEvents(start, end) {
+        const byId = new Map();
+        let cursor = null;
+        let token = null;
+        do {
+            const params = new URLSearchParams({ start, end, limit: PAGE_SIZE, format: 'columns' });
+            if (cursor) params.set('cursor', cursor);
+            const res = await fetch('/api/events?' + params.toString());
             if (!res.ok) throw new Error('Failed to fetch events');
-            const remoteEvents = await res.json();
-            remoteEvents.forEach(re => {
-                //Only add events that have a valid start
-                if (re.start) {
-                    const ev = { id: re.id, title: re.title, start: re.start, description: re.description };
-                    calendar.addEvent(ev);
-                    events.push(ev);
-                }
+            //The first page's token is the oldest, syncing from it cannot miss a change
+            if (token === null) token = res.headers.get('X-Sync-Token');
+            const page = fromColumns(await res.json());
+            page.forEach(re => {
+                if (inWindow(re, start, end)) byId.set(re.id, toCalendarEvent(re));
             });
-            renderEventsList();
+            cursor = res.headers.get('X-Next-Cursor');
+        } while (cursor);
+        Object.assign(loadedWindow, { start, end, token, byId });
+    }
+
+    //Applies the changes since the last load or sync, returns false when a full reload is needed
+    async function syncEvents() {
+        const res = await fetch('/api/events/sync?token=' + encodeURIComponent(loadedWindow.token));
+        if (!res.ok) return false;
+        const delta = await res.json();
+        if (delta.reset) return false;
+        delta.deleted.forEach(id => {
+            loadedWindow.byId.delete(id);
+            //Occurrences of a recurring event have ids like "12@2025-12-01"
+            for (const key of Array.from(loadedWindow.byId.keys())) {
+                if (String(key).startsWith(id + '@')) loadedWindow.byId.delete(key);
+            }
+        });
+        delta.created.concat(delta.updated).forEach(re => {
+            if (inWindow(re, loadedWindow.start, loadedWindow.end)) {
+                loadedWindow.byId.set(re.id, toCalendarEvent(re));
+            } else {
+                loadedWindow.byId.delete(re.id);
+            }
+        });
+        loadedWindow.token = delta.token;
+        return true;
+    }
+
+    //Refreshing the same window only downloads what changed, navigating loads the new window
+    async function loadWindow(start, end) {
+        try {
+            const sameWindow = loadedWindow.token !== null && loadedWindow.start === start && loadedWindow.end === end;
+            if (!sameWindow || !(await syncEvents())) {
+                await fetchEvents(start, end);
+            }
         } catch (err) {
             console.warn('Could not load events from backend:', err);
+            if (loadedWindow.start !== start || loadedWindow.end !== end) {
+                Object.assign(loadedWindow, { start, end, token: null, byId: new Map() });
+            }
         }
+        const loaded = Array.from(loadedWindow.byId.values());
+        events.length = 0;
+        events.push(...loaded);
+        renderEventsList();
+        return loaded;
+    }
+
+    //Shows a pushed event right away, the next sync of the window confirms it
+    function applyCreated(re) {
+        if (loadedWindow.token === null || !inWindow(re, loadedWindow.start, loadedWindow.end)) return;
+        const ev = toCalendarEvent(re);
+        loadedWindow.byId.set(re.id, ev);
+        const existing = calendar.getEventById(String(re.id));
+        if (existing) existing.remove();
+        calendar.addEvent(ev, calendar.getEventSources()[0]);
+        events.length = 0;
+        events.push(...loadedWindow.byId.values());
+        renderEventsList();
+    }
+
+    //Live updates pushed by the backend, see /api/events/stream
+    let liveUpdates = null;
+    if (window.EventSource) {
+        liveUpdates = new EventSource('/api/events/stream');
+        let disconnected = false;
+        liveUpdates.addEventListener('created', e => applyCreated(JSON.parse(e.data)));
+        //Bulk imports only say that something changed, the window is synced instead
+        liveUpdates.addEventListener('changed', () => calendar.refetchEvents());
+        liveUpdates.addEventListener('error', () => { disconnected = true; });
+        liveUpdates.addEventListener('open', () => {
+            //Catch up on what was published while the stream was down
+            if (disconnected) calendar.refetchEvents();
+            disconnected = false;
+        });
     }
 
         //Search handler
@@ -164,8 +269,6 @@ document.addEventListener('DOMContentLoaded', function () {
             const venueSelectEl = document.getElementById('venue');
             const sport_id = sportSelectEl ? sportSelectEl.value : '';
             const venue_id = venueSelectEl ? venueSelectEl.value : '';
-            const sport = sportSelectEl ? sportSelectEl.selectedOptions[0].text : '';
-            const venue = venueSelectEl ? venueSelectEl.selectedOptions[0].text : '';
 
             if (!date || !time) {
                 alert('Please provide date and time');
@@ -176,8 +279,6 @@ document.addEventListener('DOMContentLoaded', function () {
                 return;
             }
 
-            const iso = date + 'T' + time;
-            const title = `${sport} @ ${venue}`;
             //Get optional description for POST
             const description = (document.getElementById('description') || {}).value || null;
 
@@ -197,10 +298,8 @@ document.addEventListener('DOMContentLoaded', function () {
                 let payload = {};
                 try { payload = await res.json(); } catch (e) {}
                 if (!res.ok) throw new Error(payload.error || 'Failed to save event');
-                //Add to calendar and list
-                calendar.addEvent({ title, start: iso });
-                events.push({ title, start: iso, description });
-                renderEventsList();
+                //The live stream delivers the new event, without it sync the visible window
+                if (!liveUpdates || liveUpdates.readyState !== EventSource.OPEN) calendar.refetchEvents();
                 form.reset();
             })
             .catch(err => {
@@ -212,8 +311,6 @@ document.addEventListener('DOMContentLoaded', function () {
     //Load options
     fetchOptions();
 
-    //Load existing events
-    fetchEvents();
-
-    renderEventsList();
+    //Load existing events for the initial window
+    calendar.render();
 });
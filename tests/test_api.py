@@ -143,3 +143,71 @@ def test_post_without_description_succeeds(tmp_path):
     assert r.status_code == 201
     body = r.get_json()
     assert 'event_id' in body
+
+
+def test_events_window_and_cursor_pagination(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    for day in ('2025-11-21', '2025-11-22', '2025-12-03'):
+        payload = {'sport_id_foreignkey': 1, 'venue_id_foreignkey': 1, 'event_date': day, 'event_time': '10:00'}
+        client.post('/api/events', data=json.dumps(payload), content_type='application/json')
+
+    #Only events inside the FullCalendar window are returned
+    r = client.get('/api/events?start=2025-11-01T00:00:00%2B01:00&end=2025-12-01T00:00:00%2B01:00')
+    assert r.status_code == 200
+    assert [ev['start'][:10] for ev in r.get_json()] == ['2025-11-20', '2025-11-21', '2025-11-22']
+
+    #Walking the cursor returns every event exactly once, in order
+    seen = []
+    url = '/api/events?limit=2'
+    while url:
+        r = client.get(url)
+        assert r.status_code == 200
+        page = r.get_json()
+        assert len(page) <= 2
+        seen.extend(ev['id'] for ev in page)
+        cursor = r.headers.get('X-Next-Cursor')
+        url = f'/api/events?limit=2&cursor={cursor}' if cursor else None
+    assert len(seen) == 4 and len(set(seen)) == 4
+
+    #Malformed window parameters are rejected
+    r = client.get('/api/events?start=not-a-date')
+    assert r.status_code == 400
+
+
+def test_events_streaming_modes(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    server.STREAM_BATCH_SIZE = 2
+    client = server.app.test_client()
+
+    for day in range(1, 6):
+        payload = {'sport_id_foreignkey': 1, 'venue_id_foreignkey': 1, 'event_date': f'2025-12-0{day}', 'event_time': '10:00'}
+        client.post('/api/events', data=json.dumps(payload), content_type='application/json')
+
+    expected = client.get('/api/events').get_json()
+    assert expected[0] == {'id': 1, 'title': 'TestSport @ TestVenue', 'start': '2025-11-20T12:00',
+                           'description': 'Seed event', 'sport_name': 'TestSport', 'venue_name': 'TestVenue'}
+
+    #Streamed JSON array is identical to the buffered response
+    r = client.get('/api/events?stream=json')
+    assert r.status_code == 200 and r.is_streamed
+    assert json.loads(r.data) == expected
+
+    #NDJSON, one event per line
+    r = client.get('/api/events', headers={'Accept': 'application/x-ndjson'})
+    assert r.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in r.data.decode().splitlines()] == expected
+
+    r = client.get('/api/events/search?q=TestSport&stream=ndjson')
+    assert len(r.data.decode().splitlines()) == 6
+
+    #An empty result is still valid JSON
+    r = client.get('/api/events?stream=json&start=2030-01-01')
+    assert json.loads(r.data) == []
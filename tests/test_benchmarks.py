@@ -0,0 +1,58 @@
+import sqlite3
+
+from benchmarks import bench_snapshot, bench_sse, bench_wire, datagen, suite
+
+
+def test_datagen_builds_requested_scale(tmp_path):
+    db_file = str(tmp_path / 'bench.db')
+    datagen.generate(db_file, events=300, venues=20, teams=30, sports=5)
+    conn = sqlite3.connect(db_file)
+    assert conn.execute('SELECT COUNT(*) FROM event').fetchone()[0] == 300
+    assert conn.execute('SELECT COUNT(*) FROM venue').fetchone()[0] == 20
+    assert conn.execute('SELECT COUNT(*) FROM event_participant').fetchone()[0] == 600
+    assert conn.execute("SELECT COUNT(*) FROM event_fts WHERE event_fts MATCH 'Team'").fetchone()[0] == 300
+    conn.close()
+
+
+def test_suite_smoke_run_and_regression_check(tmp_path):
+    db_file = str(tmp_path / 'bench.db')
+    ctx = {'events': 200, 'venues': 10, 'teams': 10, 'sports': 3}
+    datagen.generate(db_file, ctx['events'], ctx['venues'], ctx['teams'], ctx['sports'])
+    report = suite.run_suite(db_file, ctx, requests=3, warmup=0)
+
+    assert set(report['results']) == {
+        'flask.calendar_listing', 'flask.windowed_listing', 'flask.search', 'flask.post_ingest',
+        'fastapi.calendar_listing', 'fastapi.windowed_listing', 'fastapi.search', 'fastapi.event_detail',
+        'fastapi.post_ingest',
+    }
+    for row in report['results'].values():
+        assert row['requests'] == 3
+        assert row['p50_ms'] <= row['p95_ms'] <= row['p99_ms']
+        assert row['peak_rss_mb'] > 0
+
+    assert suite.find_regressions(report, report) == []
+    slower = {'results': {k: dict(v, p95_ms=v['p95_ms'] * 2) for k, v in report['results'].items()}}
+    assert len(suite.find_regressions(slower, report, tolerance=0.25)) == len(report['results'])
+
+
+def test_sse_benchmark_smoke_run():
+    results = bench_sse.run(subscribers=20, idle=0.05, messages=2)
+    assert set(results) == {'async', 'threads'}
+    for row in results.values():
+        assert row['subscribers'] == 20
+        assert row['traced_bytes_per_subscriber'] > 0
+
+
+def test_snapshot_benchmark_smoke_run():
+    report = bench_snapshot.run(events_count=300, venues=10, teams=10, repeat=2)
+    assert report['bytes_per_event'] > 0
+    assert set(report['queries']) == {'calendar_month', 'calendar_first_page', 'events_by_venue_name',
+                                      'events_by_team_in_month'}
+
+
+def test_wire_benchmark_smoke_run():
+    report = bench_wire.run(events_count=3000, venues=10, teams=10, repeat=2)
+    assert report['rows_per_load'] > 0
+    results = report['results']
+    assert results['columns+identity']['bytes'] < results['json+identity']['bytes']
+    assert results['columns+gzip']['bytes'] < results['columns+identity']['bytes']
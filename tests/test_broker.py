@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+
+from backend import broker, conflicts, db, writer
+from backend.routers import events
+from test_api import create_test_db, load_server_module
+
+PAYLOAD = {'sport_id_foreignkey': 1, 'venue_id_foreignkey': 1, 'event_date': '2025-12-01', 'event_time': '19:30'}
+
+
+def test_slow_subscriber_is_evicted_without_blocking_publisher():
+    b = broker.Broker(queue_size=2)
+    fast = b.subscribe('topic')
+    slow = b.subscribe('topic')
+    for i in range(3):
+        b.publish('topic', broker.encode('created', {'id': i}))
+        assert fast.get(0).payload.endswith('{"id":%d}\n\n' % i)
+
+    assert slow.evicted
+    assert b.stats() == {'subscribers': 1, 'published': 3, 'delivered': 5, 'evictions': 1}
+    try:
+        slow.get(0)
+        assert False, 'evicted subscription kept streaming'
+    except broker.Evicted:
+        pass
+    assert fast.get(0.01) is None
+
+
+def test_async_subscriber_gets_messages_from_other_threads():
+    b = broker.Broker()
+
+    async def consume():
+        subscription = b.subscribe('topic', asyncio.get_running_loop())
+        thread = threading.Thread(target=b.publish, args=('topic', broker.encode('changed', {'inserted': 3})))
+        thread.start()
+        message = await subscription.get_async(5)
+        thread.join()
+        assert await subscription.get_async(0.01) is None
+        subscription.close()
+        return message
+
+    assert asyncio.run(consume()).event == 'changed'
+    assert b.stats()['subscribers'] == 0
+
+
+def test_flask_stream_pushes_created_events(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    r = client.get('/api/events/stream', buffered=False)
+    assert r.mimetype == 'text/event-stream'
+    body = (chunk.decode('utf-8') for chunk in r.response)
+    assert next(body) == broker.HELLO
+
+    event_id = client.post('/api/events', json=PAYLOAD).get_json()['event_id']
+    message = next(body)
+    assert message.startswith('event: created\n')
+    assert f'"id":{event_id}' in message and '"start":"2025-12-01T19:30"' in message
+
+    client.post('/api/events/bulk', data='{"sport_id": 1, "venue_id": 1, "event_date": "2026-01-01", "event_time": "10:00"}')
+    assert next(body) == 'event: changed\ndata: {"inserted":1}\n\n'
+
+    r.close()
+    assert not broker.broker.has_subscribers(server.DB_PATH)
+
+
+def test_fastapi_stream_pushes_created_events(tmp_path, monkeypatch):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    monkeypatch.setattr(db, 'DB_PATH', str(db_file))
+
+    async def run():
+        response = await events.stream_events()
+        body = response.body_iterator
+        assert await body.__anext__() == broker.HELLO
+        #The writer publishes the event once its batch commits
+        future = writer.submit(db.DB_PATH, db.init_db, writer.prepare(dict(PAYLOAD), conflicts.DEFAULT_POLICY))
+        event_id, _ = await asyncio.wrap_future(future)
+        message = await body.__anext__()
+        await body.aclose()
+        return event_id, message
+
+    event_id, message = asyncio.run(run())
+    assert message.startswith('event: created\n') and f'"id":{event_id}' in message
+    assert not broker.broker.has_subscribers(str(db_file))
@@ -0,0 +1,77 @@
+import json
+import os
+
+from backend.cache import ResponseCache, etag_matches
+from test_api import create_test_db, load_server_module
+
+
+def test_cache_lru_ttl_and_generation(tmp_path):
+    cache = ResponseCache(max_entries=2, ttl=60)
+    builds = []
+
+    def build(name):
+        def inner():
+            builds.append(name)
+            return name.encode(), {}
+        return inner
+
+    db = str(tmp_path / 'a.db')
+    assert cache.get_or_build(db, 'a', build('a')).body == b'a'
+    cache.get_or_build(db, 'a', build('a'))
+    assert builds == ['a']
+
+    #Least recently used entry is evicted first
+    cache.get_or_build(db, 'b', build('b'))
+    cache.get_or_build(db, 'a', build('a'))
+    cache.get_or_build(db, 'c', build('c'))
+    cache.get_or_build(db, 'a', build('a'))
+    cache.get_or_build(db, 'b', build('b'))
+    assert builds == ['a', 'b', 'c', 'b']
+    assert cache.stats()['evictions'] == 2
+
+    #A write to the database invalidates every entry for it, other databases are untouched
+    other = str(tmp_path / 'b.db')
+    cache.get_or_build(other, 'a', build('other'))
+    cache.invalidate(db)
+    cache.get_or_build(db, 'a', build('a'))
+    cache.get_or_build(other, 'a', build('other'))
+    assert builds == ['a', 'b', 'c', 'b', 'other', 'a']
+
+    #Expired entries are rebuilt
+    cache.ttl = -1
+    cache.get_or_build(db, 'x', build('x'))
+    cache.get_or_build(db, 'x', build('x'))
+    assert builds[-2:] == ['x', 'x']
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', 'abc')
+    assert etag_matches('W/"abc", "def"', 'def')
+    assert etag_matches('*', 'abc')
+    assert not etag_matches('"abc"', 'abd')
+    assert not etag_matches(None, 'abc')
+
+
+def test_flask_etag_and_write_invalidation(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    r = client.get('/api/sports')
+    etag = r.headers['ETag']
+    assert r.status_code == 200 and etag
+    r = client.get('/api/sports', headers={'If-None-Match': etag})
+    assert r.status_code == 304 and r.data == b''
+
+    r = client.get('/api/events')
+    etag = r.headers['ETag']
+    assert client.get('/api/events', headers={'If-None-Match': etag}).status_code == 304
+
+    #Creating an event bumps the generation, the listing changes and the old ETag no longer matches
+    payload = {'sport_id_foreignkey': 1, 'venue_id_foreignkey': 1, 'event_date': '2025-12-01', 'event_time': '19:30'}
+    client.post('/api/events', data=json.dumps(payload), content_type='application/json')
+    r = client.get('/api/events', headers={'If-None-Match': etag})
+    assert r.status_code == 200
+    assert len(r.get_json()) == 2
@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from backend import conflicts, db, importer
+from backend.main import app as sync_app
+from test_api import create_test_db, load_server_module
+
+#The seed event is at venue 1 on 2025-11-20 from 12:00 to 14:00
+SEED = {'sport_id': 1, 'venue_id': 1, 'event_date': '2025-11-20'}
+
+
+def test_single_insert_flags_or_rejects_overlaps(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    #Back to back is not a conflict
+    r = client.post('/api/events?on_conflict=reject', json=dict(SEED, event_time='14:00', duration_minutes=30))
+    assert r.status_code == 201 and r.get_json()['conflicts'] == []
+
+    r = client.post('/api/events?on_conflict=reject', json=dict(SEED, event_time='13:30'))
+    assert r.status_code == 409
+    assert r.get_json()['conflicts'] == [1, 2]
+
+    #Flagging inserts the event and lists the clashes
+    r = client.post('/api/events', json=dict(SEED, event_time='11:00'))
+    assert r.status_code == 201 and r.get_json()['conflicts'] == [1]
+    #Other venues are free
+    r = client.post('/api/events?on_conflict=reject', json=dict(SEED, venue_id=2, event_time='12:00'))
+    assert r.status_code == 201
+
+    assert client.post('/api/events?on_conflict=maybe', json=dict(SEED, event_time='20:00')).status_code == 400
+    assert client.post('/api/events', json=dict(SEED, event_time='20:00', duration_minutes=0)).status_code == 400
+
+    report = client.get('/api/events/conflicts').get_json()
+    assert report == {'total': 1, 'conflicts': [
+        {'venue_id': 1, 'event_id': 3, 'other_event_id': 1, 'overlap_minutes': 60}]}
+    assert client.get('/api/events/conflicts?venue_id=2').get_json()['total'] == 0
+
+
+def test_series_occurrences_are_booked(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+    weekly = {'sport_id': 1, 'venue_id': 2, 'event_date': '2025-12-01', 'event_time': '18:00', 'rrule': 'FREQ=WEEKLY;COUNT=4'}
+    r = client.post('/api/events?on_conflict=reject', json=weekly)
+    assert r.status_code == 201
+    series_id = r.get_json()['event_id']
+
+    #The second week, nothing is stored on that date
+    second_week = {'sport_id': 1, 'venue_id': 2, 'event_date': '2025-12-08', 'event_time': '19:00'}
+    r = client.post('/api/events?on_conflict=reject', json=second_week)
+    assert r.status_code == 409 and r.get_json()['conflicts'] == [series_id]
+    #After the last occurrence the slot is free
+    assert client.post('/api/events?on_conflict=reject', json=dict(second_week, event_date='2025-12-29')).status_code == 201
+
+    #A new series is checked at every occurrence, the seed event is on its third
+    r = client.post('/api/events?on_conflict=reject', json={
+        'sport_id': 1, 'venue_id': 1, 'event_date': '2025-11-06', 'event_time': '13:00', 'rrule': 'FREQ=WEEKLY'})
+    assert r.status_code == 409 and r.get_json()['conflicts'] == [1]
+    r = client.post('/api/events', json={'sport_id': 1, 'venue_id': 2, 'event_date': '2025-11-24', 'event_time': '18:30',
+                                         'rrule': 'FREQ=DAILY;COUNT=10'})
+    assert r.status_code == 201 and r.get_json()['conflicts'] == [series_id]
+
+    daily_id = r.get_json()['event_id']
+    #Only December 1st has both series, from 18:30 to 20:00
+    report = client.get('/api/events/conflicts?venue_id=2&start=2025-11-01&end=2026-01-01').get_json()
+    assert report['conflicts'] == [
+        {'venue_id': 2, 'event_id': series_id, 'other_event_id': daily_id, 'overlap_minutes': 90}]
+
+
+def test_overlap_across_midnight(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    conn = sqlite3.connect(str(db_file))
+    conn.execute("INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time, duration_minutes) "
+                 "VALUES (1, 1, '2025-11-30', '23:00', 180)")
+    conn.commit()
+    start = conflicts.start_minute('2025-12-01', '01:00')
+    assert conflicts.find_overlaps(conn, 1, start, start + 60) == [2]
+    assert conflicts.find_overlaps(conn, 1, start + 60, start + 120) == []
+    conn.close()
+
+
+def test_import_checks_file_and_database(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    conn = sqlite3.connect(str(db_file))
+    lines = [
+        dict(SEED, event_time='13:00'),
+        dict(SEED, event_date='2026-01-01', event_time='10:00'),
+        dict(SEED, event_date='2026-01-01', event_time='11:00'),
+        dict(SEED, event_date='2026-01-01', event_time='12:00'),
+    ]
+    text = '\n'.join(json.dumps(line) for line in lines)
+
+    result = importer.import_events(conn, importer.read_records(io.StringIO(text)), on_conflict='reject')
+    assert result.inserted == 2
+    assert result.errors == [{'row': 1, 'error': 'Venue 1 is already booked by event 1'},
+                             {'row': 3, 'error': 'Venue 1 is already booked by row 2'}]
+
+    result = importer.import_events(conn, importer.read_records(io.StringIO(text)), chunk_size=2)
+    assert result.inserted == 4
+    #Rows of an earlier chunk are already stored, so they show up as event ids
+    assert result.conflicts == [{'row': 1, 'event_ids': [1], 'rows': []},
+                                {'row': 2, 'event_ids': [2], 'rows': []},
+                                {'row': 3, 'event_ids': [2, 3, 5], 'rows': []},
+                                {'row': 4, 'event_ids': [3], 'rows': [3]}]
+    assert conflicts.report(conn, start_date='2026-01-01')['total'] == 6
+    conn.close()
+
+
+def test_venue_schedule():
+    schedule = conflicts.VenueSchedule()
+    schedule.add(100, 400, 'long')
+    schedule.add(150, 160, 'short')
+    assert schedule.overlaps(390, 420) == ['long']
+    assert schedule.overlaps(155, 156) == ['long', 'short']
+    assert schedule.overlaps(400, 500) == []
+
+
+def test_fastapi_conflicts(tmp_path, monkeypatch):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    monkeypatch.setattr(db, 'DB_PATH', str(db_file))
+    with TestClient(sync_app) as client:
+        r = client.post('/events/', params={'on_conflict': 'reject'}, json=dict(SEED, event_time='12:30'))
+        assert r.status_code == 409
+        assert r.json()['detail']['conflicts'] == [1]
+        r = client.post('/events/', json=dict(SEED, event_time='12:30'))
+        assert r.json()['conflicts'] == [1]
+        assert client.get('/events/conflicts').json()['total'] == 1
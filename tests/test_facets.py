@@ -0,0 +1,150 @@
+import os
+import random
+import sqlite3
+from collections import Counter
+
+from fastapi.testclient import TestClient
+
+from backend import db, facets, sync
+from backend.async_main import app as async_app
+from test_api import create_test_db, load_server_module
+
+
+def _seed(path, events=300, seed=7):
+    create_test_db(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    sync.ensure_change_log(conn)
+    conn.executemany('INSERT INTO sport (name) VALUES (?)', [('Football',), ('Hockey',)])
+    conn.executemany('INSERT INTO venue (name, city, address) VALUES (?, ?, ?)',
+                     [(f'Arena {i}', ('Vienna', 'Graz')[i % 2], f'Street {i}') for i in range(6)])
+    conn.executemany('INSERT INTO team (team_id, name) VALUES (?, ?)', [(i, f'Team {i}') for i in range(1, 9)])
+    for _ in range(events):
+        cur = conn.execute('INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) '
+                           'VALUES (?, ?, ?, ?)',
+                           (rng.randint(1, 3), rng.randint(1, 7), f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                            f'{rng.randint(8, 21):02d}:00'))
+        for team in rng.sample(range(1, 9), 2):
+            conn.execute('INSERT INTO event_participant VALUES (?, ?, ?)', (cur.lastrowid, f'Team {team}', team))
+    conn.commit()
+    return conn, rng
+
+
+#Matching ids and counts computed row by row, each facet with every filter but its own
+def _expected(conn, selection):
+    rows = conn.execute('''
+        SELECT e.event_id, e.event_date, e.event_time, e.sport_id_foreignkey, e.venue_id_foreignkey, v.city,
+               (SELECT group_concat(DISTINCT team_id_foreignkey) FROM event_participant
+                WHERE event_id_foreignkey = e.event_id)
+        FROM event e LEFT JOIN venue v ON v.venue_id = e.venue_id_foreignkey
+        ORDER BY e.event_date, e.event_time, e.event_id
+    ''').fetchall()
+    events = [{'id': r[0], 'date': r[1], 'sport': r[3], 'venue': r[4], 'city': r[5],
+               'team': {int(t) for t in (r[6] or '').split(',') if t}} for r in rows]
+    chosen = {'sport': selection.sport_ids, 'venue': selection.venue_ids, 'city': selection.cities,
+              'team': selection.team_ids}
+
+    def keep(event, skip=None):
+        if selection.start and event['date'] < selection.start or selection.end and event['date'] >= selection.end:
+            return False
+        for facet, values in chosen.items():
+            if facet == skip or not values:
+                continue
+            if facet == 'team' and not event['team'] & values or facet != 'team' and event[facet] not in values:
+                return False
+        return True
+
+    counts = {}
+    for facet in facets.FACETS:
+        counter = Counter()
+        for event in events:
+            if keep(event, facet):
+                counter.update(event['team'] if facet == 'team' else [event[facet]])
+        counts[facet] = counter
+    return [e['id'] for e in events if keep(e)], counts
+
+
+def _random_selection(rng):
+    pick = lambda values: frozenset(rng.sample(values, rng.randint(0, 2)))
+    start = f'2025-{rng.randint(1, 12):02d}-01' if rng.random() < 0.5 else None
+    return facets.Selection(pick([1, 2, 3]), pick(list(range(1, 8))), pick(['Vienna', 'Graz', 'Linz']),
+                            pick(list(range(1, 9))), start, '2025-10-15' if rng.random() < 0.3 else None)
+
+
+def test_counts_match_sql_through_writes(tmp_path):
+    conn, rng = _seed(str(tmp_path / 'test.db'))
+    conn.row_factory = sqlite3.Row
+    index = facets.FacetIndex()
+    for step in range(60):
+        index.refresh(conn)
+        selection = _random_selection(rng)
+        ids, counts = _expected(conn, selection)
+        total, page, got = index.select(selection, 0, 1000)
+        assert (total, page) == (len(ids), ids), selection
+        for facet in facets.FACETS:
+            expected = {index.city_ids[k] if facet == 'city' else k: v for k, v in counts[facet].items()}
+            assert dict(+Counter(got[facet])) == expected, (facet, selection)
+
+        #Every kind of write the change log records
+        event_id = rng.randint(1, 320)
+        if step % 4 == 0:
+            conn.execute("INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) "
+                         "VALUES (?, ?, '2025-06-01', '10:00')", (rng.randint(1, 3), rng.randint(1, 7)))
+        elif step % 4 == 1:
+            conn.execute('DELETE FROM event_participant WHERE event_id_foreignkey = ?', (event_id,))
+            conn.execute('DELETE FROM event WHERE event_id = ?', (event_id,))
+        elif step % 4 == 2:
+            conn.execute('UPDATE event SET event_date = ?, sport_id_foreignkey = ? WHERE event_id = ?',
+                         (f'2025-{rng.randint(1, 12):02d}-15', rng.randint(1, 3), event_id))
+            conn.execute('INSERT OR IGNORE INTO event_participant VALUES (?, ?, ?)', (event_id, 'Team 8', 8))
+        else:
+            conn.execute('UPDATE venue SET city = ? WHERE venue_id = ?', (rng.choice(['Vienna', 'Linz']), rng.randint(1, 7)))
+        conn.commit()
+    #The tail and dead slots forced at least one rebuild, so both paths were compared
+    assert index.sorted_end > 300
+    conn.close()
+
+
+def test_flask_facets(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    _seed(db_file)[0].close()
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = db_file
+    client = server.app.test_client()
+
+    body = client.get('/api/events/facets?sport_id=2&city=Graz&limit=5&facet_limit=2').get_json()
+    assert len(body['events']) == 5 and body['total'] > 5
+    assert {e['sport_name'] for e in body['events']} == {'Football'}
+    assert [e['start'] for e in body['events']] == sorted(e['start'] for e in body['events'])
+    #Other sports are still counted, only the city filter applies to them
+    sports = {v['id']: v for v in body['facets']['sport']}
+    assert sports[2]['selected'] and sports[2]['count'] == body['total'] and len(sports) >= 2
+    assert [v['id'] for v in body['facets']['city'] if v['selected']] == ['Graz']
+    assert body['facets']['team'][0]['name'].startswith('Team ')
+
+    #A new event shows up on the next request
+    total = client.get('/api/events/facets?venue_id=1').get_json()['total']
+    client.post('/api/events', json={'sport_id': 1, 'venue_id': 1, 'event_date': '2026-03-01', 'event_time': '09:00'})
+    assert client.get('/api/events/facets?venue_id=1').get_json()['total'] == total + 1
+
+    assert client.get('/api/events/facets?start=tomorrow').status_code == 400
+    unknown = client.get('/api/events/facets?city=Atlantis').get_json()
+    assert unknown['total'] == 0 and unknown['facets']['city'][-1] == {
+        'id': 'Atlantis', 'name': 'Atlantis', 'count': 0, 'selected': True}
+
+
+def test_fastapi_facets(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'test.db')
+    conn, _ = _seed(db_file)
+    monkeypatch.setattr(db, 'DB_PATH', db_file)
+    with TestClient(async_app) as client:
+        r = client.get('/events/facets', params={'team_id': [1, 2], 'start': '2025-03-01', 'end': '2025-04-01'})
+        body = r.json()
+        expected = conn.execute('''
+            SELECT COUNT(DISTINCT e.event_id) FROM event e JOIN event_participant ep ON ep.event_id_foreignkey = e.event_id
+            WHERE ep.team_id_foreignkey IN (1, 2) AND e.event_date >= '2025-03-01' AND e.event_date < '2025-04-01'
+        ''').fetchone()[0]
+        assert body['total'] == expected
+        assert all(e['participants'] for e in body['events'])
+        assert client.get('/events/facets', params={'limit': 0}).status_code == 422
+    conn.close()
@@ -0,0 +1,118 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import db
+from backend.async_main import app as async_app
+from backend.main import app as sync_app
+from test_api import create_test_db
+
+
+@pytest.fixture(params=['sync', 'async'])
+def client(request, tmp_path, monkeypatch):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    conn = sqlite3.connect(str(db_file))
+    conn.execute("INSERT INTO team (name) VALUES ('Salzburg'), ('Sturm')")
+    conn.execute("INSERT INTO event_participant VALUES (1, 'Salzburg', 1)")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(db, 'DB_PATH', str(db_file))
+    app = sync_app if request.param == 'sync' else async_app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_routes_and_shapes(client):
+    r = client.get('/events/')
+    assert r.status_code == 200
+    assert r.json() == [{'event_id': 1, 'event_date': '2025-11-20', 'event_time': '12:00',
+                         'sport': 'TestSport', 'venue': 'TestVenue'}]
+    assert len(client.get('/events/', params={'participant_name': 'salz'}).json()) == 1
+    assert client.get('/events/', params={'venue_name': 'nowhere'}).json() == []
+
+    r = client.get('/events/1')
+    assert r.json()['participants'] == ['Salzburg']
+    assert r.json()['event']['sport'] == 'TestSport'
+    assert client.get('/events/999').status_code == 404
+
+    r = client.get('/teams/')
+    assert [t['name'] for t in r.json()] == ['Salzburg', 'Sturm']
+    assert client.get('/teams/', headers={'If-None-Match': r.headers['etag']}).status_code == 304
+    assert client.get('/venues/').json()[0]['city'] == 'TestCity'
+
+
+def test_create_event(client):
+    payload = {'sport_id': 1, 'venue_id': 1, 'event_date': '2025-12-01', 'event_time': '18:00',
+               'participants': ['Salzburg', 'Sturm']}
+    r = client.post('/events/', json=payload)
+    assert r.status_code == 200
+    event_id = r.json()['event_id']
+    assert client.get(f'/events/{event_id}').json()['participants'] == ['Salzburg', 'Sturm']
+
+    assert client.post('/events/', json={'sport_id': 1}).status_code == 400
+
+    r = client.post('/events/bulk', content='{"sport_id": 1, "venue_id": 1, "event_date": "2026-01-01", "event_time": "10:00"}\n')
+    assert r.json()['inserted'] == 1
+    assert len(client.get('/events/').json()) == 3
+
+
+def test_batched_participants(client):
+    for day in ('2025-11-21', '2025-11-22'):
+        client.post('/events/', json={'sport_id': 1, 'venue_id': 1, 'event_date': day, 'event_time': '10:00',
+                                      'participants': ['Sturm']})
+
+    r = client.get('/events/', params={'ids': '3,1,999'})
+    assert r.status_code == 200
+    assert [(e['event']['event_id'], e['participants']) for e in r.json()] == [(1, ['Salzburg']), (3, ['Sturm'])]
+    assert client.get('/events/', params={'ids': '1,x'}).status_code == 400
+
+    r = client.get('/events/with-participants', params={'limit': 2})
+    page = r.json()
+    assert [(e['event_id'], e['participants']) for e in page] == [(1, ['Salzburg']), (2, ['Sturm'])]
+    last = page[-1]
+    r = client.get('/events/with-participants', params={
+        'after_date': last['event_date'], 'after_time': last['event_time'], 'after_id': last['event_id']})
+    assert [e['event_id'] for e in r.json()] == [3]
+    r = client.get('/events/with-participants', params={'start': '2025-11-22', 'end': '2025-11-23'})
+    assert [e['event_id'] for e in r.json()] == [3]
+
+
+def test_bad_windows_are_rejected(client):
+    for path in ('/events/', '/events/with-participants', '/events/conflicts'):
+        r = client.get(path, params={'start': 'garbage'})
+        assert r.status_code == 400 and r.json()['detail'] == 'start must be a date (YYYY-MM-DD)'
+        assert client.get(path, params={'end': '2025-13-01'}).status_code == 400
+    #Windows starting in the last year of the calendar are cut off there
+    client.post('/events/', json={'sport_id': 1, 'venue_id': 1, 'event_date': '9999-12-01', 'event_time': '10:00',
+                                  'rrule': 'FREQ=WEEKLY'})
+    r = client.get('/events/', params={'start': '9999-12-01'})
+    assert r.status_code == 200
+    assert [e['event_date'] for e in r.json()] == ['9999-12-01', '9999-12-08', '9999-12-15', '9999-12-22',
+                                                  '9999-12-29']
+
+
+def test_participants_page_costs_one_query(tmp_path):
+    import sqlite3
+    from backend.routers import events
+
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    conn = sqlite3.connect(str(db_file))
+    conn.row_factory = sqlite3.Row
+    conn.execute("INSERT INTO team (name) VALUES ('A')")
+    conn.executemany('INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) VALUES (1, 1, ?, ?)',
+                     [('2026-01-01', f'{i:04d}') for i in range(600)])
+    conn.execute("INSERT INTO event_participant SELECT event_id, 'A', 1 FROM event")
+    conn.commit()
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    page = events.fetch_events_with_participants(conn, None, None, None, 500)
+    details = events.fetch_events_by_ids(conn, [e['event_id'] for e in page])
+    assert len(page) == 500 and len(details) == 500
+    assert all(e['participants'] == ['A'] for e in page)
+    #The page, the series that could recur in it, and the details
+    assert len(statements) == 3
+    conn.close()
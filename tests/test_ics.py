@@ -0,0 +1,86 @@
+import os
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from backend import db, ics
+from backend.main import app as sync_app
+from test_api import create_test_db, load_server_module
+
+PAYLOAD = {'sport_id_foreignkey': 1, 'venue_id_foreignkey': 1, 'event_date': '2025-12-01', 'event_time': '19:30'}
+
+
+def _uids(body):
+    return [line for line in body.split('\r\n') if line.startswith('UID:')]
+
+
+def test_feeds_filter_and_revalidate(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    conn = sqlite3.connect(str(db_file))
+    conn.execute("INSERT INTO team (name) VALUES ('Salzburg')")
+    conn.execute("INSERT INTO event_participant VALUES (1, 'Salzburg', 1)")
+    conn.commit()
+    conn.close()
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    r = client.get('/api/feeds/sport/1.ics')
+    assert r.status_code == 200
+    assert r.content_type == ics.CONTENT_TYPE
+    body = r.get_data(as_text=True)
+    assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+    assert 'X-WR-CALNAME:TestSport\r\n' in body
+    assert 'DTSTART:20251120T120000\r\n' in body
+    assert 'SUMMARY:TestSport @ TestVenue (Salzburg)\r\n' in body
+    assert 'LOCATION:TestVenue\\, TestCity\r\n' in body
+    assert _uids(body) == ['UID:event-1@sportscalendar']
+    assert _uids(client.get('/api/feeds/team/1.ics').get_data(as_text=True)) == ['UID:event-1@sportscalendar']
+    assert client.get('/api/feeds/venue/99.ics').status_code == 404
+    assert client.get('/api/feeds/city/1.ics').status_code == 404
+
+    etag = r.headers['ETag']
+    assert client.get('/api/feeds/sport/1.ics', headers={'If-None-Match': etag}).status_code == 304
+    #Second request for the same revision is served from the cache
+    assert client.get('/api/feeds/sport/1.ics').get_data(as_text=True) == body
+
+    client.post('/api/events', json=PAYLOAD)
+    r = client.get('/api/feeds/sport/1.ics', headers={'If-None-Match': etag})
+    assert r.status_code == 200
+    assert r.headers['ETag'] != etag
+    assert len(_uids(r.get_data(as_text=True))) == 2
+    assert 'Last-Modified' in r.headers
+    r = client.get('/api/feeds/all.ics', headers={'If-Modified-Since': r.headers['Last-Modified']})
+    assert r.status_code == 304
+
+    #Team renames leave the change log alone, the feed still has to change
+    etag = client.get('/api/feeds/team/1.ics').headers['ETag']
+    conn = sqlite3.connect(str(db_file))
+    conn.execute("UPDATE team SET name = 'Red Bull Salzburg' WHERE team_id = 1")
+    conn.commit()
+    conn.close()
+    r = client.get('/api/feeds/team/1.ics', headers={'If-None-Match': etag})
+    assert r.status_code == 200
+    assert 'X-WR-CALNAME:Red Bull Salzburg\r\n' in r.get_data(as_text=True)
+
+
+def test_fastapi_feed(tmp_path, monkeypatch):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    monkeypatch.setattr(db, 'DB_PATH', str(db_file))
+    with TestClient(sync_app) as client:
+        r = client.get('/feeds/venue/1.ics')
+        assert r.status_code == 200
+        assert _uids(r.text) == ['UID:event-1@sportscalendar']
+        assert client.get('/feeds/venue/1.ics', headers={'If-None-Match': r.headers['etag']}).status_code == 304
+        assert client.get('/feeds/team/5.ics').status_code == 404
+
+
+def test_text_is_escaped_and_folded():
+    assert ics.escape_text('a,b;c\\d\ne') == 'a\\,b\\;c\\\\d\\ne'
+    folded = ics.fold('DESCRIPTION:' + 'ü' * 60)
+    lines = folded.split('\r\n')
+    assert all(len(line.encode('utf-8')) <= 75 for line in lines)
+    assert lines[1].startswith(' ')
+    assert ''.join(line[1:] if i else line for i, line in enumerate(lines)) == 'DESCRIPTION:' + 'ü' * 60
@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import sqlite3
+
+from backend import importer
+from test_api import create_test_db, load_server_module
+
+
+def _connect(db_file):
+    conn = sqlite3.connect(str(db_file))
+    conn.row_factory = sqlite3.Row
+    conn.execute("INSERT INTO team (name) VALUES ('Salzburg'), ('Sturm')")
+    conn.commit()
+    return conn
+
+
+def test_import_jsonl_reports_row_errors_without_aborting(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    conn = _connect(db_file)
+
+    lines = [
+        {'sport_id': 1, 'venue_id': 1, 'event_date': '2026-01-01', 'event_time': '18:00', 'participants': ['Salzburg', 'Sturm']},
+        {'sport_id': 1, 'venue_id': 1, 'event_date': '2026-01-02'},
+        {'sport_id': 'x', 'venue_id': 1, 'event_date': '2026-01-03', 'event_time': '18:00'},
+        {'sport_id': 1, 'venue_id': 1, 'event_date': '2026-01-04', 'event_time': '18:00', 'participants': ['Nobody']},
+        {'sport_id': 1, 'venue_id': 1, 'event_date': '2026-01-05', 'event_time': '18:00',
+         'participants': [{'name': 'Red Bulls', 'team_id': 1}]},
+    ]
+    text = '\n'.join(json.dumps(line) for line in lines) + '\nnot json\n'
+    result = importer.import_events(conn, importer.read_records(io.StringIO(text)), chunk_size=2)
+
+    assert result.inserted == 2
+    assert [(e['row'], e['error']) for e in result.errors] == [
+        (2, 'Missing required fields'),
+        (3, 'Invalid sport_id or venue_id'),
+        (4, 'Unknown team: Nobody'),
+        (6, "Invalid JSON: Expecting value: line 1 column 1 (char 0)"),
+    ]
+    assert conn.execute('SELECT COUNT(*) FROM event').fetchone()[0] == 3
+    participants = conn.execute('''
+        SELECT e.event_date, ep.participant_name, ep.team_id_foreignkey
+        FROM event_participant ep JOIN event e ON e.event_id = ep.event_id_foreignkey
+        ORDER BY e.event_date, ep.participant_name
+    ''').fetchall()
+    assert [tuple(p) for p in participants] == [
+        ('2026-01-01', 'Salzburg', 1), ('2026-01-01', 'Sturm', 2), ('2026-01-05', 'Red Bulls', 1),
+    ]
+    conn.close()
+
+
+def test_import_csv_falls_back_to_row_inserts_on_constraint_errors(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    conn = _connect(db_file)
+    #A trigger that rejects one row makes the batched insert fail
+    conn.execute("""
+        CREATE TRIGGER reject_bad AFTER INSERT ON event WHEN NEW.description = 'bad'
+        BEGIN SELECT RAISE(ABORT, 'rejected'); END
+    """)
+    conn.commit()
+
+    text = ('sport_id,venue_id,event_date,event_time,description,participants\n'
+            '1,1,2026-02-01,10:00,,Salzburg;Sturm\n'
+            '1,1,2026-02-02,10:00,bad,\n'
+            '1,1,2026-02-03,10:00,fine,\n')
+    result = importer.import_events(conn, importer.read_records(io.StringIO(text), 'csv'))
+
+    assert result.inserted == 2
+    assert result.errors == [{'row': 3, 'error': 'rejected'}]
+    dates = [r[0] for r in conn.execute('SELECT event_date FROM event WHERE event_date >= ? ORDER BY 1', ('2026-01-01',))]
+    assert dates == ['2026-02-01', '2026-02-03']
+    conn.close()
+
+
+def test_bulk_endpoint(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    body = '\n'.join(json.dumps({'sport_id': 1, 'venue_id': 1, 'event_date': f'2026-03-{d:02d}', 'event_time': '12:00'})
+                     for d in range(1, 11))
+    r = client.post('/api/events/bulk?chunk_size=3', data=body, content_type='application/x-ndjson')
+    assert r.status_code == 200
+    assert r.get_json() == {'inserted': 10, 'failed': 0, 'errors': [], 'conflicts': []}
+
+    csv_body = 'sport_id,venue_id,event_date,event_time\n1,1,2026-04-01,09:00\n1,,2026-04-02,09:00\n'
+    r = client.post('/api/events/bulk', data=csv_body, content_type='text/csv')
+    assert r.get_json()['inserted'] == 1
+    assert r.get_json()['errors'] == [{'row': 3, 'error': 'Missing required fields'}]
+    assert len(client.get('/api/events').get_json()) == 12
@@ -0,0 +1,83 @@
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import db, instrumentation
+from backend.async_main import app as async_app
+from backend.main import app as sync_app
+from backend.routers import events
+from test_api import create_test_db, load_server_module
+
+
+@pytest.fixture
+def flask_client(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    return server.app.test_client()
+
+
+def test_flask_server_timing_is_opt_in(flask_client):
+    #First request builds the cached body, so it includes the query and serialization
+    r = flask_client.get('/api/events', headers={'X-Debug-Timing': '1'})
+    timing = r.headers['Server-Timing']
+    assert 'db;dur=' in timing and 'serialize;dur=' in timing and 'total;dur=' in timing
+    assert 'Server-Timing' not in flask_client.get('/api/events').headers
+
+    metrics = flask_client.get('/metrics').get_data(as_text=True)
+    assert 'sports_http_request_duration_seconds_count{app="flask",method="GET",route="/api/events",status="200"}' in metrics
+    assert 'sports_db_query_duration_seconds_count{statement="SELECT"}' in metrics
+    assert 'sports_db_pool_size{path=' in metrics
+
+
+def test_flask_profile_writes_collapsed_stacks(flask_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'PROFILING', '1')
+    monkeypatch.setattr(instrumentation, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    assert 'X-Profile-File' not in flask_client.get('/api/events').headers
+
+    r = flask_client.get('/api/events', headers={'X-Profile': '1'})
+    assert os.path.dirname(r.headers['X-Profile-File']) == str(tmp_path / 'profiles')
+    assert os.path.exists(r.headers['X-Profile-File'])
+
+
+@pytest.mark.parametrize('app,name', [(sync_app, 'fastapi'), (async_app, 'fastapi-async')])
+def test_fastapi_server_timing(app, name, tmp_path, monkeypatch):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    monkeypatch.setattr(db, 'DB_PATH', str(db_file))
+    with TestClient(app) as client:
+        assert 'server-timing' not in client.get('/events/1').headers
+        r = client.get('/events/1', headers={'X-Debug-Timing': '1'})
+        assert r.status_code == 200
+        assert 'db;dur=' in r.headers['server-timing']
+        assert '0 queries' not in r.headers['server-timing']
+
+        metrics = client.get('/metrics').text
+        assert f'sports_http_request_duration_seconds_count{{app="{name}",method="GET",route="/events/{{event_id}}",status="200"}}' in metrics
+
+
+@pytest.mark.parametrize('app', [sync_app, async_app], ids=['sync', 'async'])
+def test_fastapi_profile_samples_the_handler_thread(app, tmp_path, monkeypatch):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    monkeypatch.setattr(db, 'DB_PATH', str(db_file))
+    monkeypatch.setattr(instrumentation, 'PROFILING', '1')
+    monkeypatch.setattr(instrumentation, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    fetch_events = events.fetch_events
+
+    #Long enough for plenty of 1 ms samples
+    def slow_fetch_events(conn, *args):
+        time.sleep(0.05)
+        return fetch_events(conn, *args)
+
+    monkeypatch.setattr(events, 'fetch_events', slow_fetch_events)
+    with TestClient(app) as client:
+        r = client.get('/events/', headers={'X-Profile': '1'})
+    with open(r.headers['X-Profile-File'], encoding='utf-8') as f:
+        folded = f.read()
+    assert 'slow_fetch_events (test_instrumentation.py' in folded
+    #The event loop is shared with other requests and stays out of the profile
+    assert 'base_events.py' not in folded
@@ -0,0 +1,125 @@
+import json
+import random
+import re
+import sqlite3
+
+import pytest
+
+from backend import conflicts, ics, migrations, recurrence, schedules
+from backend.queries import CALENDAR_COLUMNS, CALENDAR_JOINS
+from backend.routers import events
+from test_api import create_test_db
+
+#The schema before durations, series and the lookup indexes
+LEGACY_SCHEMA = '''
+    CREATE TABLE sport (sport_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+    CREATE TABLE venue (venue_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, city TEXT NOT NULL,
+                        address TEXT NOT NULL);
+    CREATE TABLE event (event_id INTEGER PRIMARY KEY AUTOINCREMENT, sport_id_foreignkey INTEGER NOT NULL,
+                        venue_id_foreignkey INTEGER NOT NULL, description TEXT, event_date DATE NOT NULL,
+                        event_time TIME NOT NULL);
+    CREATE TABLE team (team_id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE);
+    CREATE TABLE event_participant (event_id_foreignkey INTEGER NOT NULL, participant_name TEXT NOT NULL,
+                                    team_id_foreignkey INTEGER NOT NULL,
+                                    PRIMARY KEY (event_id_foreignkey, participant_name));
+    INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) VALUES (1, 1, '2025-01-01', '10:00');
+'''
+
+
+def _indexes(conn):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_new_and_legacy_databases_end_up_alike(tmp_path):
+    fresh = sqlite3.connect(str(tmp_path / 'fresh.db'))
+    assert migrations.migrate(fresh) == [1, 2, 3, 4, 5, 6]
+    assert fresh.execute('SELECT COUNT(*) FROM sport').fetchone()[0] > 0
+    assert migrations.migrate(fresh) == []
+
+    legacy = sqlite3.connect(str(tmp_path / 'legacy.db'))
+    legacy.executescript(LEGACY_SCHEMA)
+    assert migrations.migrate(legacy) == [1, 2, 3, 4, 5, 6]
+    assert migrations.current_version(legacy) == migrations.LATEST
+    #The existing event is kept and gets the default duration, no seed data is added
+    assert legacy.execute('SELECT event_id, duration_minutes FROM event').fetchall() == [(1, 120)]
+    assert legacy.execute('SELECT COUNT(*) FROM sport').fetchone()[0] == 0
+    assert _indexes(legacy) >= {'idx_event_sport_date_time', 'idx_event_participant_team',
+                                'idx_event_venue_date_time'}
+    assert legacy.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    #Both schemas have the same tables, triggers and indexes
+    objects = "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name"
+    assert fresh.execute(objects).fetchall() == legacy.execute(objects).fetchall()
+    fresh.close()
+    legacy.close()
+
+
+def test_base_schema_stays_in_the_migration_transaction(tmp_path, monkeypatch):
+    broken = tmp_path / 'insert.sql'
+    broken.write_text("INSERT INTO sport (name) VALUES ('Football');\nINSERT INTO nowhere VALUES (1);\n")
+    monkeypatch.setattr(migrations, 'INSERT_PATH', str(broken))
+    conn = sqlite3.connect(str(tmp_path / 'test.db'))
+    with pytest.raises(sqlite3.OperationalError, match='nowhere'):
+        migrations.migrate(conn)
+    #The failed seed rolled back the tables with it, another process starts over on an empty file
+    assert conn.execute("SELECT name FROM sqlite_master").fetchall() == []
+    assert migrations.current_version(conn) == 0
+    conn.close()
+
+
+def test_only_missing_steps_run(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    create_test_db(db_file)
+    conn = sqlite3.connect(db_file)
+    conn.execute('PRAGMA user_version = 5')
+    assert migrations.migrate(conn) == [6]
+    #Steps 1 to 5 were skipped, so there is no change log
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'event_change'").fetchone() is None
+    conn.close()
+
+
+#Tables that grow with the calendar, reading one of them whole is a regression
+_BIG_TABLES = {'event', 'e', 'event_participant', 'ep', 'event_change', 'c'}
+
+
+def _full_scans(conn, query, params):
+    plan = [r[3] for r in conn.execute('EXPLAIN QUERY PLAN ' + query, params)]
+    return [line for line in plan if (m := re.match(r'SCAN (\w+)', line)) and m.group(1) in _BIG_TABLES]
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    create_test_db(db_file)
+    conn = sqlite3.connect(db_file)
+    rng = random.Random(3)
+    conn.executemany('INSERT INTO sport (name) VALUES (?)', [(f'Sport {i}',) for i in range(10)])
+    conn.executemany('INSERT INTO venue (name, city, address) VALUES (?, ?, ?)',
+                     [(f'Venue {i}', 'City', 'Street') for i in range(50)])
+    conn.executemany('INSERT INTO team (name) VALUES (?)', [(f'Team {i}',) for i in range(100)])
+    for _ in range(2000):
+        event_id = conn.execute('INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) '
+                                'VALUES (?, ?, ?, ?)', (rng.randint(1, 11), rng.randint(1, 51),
+                                                        f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                                                        '18:00')).lastrowid
+        conn.executemany('INSERT INTO event_participant VALUES (?, ?, ?)',
+                         [(event_id, f'Team {t}', t) for t in rng.sample(range(1, 101), 2)])
+    conn.commit()
+    migrations.migrate(conn)
+
+    listing = (f'SELECT {CALENDAR_COLUMNS} FROM event e {CALENDAR_JOINS} WHERE {recurrence.NOT_A_SERIES} AND {{}} '
+               f'ORDER BY e.event_date, e.event_time, e.event_id LIMIT 501')
+    hot = {
+        'window': (listing.format('e.event_date >= ? AND e.event_date < ?'), ('2025-03-01', '2025-04-01')),
+        'next page': (listing.format('(e.event_date, e.event_time, e.event_id) > (?, ?, ?)'), ('2025-03-01', '18:00', 5)),
+        'booking check': (conflicts._CANDIDATES, (3, '2025-01-01', '2025-01-02')),
+        'details': (events._EVENT_DETAIL_QUERY, (json.dumps([1, 2, 3]),)),
+        'fastapi window': events._build_events_query(None, None, '2025-03-01', '2025-04-01'),
+        'sync': ('SELECT event_id FROM event_change WHERE revision > ? ORDER BY revision LIMIT 100', (10,)),
+        'team fixtures': (schedules._FIXTURES, {'team_ids': json.dumps([3, 4]), 'start': '2025-03-01', 'end': None,
+                                                'limit': 100}),
+        'head to head': (schedules._HEAD_TO_HEAD, {'team_id': 3, 'other_id': 4, 'start': None, 'end': None}),
+    }
+    for kind, (_, where) in ics.FEEDS.items():
+        hot[f'{kind} feed'] = (ics._FEED_QUERY.format(where=where), (3,))
+    for name, (query, params) in hot.items():
+        assert _full_scans(conn, query, params) == [], name
+    conn.close()
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+
+import pytest
+
+from backend.pool import ConnectionPool, PoolTimeout
+
+
+def test_pool_reuses_connections_and_applies_pragmas(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=2)
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1
+    with pool.connection() as conn:
+        assert conn is first
+
+    stats = pool.stats()
+    assert stats['size'] == 1
+    assert stats['checkouts'] == 2
+    assert stats['in_use'] == 0
+    pool.close()
+
+
+def test_pool_initializer_runs_once(tmp_path):
+    calls = []
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=3, initializer=lambda conn: calls.append(conn))
+    held = [pool.acquire() for _ in range(3)]
+    for conn in held:
+        pool.release(conn)
+    assert len(calls) == 1
+    pool.close()
+
+
+def test_pool_failed_initializer_frees_its_connection(tmp_path):
+    calls = []
+
+    def initializer(conn):
+        calls.append(conn)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('migration failed')
+
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=1, timeout=0.1, initializer=initializer)
+    with pytest.raises(sqlite3.OperationalError, match='migration failed'):
+        pool.acquire()
+    assert pool.stats()['size'] == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        calls[0].execute('SELECT 1')
+    #The slot is free again and the initializer gets another go
+    with pool.connection() as conn:
+        assert conn.execute('SELECT 1').fetchone()[0] == 1
+    assert len(calls) == 2
+    pool.close()
+
+
+def test_pool_rolls_back_unfinished_transactions(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=1)
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.commit()
+        conn.execute('INSERT INTO t VALUES (1)')
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    pool.close()
+
+
+def test_pool_is_bounded_and_records_waits(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), max_size=1, timeout=0.05)
+    conn = pool.acquire()
+    #A second checkout has to wait and times out while the only connection is held
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    pool.timeout = 2
+    releaser = threading.Timer(0.05, pool.release, args=(conn,))
+    releaser.start()
+    with pool.connection():
+        pass
+    releaser.join()
+
+    stats = pool.stats()
+    assert stats['size'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['waits'] == 1
+    assert stats['wait_time_ms'] > 0
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        pool.acquire()
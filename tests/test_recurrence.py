@@ -0,0 +1,143 @@
+import datetime
+import os
+from itertools import islice
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import db, recurrence
+from backend.main import app as sync_app
+from backend.validation import EventValidationError
+from test_api import create_test_db, load_server_module
+
+#Tuesday and Thursday training, 6 sessions from Tuesday 2025-12-02, the 11th is cancelled
+TRAINING = {'sport_id': 1, 'venue_id': 1, 'event_date': '2025-12-02', 'event_time': '18:00',
+            'rrule': 'FREQ=WEEKLY;BYDAY=TU,TH;COUNT=6', 'exdates': ['2025-12-11']}
+
+
+def _dates(rule, dtstart, start):
+    return [d.isoformat() for d in islice(recurrence.iter_dates(recurrence.parse_rule(rule), dtstart, start), 4)]
+
+
+def test_rules():
+    day = datetime.date(2025, 1, 31)
+    assert _dates('FREQ=MONTHLY', day, day) == ['2025-01-31', '2025-03-31', '2025-05-31', '2025-07-31']
+    assert _dates('FREQ=DAILY;INTERVAL=3;UNTIL=20250208', day, datetime.date(2025, 2, 2)) == ['2025-02-03', '2025-02-06']
+    #Jumping into the middle of a series keeps counting from its start
+    assert _dates('FREQ=WEEKLY;BYDAY=MO,FR;COUNT=5', day, datetime.date(2025, 2, 6)) == ['2025-02-07', '2025-02-10', '2025-02-14']
+    assert _dates('FREQ=WEEKLY;INTERVAL=2', day, datetime.date(2025, 2, 1)) == ['2025-02-14', '2025-02-28',
+                                                                                  '2025-03-14', '2025-03-28']
+    assert str(recurrence.parse_rule('rrule:freq=weekly;byday=th,tu')) == 'FREQ=WEEKLY;BYDAY=TU,TH'
+    for bad in ('FREQ=YEARLY', 'FREQ=DAILY;BYDAY=MO', 'FREQ=DAILY;COUNT=0', 'FREQ=DAILY;BYHOUR=3', 'FREQ'):
+        with pytest.raises(EventValidationError):
+            recurrence.parse_rule(bad)
+    assert recurrence.parse_recurrence(TRAINING, '2025-12-02') == (
+        'FREQ=WEEKLY;COUNT=6;BYDAY=TU,TH', '2025-12-11', '2025-12-18')
+
+
+def test_series_are_bounded():
+    #The last date of daily and weekly rules is computed, not walked
+    for rule, dtstart in (('FREQ=DAILY;INTERVAL=3;COUNT=7', '2025-01-31'), ('FREQ=WEEKLY;COUNT=9', '2025-01-31'),
+                          ('FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE,SA;COUNT=11', '2025-02-06'),
+                          ('FREQ=WEEKLY;BYDAY=MO,TU;COUNT=2', '2025-02-04')):
+        day = datetime.date.fromisoformat(dtstart)
+        parsed = recurrence.parse_rule(rule)
+        walked = list(islice(recurrence.iter_dates(parsed, day, day), parsed.count))
+        assert recurrence.last_date(parsed, day) == walked[-1]
+    #Months without the day are still skipped
+    assert recurrence.parse_recurrence({'rrule': 'FREQ=MONTHLY;INTERVAL=12;COUNT=3'}, '2024-02-29').until_date == '2032-02-29'
+    for rule, dtstart in (('FREQ=MONTHLY;COUNT=100000', '2025-01-01'), ('FREQ=DAILY;INTERVAL=100000000', '2025-01-01'),
+                          ('FREQ=DAILY;COUNT=4000', '2025-01-01'), ('FREQ=DAILY;UNTIL=99991231', '2025-01-01'),
+                          ('FREQ=MONTHLY;COUNT=3', '9999-11-30'), ('FREQ=DAILY;COUNT=10', '9999-12-25')):
+        with pytest.raises(EventValidationError):
+            recurrence.parse_recurrence({'rrule': rule}, dtstart)
+
+
+def test_series_are_expanded_per_window(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    r = client.post('/api/events', json=TRAINING)
+    assert r.status_code == 201
+    series_id = r.get_json()['event_id']
+    with server.db_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM event').fetchone()[0] == 2
+
+    events = client.get('/api/events?start=2025-11-01&end=2026-01-01').get_json()
+    assert [(e['id'], e['start']) for e in events] == [
+        (1, '2025-11-20T12:00'),
+        (f'{series_id}@2025-12-02', '2025-12-02T18:00'),
+        (f'{series_id}@2025-12-04', '2025-12-04T18:00'),
+        (f'{series_id}@2025-12-09', '2025-12-09T18:00'),
+        (f'{series_id}@2025-12-16', '2025-12-16T18:00'),
+        (f'{series_id}@2025-12-18', '2025-12-18T18:00'),
+    ]
+    assert events[1]['series_id'] == series_id and events[1]['title'] == 'TestSport @ TestVenue'
+    assert len(client.get('/api/events?start=2025-12-10&end=2025-12-17').get_json()) == 1
+    assert client.get('/api/events?start=2026-01-01').get_json() == []
+
+    #Walking the cursor over plain events and occurrences returns each once, in order
+    seen = []
+    url = '/api/events?limit=2'
+    while url:
+        r = client.get(url)
+        seen.extend(e['start'] for e in r.get_json())
+        cursor = r.headers.get('X-Next-Cursor')
+        url = f'/api/events?limit=2&cursor={cursor}' if cursor else None
+    assert seen == [e['start'] for e in events]
+    assert [e['start'] for e in server.json.loads(client.get('/api/events?stream=json').data)] == seen
+
+    #A changed series cannot be patched into a window, the client reloads it
+    token = client.get('/api/events/sync?token=0').get_json()['token']
+    assert client.get('/api/events/sync?token=0').get_json() == {'reset': True, 'token': token}
+
+    feed = client.get('/api/feeds/venue/1.ics').get_data(as_text=True)
+    assert 'RRULE:FREQ=WEEKLY;COUNT=6;BYDAY=TU,TH\r\n' in feed
+    assert 'EXDATE:20251211T180000\r\n' in feed
+
+    assert client.post('/api/events', json=dict(TRAINING, rrule='FREQ=HOURLY')).status_code == 400
+
+
+def test_search_returns_upcoming_occurrences(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    today = datetime.date.today()
+    client.post('/api/events', json={'sport_id': 1, 'venue_id': 1, 'event_date': today.isoformat(),
+                                     'event_time': '07:00', 'description': 'Morning run', 'rrule': 'FREQ=DAILY'})
+    results = client.get('/api/events/search?q=morning&limit=3').get_json()
+    assert [e['start'][:10] for e in results] == [(today + datetime.timedelta(days=i)).isoformat() for i in range(3)]
+
+
+def test_fastapi_listings_expand_series(tmp_path, monkeypatch):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    monkeypatch.setattr(db, 'DB_PATH', str(db_file))
+    with TestClient(sync_app) as client:
+        series_id = client.post('/events/', json=TRAINING).json()['event_id']
+        r = client.get('/events/', params={'start': '2025-12-01', 'end': '2025-12-10'})
+        assert [(e['event_id'], e['event_date']) for e in r.json()] == [
+            (series_id, '2025-12-02'), (series_id, '2025-12-04'), (series_id, '2025-12-09')]
+        assert [e['event_date'] for e in client.get('/events/').json()][:2] == ['2025-11-20', '2025-12-02']
+        assert client.get(f'/events/{series_id}').json()['event']['exdates'] == '2025-12-11'
+
+        page = client.get('/events/with-participants', params={'limit': 3}).json()
+        assert [e['event_date'] for e in page] == ['2025-11-20', '2025-12-02', '2025-12-04']
+        last = page[-1]
+        r = client.get('/events/with-participants', params={
+            'after_date': last['event_date'], 'after_time': last['event_time'], 'after_id': last['event_id']})
+        assert [e['event_date'] for e in r.json()] == ['2025-12-09', '2025-12-16', '2025-12-18']
+
+        #Occurrences and plain events of the same day are in time order
+        client.post('/events/', json={'sport_id': 1, 'venue_id': 1, 'event_date': '2025-12-04', 'event_time': '20:00'})
+        r = client.get('/events/', params={'start': '2025-12-04', 'end': '2025-12-05'})
+        assert [e['event_time'] for e in r.json()] == ['18:00', '20:00']
+        client.post('/events/', json={'sport_id': 1, 'venue_id': 1, 'event_date': '2025-12-09', 'event_time': '08:00'})
+        r = client.get('/events/', params={'start': '2025-12-09', 'end': '2025-12-10'})
+        assert [e['event_time'] for e in r.json()] == ['08:00', '18:00']
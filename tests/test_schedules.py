@@ -0,0 +1,102 @@
+import datetime
+import random
+import sqlite3
+from collections import defaultdict
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import db, migrations
+from backend.async_main import app as async_app
+from backend.main import app as sync_app
+from test_api import create_test_db
+
+
+def _seed(path, events=200, seed=5):
+    create_test_db(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    conn.executemany('INSERT INTO team (team_id, name) VALUES (?, ?)', [(i, f'Team {i}') for i in range(1, 7)])
+    for _ in range(events):
+        event_id = conn.execute('INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) '
+                                'VALUES (1, 1, ?, ?)', (f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                                                        f'{rng.randint(8, 21):02d}:00')).lastrowid
+        home, away = rng.sample(range(1, 7), 2)
+        conn.executemany('INSERT INTO event_participant VALUES (?, ?, ?)',
+                         [(event_id, f'Team {home}', home), (event_id, f'Team {away}', away)])
+    #Two players of team 1 in one event, it is still one fixture
+    conn.execute("INSERT INTO event_participant VALUES (5, 'Team 1 reserves', 1)")
+    conn.commit()
+    return conn
+
+
+#The schedule of a team the slow way, from every participant row
+def _expected(conn, team_id, start, end):
+    teams, when = defaultdict(set), {}
+    for event_id, day, time, team in conn.execute(
+            'SELECT e.event_id, e.event_date, e.event_time, ep.team_id_foreignkey FROM event e '
+            'JOIN event_participant ep ON ep.event_id_foreignkey = e.event_id'):
+        teams[event_id].add(team)
+        when[event_id] = (day, time, event_id)
+    fixtures, previous = [], None
+    for event_id in sorted((e for e, members in teams.items() if team_id in members), key=when.get):
+        day = when[event_id][0]
+        rest = (datetime.date.fromisoformat(day) - datetime.date.fromisoformat(previous)).days if previous else None
+        previous = day
+        if (start is None or day >= start) and (end is None or day < end):
+            fixtures.append((event_id, rest, sorted(teams[event_id] - {team_id})))
+    return fixtures
+
+
+@pytest.fixture(params=[sync_app, async_app], ids=['sync', 'async'])
+def client(request, tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'test.db')
+    _seed(db_file).close()
+    monkeypatch.setattr(db, 'DB_PATH', db_file)
+    with TestClient(request.param) as test_client:
+        yield test_client
+
+
+def test_fixtures_and_rest_days(client):
+    conn = sqlite3.connect(db.DB_PATH)
+    single = client.get('/teams/1/fixtures?start=2025-04-01&end=2025-09-01').json()
+    batch = client.get('/teams/fixtures?team_id=3&team_id=99&team_id=1&start=2025-04-01&end=2025-09-01').json()
+    #Unknown teams are left out, the rest keep the requested order
+    assert [t['team_id'] for t in batch['teams']] == [3, 1]
+    assert batch['teams'][1] == single
+    for schedule in batch['teams']:
+        expected = _expected(conn, schedule['team_id'], '2025-04-01', '2025-09-01')
+        got = [(f['event_id'], f['rest_days'], sorted(o['team_id'] for o in f['opponents']))
+               for f in schedule['fixtures']]
+        assert got == expected
+        #The first fixture of the window counts from a match before it
+        assert got[0][1] is not None
+        gaps = [g for _, g, _ in got if g is not None]
+        assert schedule['rest_days'] == {'min': min(gaps), 'max': max(gaps), 'avg': round(sum(gaps) / len(gaps), 2)}
+    assert [f['event_id'] for f in client.get('/teams/1/fixtures?limit=3').json()['fixtures']] == \
+        [e for e, _, _ in _expected(conn, 1, None, None)[:3]]
+    conn.close()
+
+
+def test_head_to_head(client):
+    conn = sqlite3.connect(db.DB_PATH)
+    both = [e for e, _, opponents in _expected(conn, 2, '2025-03-01', None) if 5 in opponents]
+    conn.close()
+    result = client.get('/teams/2/head-to-head/5?start=2025-03-01').json()
+    assert result['teams'] == [{'team_id': 2, 'name': 'Team 2'}, {'team_id': 5, 'name': 'Team 5'}]
+    assert [e['event_id'] for e in result['events']] == both
+    assert result['meetings'] == len(both)
+    assert result['first_date'] == result['events'][0]['event_date']
+    assert result['events'][1]['days_since_last'] == (
+        datetime.date.fromisoformat(result['events'][1]['event_date']) -
+        datetime.date.fromisoformat(result['events'][0]['event_date'])).days
+
+
+def test_schedule_errors(client):
+    assert client.get('/teams/99/fixtures').status_code == 404
+    assert client.get('/teams/1/head-to-head/99').status_code == 404
+    assert client.get('/teams/1/head-to-head/1').status_code == 400
+    assert client.get('/teams/fixtures').status_code == 400
+    assert client.get('/teams/1/fixtures?start=April').status_code == 400
+    assert client.get('/teams/1/fixtures?limit=0').status_code == 422
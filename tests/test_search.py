@@ -0,0 +1,56 @@
+import os
+import sqlite3
+
+from backend import search
+from test_api import create_test_db, load_server_module
+
+
+def _seed_participants(db_file):
+    conn = sqlite3.connect(str(db_file))
+    conn.execute("INSERT INTO team (name) VALUES ('Rapid Wien')")
+    conn.execute("INSERT INTO event_participant (event_id_foreignkey, participant_name, team_id_foreignkey) VALUES (1, 'Rapid Wien', 1)")
+    conn.commit()
+    conn.close()
+
+
+def test_build_match_query_quotes_and_prefixes_terms():
+    assert search.build_match_query('rap wi"en') == '"rap"* "wien"*'
+    assert search.build_match_query('   ') is None
+
+
+def test_search_uses_fts_index(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    _seed_participants(db_file)
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    #Rows that existed before the index are indexed, including participants and description
+    assert [r['id'] for r in client.get('/api/events/search?q=rapid').get_json()] == [1]
+    assert [r['id'] for r in client.get('/api/events/search?q=seed').get_json()] == [1]
+    #Prefix matching on every word, dates included
+    assert len(client.get('/api/events/search?q=TestS TestCi').get_json()) == 1
+    assert len(client.get('/api/events/search?q=2025-11-20').get_json()) == 1
+    assert client.get('/api/events/search?q=nothing').get_json() == []
+
+    #Triggers index new events on insert
+    payload = {'sport_id_foreignkey': 1, 'venue_id_foreignkey': 1, 'event_date': '2025-12-01',
+               'event_time': '19:30', 'description': 'Championship final'}
+    client.post('/api/events', json=payload)
+    results = client.get('/api/events/search?q=champion').get_json()
+    assert len(results) == 1 and results[0]['description'] == 'Championship final'
+
+    #Result limit
+    assert len(client.get('/api/events/search?q=TestSport&limit=1').get_json()) == 1
+
+
+def test_search_falls_back_to_like_without_fts(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    conn = sqlite3.connect(str(db_file))
+    conn.row_factory = sqlite3.Row
+    assert not search.has_fts_index(conn)
+    rows = search.search_events(conn, 'estVen')
+    assert [r['id'] for r in rows] == [1]
+    conn.close()
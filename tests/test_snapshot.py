@@ -0,0 +1,115 @@
+import os
+import random
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from backend import db, migrations, recurrence, snapshot
+from backend.main import app as sync_app
+from backend.queries import CALENDAR_COLUMNS, CALENDAR_JOINS
+from backend.routers import events
+from test_api import create_test_db, load_server_module
+
+
+def _seed(path, count=300, seed=11):
+    create_test_db(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    conn.executemany('INSERT INTO sport (name) VALUES (?)', [('Football',), ('Hockey',)])
+    conn.executemany('INSERT INTO venue (name, city, address) VALUES (?, ?, ?)',
+                     [(f'Arena_{i}', 'Vienna', f'Street {i}') for i in range(5)])
+    for _ in range(count):
+        #Sport 4 and venue 9 do not exist, the FastAPI listing joins them away
+        event_id = conn.execute(
+            'INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time, description) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (rng.randint(1, 4), rng.choice([1, 2, 3, 4, 5, 6, 9]), f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+             f'{rng.randint(8, 21):02d}:{rng.choice(["00", "30"])}', rng.choice([None, 'Derby', 'Cup final']))).lastrowid
+        conn.executemany('INSERT INTO event_participant VALUES (?, ?, ?)',
+                         [(event_id, f'Team {t}', t) for t in rng.sample(range(1, 9), 2)])
+    conn.commit()
+    conn.row_factory = sqlite3.Row
+    return conn, rng
+
+
+def _calendar_sql(conn, start, end, after, limit):
+    clauses, params = [recurrence.NOT_A_SERIES], []
+    for clause, value in (('e.event_date >= ?', start), ('e.event_date < ?', end)):
+        if value:
+            clauses.append(clause)
+            params.append(value)
+    if after:
+        clauses.append('(e.event_date, e.event_time, e.event_id) > (?, ?, ?)')
+        params.extend(after)
+    query = (f"SELECT {CALENDAR_COLUMNS} FROM event e {CALENDAR_JOINS} WHERE {' AND '.join(clauses)} "
+             f"ORDER BY e.event_date, e.event_time, e.event_id LIMIT {limit or -1}")
+    return [dict(r) for r in conn.execute(query, params)]
+
+
+def _events_sql(conn, venue_name, participant_name, start, end):
+    query, params = events._build_events_query(venue_name, participant_name, start, end)
+    rows = [dict(r) for r in conn.execute(query, params) if r['series_rrule'] is None]
+    return sorted(rows, key=lambda r: (r['event_date'], r['event_time'], r['event_id']))
+
+
+def test_snapshot_matches_sql_through_writes(tmp_path):
+    conn, rng = _seed(str(tmp_path / 'test.db'))
+    view = snapshot.EventSnapshot()
+    for step in range(60):
+        view.refresh(conn)
+        start = f'2025-{rng.randint(1, 12):02d}-01' if rng.random() < 0.6 else None
+        end = f'2025-{rng.randint(6, 12):02d}-15' if rng.random() < 0.4 else None
+        after = ('2025-05-10', '12:00', rng.randint(1, 300)) if rng.random() < 0.3 else None
+        limit = rng.choice([None, 1, 25])
+        assert view.calendar(start, end, after, limit) == _calendar_sql(conn, start, end, after, limit)
+        #'_' is a LIKE wildcard too
+        venue_name = rng.choice([None, 'arena_1', 'Arena 2', 'na_'])
+        participant_name = rng.choice([None, 'team 3', 'Team _'])
+        assert view.events(venue_name, participant_name, start, end) == _events_sql(
+            conn, venue_name, participant_name, start, end)
+
+        event_id = rng.randint(1, 320)
+        if step % 5 == 0:
+            conn.execute("INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) "
+                         "VALUES (?, ?, '2025-06-01', '10:00')", (rng.randint(1, 3), rng.randint(1, 5)))
+        elif step % 5 == 1:
+            conn.execute('DELETE FROM event_participant WHERE event_id_foreignkey = ?', (event_id,))
+            conn.execute('DELETE FROM event WHERE event_id = ?', (event_id,))
+        elif step % 5 == 2:
+            conn.execute('UPDATE event SET event_date = ?, description = ? WHERE event_id = ?',
+                         (f'2025-{rng.randint(1, 12):02d}-15', f'Moved {step}', event_id))
+            conn.execute('INSERT OR IGNORE INTO event_participant VALUES (?, ?, ?)', (event_id, 'Team 3', 3))
+        elif step % 5 == 3:
+            conn.execute('UPDATE venue SET name = ? WHERE venue_id = ?', (f'Arena_{step}', rng.randint(1, 6)))
+            conn.execute('UPDATE sport SET name = ? WHERE sport_id = 2', (f'Hockey {step}',))
+        else:
+            #A series leaves the snapshot, the listings read it with SQL
+            recurrence.insert_recurrences(conn, [(event_id, ('FREQ=WEEKLY;COUNT=3', '', None))])
+        conn.commit()
+    conn.close()
+
+
+def test_engines_return_the_same_responses(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'test.db')
+    conn, _ = _seed(db_file)
+    recurrence.insert_recurrences(conn, [(7, ('FREQ=MONTHLY;COUNT=4', '', None))])
+    conn.commit()
+    conn.close()
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = db_file
+    monkeypatch.setattr(db, 'DB_PATH', db_file)
+    flask_urls = ['/api/events', '/api/events?start=2025-03-01&end=2025-05-01', '/api/events?limit=20']
+    fastapi_urls = ['/events/', '/events/?start=2025-03-01&end=2025-05-01&participant_name=Team 1',
+                    '/events/?venue_name=arena_3']
+    responses = {}
+    for engine in snapshot.ENGINES:
+        monkeypatch.setattr(snapshot, 'ENGINE', engine)
+        #Each engine renders its own response, not the other's cached one
+        server.response_cache.invalidate(db_file)
+        flask = server.app.test_client()
+        fastapi = TestClient(sync_app)
+        responses[engine] = ([flask.get(url).get_json() for url in flask_urls],
+                             [fastapi.get(url).json() for url in fastapi_urls])
+    assert responses['snapshot'] == responses['sqlite']
+    assert responses['sqlite'][0][2] and responses['sqlite'][1][2]
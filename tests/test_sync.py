@@ -0,0 +1,77 @@
+import os
+import sqlite3
+
+from backend import sync
+from test_api import create_test_db, load_server_module
+
+PAYLOAD = {'sport_id_foreignkey': 1, 'venue_id_foreignkey': 1, 'event_date': '2025-12-01', 'event_time': '19:30'}
+
+
+def test_sync_returns_only_changes_since_token(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    token = client.get('/api/events').headers['X-Sync-Token']
+    assert client.get(f'/api/events/sync?token={token}').get_json() == {
+        'created': [], 'updated': [], 'deleted': [], 'token': token}
+
+    created_id = client.post('/api/events', json=PAYLOAD).get_json()['event_id']
+    delta = client.get(f'/api/events/sync?token={token}').get_json()
+    assert [e['id'] for e in delta['created']] == [created_id]
+    assert delta['created'][0]['title'] == 'TestSport @ TestVenue'
+    token = delta['token']
+
+    #Writes from outside the API are tracked by the triggers too
+    conn = sqlite3.connect(str(db_file))
+    conn.execute("UPDATE venue SET name = 'Renamed' WHERE venue_id = 1")
+    conn.execute('DELETE FROM event WHERE event_id = 1')
+    conn.execute("INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time) VALUES (1, 1, '2025-12-02', '10:00')")
+    conn.execute('DELETE FROM event WHERE event_id = last_insert_rowid()')
+    conn.commit()
+    conn.close()
+    server.response_cache.invalidate(server.DB_PATH)
+
+    delta = client.get(f'/api/events/sync?token={token}').get_json()
+    assert delta['created'] == []
+    assert [(e['id'], e['venue_name']) for e in delta['updated']] == [(created_id, 'Renamed')]
+    #Created and deleted in between: the client never saw it, so only event 1 is a tombstone
+    assert delta['deleted'] == [1]
+    assert client.get(f"/api/events/sync?token={delta['token']}").get_json()['created'] == []
+
+
+def test_sync_token_errors_and_reset(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    assert client.get('/api/events/sync?token=abc').status_code == 400
+    assert client.get('/api/events/sync').status_code == 400
+    #Token from a newer database than this one
+    assert client.get('/api/events/sync?token=99').get_json() == {'reset': True, 'token': '0'}
+
+    client.post('/api/events', json=PAYLOAD)
+    client.post('/api/events', json=PAYLOAD)
+    with server.db_connection() as conn:
+        assert sync.changes_since(conn, 0, max_changes=1) == {'reset': True, 'token': '2'}
+        assert len(sync.changes_since(conn, 0)['created']) == 2
+
+
+def test_bulk_import_is_recorded_as_created(tmp_path):
+    db_file = tmp_path / 'test.db'
+    create_test_db(str(db_file))
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = str(db_file)
+    client = server.app.test_client()
+
+    token = client.get('/api/events').headers['X-Sync-Token']
+    body = '\n'.join('{"sport_id": 1, "venue_id": 1, "event_date": "2026-01-0%d", "event_time": "10:00"}' % d
+                     for d in (1, 2, 3))
+    assert client.post('/api/events/bulk?chunk_size=2', data=body).get_json()['inserted'] == 3
+    delta = client.get(f'/api/events/sync?token={token}').get_json()
+    assert [e['start'] for e in delta['created']] == ['2026-01-01T10:00', '2026-01-02T10:00', '2026-01-03T10:00']
+    assert delta['updated'] == []
@@ -0,0 +1,105 @@
+import gzip
+import os
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from backend import assets, db, wire
+from backend.main import app as sync_app
+from test_api import create_test_db, load_server_module
+
+
+def _seed(path, events=60):
+    create_test_db(path)
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO event (sport_id_foreignkey, venue_id_foreignkey, event_date, event_time, description) '
+                     'VALUES (1, 1, ?, ?, ?)',
+                     [(f'2025-11-{i % 28 + 1:02d}', '18:00', f'Round {i} of the league') for i in range(events)])
+    conn.executemany('INSERT INTO team (name) VALUES (?)', [(f'Team {i}',) for i in range(100)])
+    conn.commit()
+    conn.close()
+
+
+def test_negotiation():
+    assert wire.negotiate('gzip, deflate', 5000) == 'gzip'
+    assert wire.negotiate('gzip;q=0, identity', 5000) is None
+    assert wire.negotiate('*', 5000) == wire.CODINGS[0]
+    assert wire.negotiate('gzip', wire.MIN_SIZE - 1) is None
+    assert wire.negotiate(None, 5000) is None
+    assert wire.negotiate('br;q=0.5, gzip;q=0.8', 5000, ('br', 'gzip')) == 'gzip'
+
+
+def test_flask_listing_compressed_and_columnar(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    _seed(db_file)
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = db_file
+    client = server.app.test_client()
+
+    plain = client.get('/api/events')
+    assert 'Content-Encoding' not in plain.headers
+    rows = plain.get_json()
+    packed = client.get('/api/events', headers={'Accept-Encoding': 'gzip'})
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in packed.headers['Vary']
+    assert len(packed.data) < len(plain.data) / 3
+    assert gzip.decompress(packed.data) == plain.data
+    #Each coding has its own ETag, the compressed body is kept with the cached one
+    assert packed.headers['ETag'] != plain.headers['ETag']
+    cached = client.get('/api/events', headers={'Accept-Encoding': 'gzip', 'If-None-Match': packed.headers['ETag']})
+    assert cached.status_code == 304
+
+    columns = client.get('/api/events?format=columns').get_json()
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == rows
+    assert client.get('/api/events?format=xml').status_code == 400
+    assert client.get('/api/events?format=msgpack').status_code == (200 if wire.msgpack else 406)
+
+    #Small bodies and ones from outside the cache
+    assert 'Content-Encoding' not in client.get('/api/sports', headers={'Accept-Encoding': 'gzip'}).headers
+    searched = client.get('/api/events/search?q=league&limit=50', headers={'Accept-Encoding': 'gzip'})
+    assert searched.headers['Content-Encoding'] == 'gzip'
+
+
+def test_fastapi_responses_compressed(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'test.db')
+    _seed(db_file)
+    monkeypatch.setattr(db, 'DB_PATH', db_file)
+    client = TestClient(sync_app)
+    #httpx decodes the body, the headers show what was sent
+    teams = client.get('/teams/', headers={'Accept-Encoding': 'gzip'})
+    assert teams.headers['Content-Encoding'] == 'gzip'
+    assert len(teams.json()) == 100
+    assert client.get('/teams/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': teams.headers['ETag']}).status_code == 304
+
+    listing = client.get('/events/', headers={'Accept-Encoding': 'gzip'})
+    assert listing.headers['Content-Encoding'] == 'gzip'
+    columns = client.get('/events/?format=columns').json()
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == listing.json()
+
+
+def test_built_assets_served_precompressed(tmp_path):
+    manifest = assets.build(out=str(tmp_path / 'dist'))
+    script = manifest['assets']['script.js']
+    assert script.startswith('script.') and script != 'script.js'
+    with open(tmp_path / 'dist' / 'index.html', encoding='utf-8') as f:
+        page = f.read()
+    assert f'src="{script}"' in page and f'href="{manifest["assets"]["styles.css"]}"' in page
+
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.built_assets = assets.load(str(tmp_path / 'dist'))
+    client = server.app.test_client()
+    r = client.get('/' + script, headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert r.headers['Cache-Control'] == assets.IMMUTABLE
+    assert r.mimetype in ('application/javascript', 'text/javascript')
+    with open(os.path.join('frontend', 'script.js'), 'rb') as f:
+        assert gzip.decompress(r.data) == f.read()
+    r.close()
+    index = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert index.headers['Cache-Control'] == assets.REVALIDATE
+    assert gzip.decompress(index.data).decode('utf-8') == page
+    index.close()
+    #Anything that is not in the build still comes from frontend/
+    source = client.get('/styles.css')
+    assert source.status_code == 200 and 'Content-Encoding' not in source.headers
+    source.close()
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import conflicts, db, instrumentation, writer
+from backend.async_main import app as async_app
+from test_api import create_test_db, load_server_module
+
+
+def _write(event_time, policy=conflicts.DEFAULT_POLICY, **extra):
+    data = dict({'sport_id': 1, 'venue_id': 1, 'event_date': '2025-12-01', 'event_time': event_time}, **extra)
+    return writer.prepare(data, policy)
+
+
+def test_concurrent_writes_share_commits(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    create_test_db(db_file)
+    group = writer.GroupCommitWriter(db_file, db.init_db, max_delay=0.05)
+    #A clash in the middle of a batch rolls back that event only
+    writes = [_write(f'{h:02d}:00', duration_minutes=60) for h in range(8)]
+    writes.insert(4, _write('03:30', policy='reject'))
+    futures = [group.submit(w) for w in writes]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result(5))
+        except conflicts.BookingConflict as exc:
+            results.append(exc)
+    group.close()
+
+    assert isinstance(results[4], conflicts.BookingConflict) and results[4].event_ids == [5]
+    ids = [r[0] for i, r in enumerate(results) if i != 4]
+    assert ids == list(range(2, 10))
+    stats = group.stats()
+    assert stats['written'] == 8 and stats['failed'] == 1 and stats['batches'] < 9
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT COUNT(*) FROM event WHERE event_date = '2025-12-01'").fetchone()[0] == 8
+    conn.close()
+    with pytest.raises(writer.WriterBusy):
+        group.submit(writes[0])
+
+
+def test_writer_resolves_every_future(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'test.db')
+    create_test_db(db_file)
+    group = writer.GroupCommitWriter(db_file, db.init_db)
+
+    def broken(*args):
+        raise RuntimeError('broken')
+
+    #Failures after COMMIT are logged, the writes are stored and their callers answered
+    monkeypatch.setattr(writer.response_cache, 'invalidate', broken)
+    monkeypatch.setattr(writer.broker, 'publish_event_created', broken)
+    assert group.submit(_write('10:00')).result(5)[0] == 2
+    monkeypatch.undo()
+
+    #A writer thread that dies fails its batch and the next submit starts a new one
+    commit = group._commit
+    monkeypatch.setattr(group, '_commit', broken)
+    with pytest.raises(RuntimeError):
+        group.submit(_write('13:00')).result(5)
+    monkeypatch.setattr(group, '_commit', commit)
+    assert group.submit(_write('16:00')).result(5)[0] == 3
+    group.close()
+
+
+def test_flask_posts_from_many_threads(tmp_path):
+    db_file = str(tmp_path / 'test.db')
+    create_test_db(db_file)
+    server = load_server_module(os.path.join('backend', 'server.py'))
+    server.DB_PATH = db_file
+    statuses = []
+
+    def post(minute):
+        client = server.app.test_client()
+        r = client.post('/api/events?on_conflict=reject',
+                        json={'sport_id': 1, 'venue_id': 1, 'event_date': '2026-01-01',
+                              'event_time': f'{minute // 60:02d}:{minute % 60:02d}', 'duration_minutes': 10})
+        statuses.append((r.status_code, r.get_json()))
+
+    #16 slots, each booked twice: one of each pair is rejected
+    threads = [threading.Thread(target=post, args=(10 * (i % 16),)) for i in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    created = [body['event_id'] for status, body in statuses if status == 201]
+    assert len(created) == 16 and len(set(created)) == 16
+    assert sorted(status for status, _ in statuses) == [201] * 16 + [409] * 16
+    assert len(server.app.test_client().get('/api/events?start=2026-01-01&end=2026-01-02').get_json()) == 16
+
+    metrics = server.app.test_client().get('/metrics').get_data(as_text=True)
+    assert f'sports_write_written_total{{path="{instrumentation._escape(os.path.abspath(db_file))}"}} 16' in metrics
+    assert 'sports_write_queue_depth{' in metrics and 'sports_write_batch_size_count' in metrics
+
+
+def test_fastapi_create_event(tmp_path, monkeypatch):
+    db_file = str(tmp_path / 'test.db')
+    create_test_db(db_file)
+    conn = sqlite3.connect(db_file)
+    conn.execute("INSERT INTO team (name) VALUES ('Sturm')")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(db, 'DB_PATH', db_file)
+    with TestClient(async_app) as client:
+        r = client.post('/events/', json={'sport_id': 1, 'venue_id': 1, 'event_date': '2025-11-20',
+                                          'event_time': '13:00', 'participants': ['Sturm']})
+        assert r.status_code == 200 and r.json() == {'event_id': 2, 'conflicts': [1]}
+        r = client.post('/events/?on_conflict=reject', json={'sport_id': 1, 'venue_id': 1,
+                                                            'event_date': '2025-11-20', 'event_time': '12:30'})
+        assert r.status_code == 409 and r.json()['detail']['conflicts'] == [1, 2]
+        assert client.post('/events/', json={'sport_id': 1}).status_code == 400
+        #Teams are resolved by the writer, inside the batch
+        r = client.post('/events/', json={'sport_id': 1, 'venue_id': 1, 'event_date': '2025-11-21',
+                                          'event_time': '13:00', 'participants': ['Nobody']})
+        assert r.status_code == 400 and 'Nobody' in r.json()['detail']
+        assert client.get('/events/2').json()['participants'] == ['Sturm']